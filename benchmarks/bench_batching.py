@@ -0,0 +1,121 @@
+"""
+Benchmark latency/throughput EventConsumer pada berbagai level load.
+Membandingkan batch size tetap (1 dan 500) dengan AdaptiveBatcher.
+
+Yang diukur adalah EventConsumer yang dipakai aplikasi, termasuk simulasi
+processing-nya (satu round-trip 1 ms per batch event unik); latency dicatat
+setelah batch selesai diproses.
+
+Usage:
+    python -m benchmarks.bench_batching [--duration 2]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.batching import AdaptiveBatcher
+from src.consumer import EventConsumer
+from src.dedup_store import DedupStore
+from src.models import Event
+
+LOAD_LEVELS = [200, 2_000, 20_000, None]  # events/sec, None = secepat mungkin
+
+
+class FixedBatcher(AdaptiveBatcher):
+    """Batch size dan linger tetap (baseline)"""
+
+    def __init__(self, batch_size: int, linger: float):
+        super().__init__(min_batch=batch_size, max_batch=batch_size, initial_batch=batch_size)
+        self.linger = linger
+
+    def record(self, batch_len, commit_latency, queue_depth):
+        self.batches += 1
+        return "hold"
+
+
+class BenchConsumer(EventConsumer):
+    """
+    EventConsumer asli (termasuk simulasi processing per batch) yang hanya
+    ditambah pencatatan latency end-to-end setelah batch selesai diproses.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enqueued_at = {}
+        self.latencies = []
+
+    async def _do_process_batch(self, events):
+        await super()._do_process_batch(events)
+        now = time.perf_counter()
+        self.latencies.extend(now - self.enqueued_at[event.event_id] for event in events)
+
+
+async def run_level(make_batcher, rate, duration, db_path):
+    store = DedupStore(db_path)
+    queue = asyncio.Queue()
+    consumer = BenchConsumer(store, queue, make_batcher())
+    await consumer.start()
+
+    ts = datetime.utcnow().isoformat() + "Z"
+    total = int(rate * duration) if rate else 50_000
+    events = [
+        Event(topic=f"bench.{i % 8}", event_id=f"evt-{i}", timestamp=ts, source="bench")
+        for i in range(total)
+    ]
+
+    start = time.perf_counter()
+    tick = 0.001
+    sent = 0
+    while sent < total:
+        if rate:
+            due = min(total, int((time.perf_counter() - start) * rate) + 1)
+        else:
+            due = total
+        while sent < due:
+            consumer.enqueued_at[events[sent].event_id] = time.perf_counter()
+            queue.put_nowait(events[sent])
+            sent += 1
+        await asyncio.sleep(tick if rate else 0)
+    await queue.join()
+    elapsed = time.perf_counter() - start
+    await consumer.stop()
+    store.close()
+
+    lat = sorted(consumer.latencies)
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": statistics.median(lat) * 1000,
+        "p99_ms": lat[int(len(lat) * 0.99) - 1] * 1000,
+        "batches": consumer.batcher.batches,
+    }
+
+
+async def main(duration: float):
+    strategies = {
+        "fixed-1": lambda: FixedBatcher(1, 0.0),
+        "fixed-500": lambda: FixedBatcher(500, 0.005),
+        "adaptive": lambda: AdaptiveBatcher(),
+    }
+    print(f"{'strategy':<10} {'load':>8} {'ev/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'batches':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make_batcher in strategies.items():
+            for i, rate in enumerate(LOAD_LEVELS):
+                db_path = str(Path(tmp) / f"{name}-{i}.db")
+                r = await run_level(make_batcher, rate, duration, db_path)
+                print(
+                    f"{name:<10} {rate or 'max':>8} {r['throughput']:>10,.0f} "
+                    f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['batches']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=2.0, help="Durasi per level load (detik)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(main(args.duration))
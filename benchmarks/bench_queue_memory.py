@@ -0,0 +1,71 @@
+"""
+Benchmark memori backlog event_queue (tracemalloc): Pydantic Event vs QueuedEvent.
+
+Usage:
+    python -m benchmarks.bench_queue_memory [--sizes 100000 1000000]
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import datetime
+
+from src.fair_queue import FairEventQueue
+from src.models import Event, QueuedEvent
+
+TOPICS = ["application.logs", "system.metrics", "user.events", "error.reports"]
+SOURCES = [f"service-{i}" for i in range(20)]
+
+
+def make_event(i: int, ts: str) -> Event:
+    # Simulasi parsing request: setiap string berasal dari JSON body (tidak di-share)
+    return Event(
+        topic="".join(random.choice(TOPICS)),
+        event_id=f"evt-{i:08d}",
+        timestamp=ts,
+        source="".join(random.choice(SOURCES)),
+        payload={
+            "level": random.choice(["INFO", "WARNING", "ERROR"]),
+            "message": f"Sample log message evt-{i:08d}",
+            "random_value": random.randint(1, 1000),
+        },
+    )
+
+
+def measure(n: int, compact: bool) -> float:
+    """Return MiB yang dialokasikan untuk backlog n event di queue"""
+    gc.collect()
+    tracemalloc.start()
+    queue = FairEventQueue()
+    ts = datetime.utcnow().isoformat() + "Z"
+    for i in range(n):
+        event = make_event(i, ts)
+        queue.put_nowait(QueuedEvent.from_event(event) if compact else event)
+    del event
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queue
+    gc.collect()
+    return current / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'backlog':>10} {'Event MiB':>10} {'Queued MiB':>11} {'B/event':>8} {'B/event':>8} {'ratio':>6}")
+    for n in args.sizes:
+        random.seed(0)
+        full = measure(n, compact=False)
+        random.seed(0)
+        compact = measure(n, compact=True)
+        print(
+            f"{n:>10,} {full:>10.1f} {compact:>11.1f} "
+            f"{full * 1048576 / n:>8.0f} {compact * 1048576 / n:>8.0f} {full / compact:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
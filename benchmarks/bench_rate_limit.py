@@ -0,0 +1,36 @@
+"""
+Benchmark RateLimiter: biaya per check dengan banyak bucket source aktif.
+
+Key (source, topic) berputar di --sources source dan 16 topic, di-admit per
+batch seperti /publish; biaya per check harus tetap konstan meski jumlah
+bucket besar.
+
+Usage:
+    python -m benchmarks.bench_rate_limit [--checks 1000000] [--sources 50000] [--batch 500]
+"""
+import argparse
+import time
+
+from src.rate_limit import Quota, RateLimiter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--sources", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    limiter = RateLimiter(source_quota=Quota(1000, 1000), topic_quota=Quota(10_000, 10_000))
+    keys = [(f"source-{i % args.sources}", f"topic.{i % 16}") for i in range(args.checks)]
+
+    start = time.perf_counter()
+    for i in range(0, len(keys), args.batch):
+        limiter.admit(keys[i:i + args.batch])
+    elapsed = time.perf_counter() - start
+    print(f"rate limiter: {len(keys):,} checks in {elapsed:.2f}s ({len(keys) / elapsed:,.0f} checks/s), "
+          f"{len(limiter.sources.buckets):,} source buckets")
+
+
+if __name__ == "__main__":
+    main()
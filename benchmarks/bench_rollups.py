@@ -0,0 +1,73 @@
+"""
+Benchmark RollupStore: kecepatan ingest dan latency query per rentang waktu.
+
+Event metrik disebar merata selama --days hari terakhir (seperti sistem yang
+sudah berjalan sebulan); query 1 jam, 1 hari, dan 30 hari masing-masing
+dilayani tier 10s, 1m, dan 1h.
+
+Usage:
+    python -m benchmarks.bench_rollups [--events 1000000] [--days 30] [--sources 50]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from src.rollups import RollupStore, _iso
+
+TIERS = "10s:6h,1m:7d,1h:90d"
+
+
+def make_records(n: int, now: float, days: float, sources: int, rng: random.Random) -> list[bytes]:
+    span = days * 86400
+    return [
+        json.dumps({
+            "topic": "system.metrics", "event_id": f"evt-{i}",
+            "timestamp": _iso(now - span * i / n), "source": f"node-{rng.randrange(sources)}",
+            "payload": {"random_value": rng.uniform(0, 100)},
+        }, separators=(",", ":")).encode("utf-8")
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--sources", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=2000)
+    args = parser.parse_args()
+
+    now = time.time()
+    rng = random.Random(0)
+    records = make_records(args.events, now, args.days, args.sources, rng)
+    store = RollupStore(tiers=TIERS, clock=lambda: now)
+
+    start = time.perf_counter()
+    for i in range(0, len(records), args.batch):
+        store.add_records(records[i:i + args.batch])
+    elapsed = time.perf_counter() - start
+    tiers = store.snapshot()["tiers"]
+    print(f"ingest: {args.events:,} events in {elapsed:.1f}s ({args.events / elapsed:,.0f} events/s)")
+    for name, tier in tiers.items():
+        print(f"  tier {name:>3}: {tier['buckets']:>6,} buckets, {tier['series']:>8,} series")
+
+    for label, seconds in (("1 hour", 3600), ("1 day", 86400), ("30 days", 30 * 86400)):
+        for group in (False, True):
+            timings = []
+            for _ in range(20):
+                result = store.query(
+                    "system.metrics", now - seconds, now, field="random_value", group_by_source=group,
+                )
+                timings.append(result["took_ms"])
+            points = (
+                sum(len(s) for s in result["series"].values()) if group else len(result["points"])
+            )
+            print(f"query {label:>7}{' by source' if group else '':>10}: tier {result['tier']:>3}, "
+                  f"{points:>6,} points, median {statistics.median(timings):.2f} ms, "
+                  f"max {max(timings):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
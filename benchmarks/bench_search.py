@@ -0,0 +1,88 @@
+"""
+Benchmark SearchIndex: kecepatan indexing, ukuran index, dan latency query.
+
+Usage:
+    python -m benchmarks.bench_search [--docs 2000000] [--path /tmp/search-bench]
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+
+from src.search_index import SearchIndex
+
+WORDS = [f"w{i}" for i in range(5000)]
+COMMON = ["error", "request", "user", "timeout", "payment", "login", "cache", "retry"]
+TOPICS = [f"service.{i}" for i in range(20)]
+
+
+def make_records(start: int, n: int, rng: random.Random) -> list[bytes]:
+    records = []
+    for i in range(start, start + n):
+        # Distribusi Zipf-like: beberapa kata umum + kata jarang + id unik
+        words = rng.sample(COMMON, 2) + [WORDS[int(rng.paretovariate(1.2)) % len(WORDS)] for _ in range(4)]
+        records.append(json.dumps({
+            "topic": TOPICS[i % len(TOPICS)], "event_id": f"evt-{i}",
+            "timestamp": "2025-01-01T00:00:00Z", "source": "bench",
+            "payload": {"message": " ".join(words) + f" trace{i}"},
+        }, separators=(",", ":")).encode("utf-8"))
+    return records
+
+
+def percentiles(values: list[float]) -> str:
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return f"p50={pick(0.5):7.2f}ms p99={pick(0.99):7.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=2_000_000)
+    parser.add_argument("--path", help="Direktori segment (default tempdir)")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    path = args.path or tempfile.mkdtemp(prefix="search-bench-")
+    index = SearchIndex(path, memtable_docs=100_000, merge_factor=4)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    chunk = 50_000
+    for offset in range(0, args.docs, chunk):
+        index.add_records(make_records(offset, min(chunk, args.docs - offset), rng))
+    index.flush_memtable()
+    index_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index.merge_pending()
+    merge_time = time.perf_counter() - start
+
+    stats = index.snapshot()
+    print(f"docs={stats['docs']:,} segments={stats['segments']} merges={stats['merges']}")
+    print(f"indexing: {args.docs / index_time:,.0f} docs/s, merge: {merge_time:.1f}s")
+    print(f"index size: {stats['segment_bytes'] / 2**20:,.1f} MiB "
+          f"({stats['segment_bytes'] / args.docs:.0f} B/doc incl. stored docs)")
+
+    queries = {
+        "rare term": lambda: f"trace{rng.randrange(args.docs)}",
+        "common term": lambda: rng.choice(COMMON),
+        "common AND common": lambda: " ".join(rng.sample(COMMON, 2)),
+        "common + topic": lambda: rng.choice(COMMON),
+        "mid-frequency term": lambda: WORDS[rng.randrange(50, 500)],
+        "rare AND common": lambda: f"trace{rng.randrange(args.docs)} {rng.choice(COMMON)}",
+    }
+    for name, make_query in queries.items():
+        latencies = []
+        for _ in range(args.queries):
+            topic = rng.choice(TOPICS) if name.endswith("topic") else None
+            t0 = time.perf_counter()
+            index.search(make_query(), topic=topic, limit=50)
+            latencies.append(time.perf_counter() - t0)
+        print(f"{name:>20}: {percentiles(latencies)}")
+
+    if not args.path:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
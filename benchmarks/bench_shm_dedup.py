@@ -0,0 +1,106 @@
+"""
+Benchmark dedup multi-proses: SQLite saja vs SharedMemoryDedupStore di depan SQLite.
+
+Setiap worker (proses terpisah, seperti uvicorn --workers N) menjalankan
+mark_processed_many per batch atas workload yang sama dengan rasio duplikat
+tertentu; duplikat antar worker dan di dalam workload hanya menyentuh SQLite
+jika tidak tertahan di tabel bersama.
+
+Usage:
+    python -m benchmarks.bench_shm_dedup [--keys 100000] [--workers 4] [--dup-ratio 0.5]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from src.dedup_shm import SharedFingerprintTable, SharedMemoryDedupStore
+from src.dedup_store import DedupStore
+
+
+def make_keys(n: int, dup_ratio: float, seed: int) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    unique = int(n * (1 - dup_ratio))
+    keys = [(f"topic.{i % 8}", f"evt-{i}") for i in range(unique)]
+    keys += [keys[rng.randrange(unique)] for _ in range(n - unique)]
+    rng.shuffle(keys)
+    return keys
+
+
+def worker(mode, name, db_path, lock_dir, capacity, keys, batch, go, results):
+    backend = DedupStore(db_path)
+    if mode == "shm":
+        store = SharedMemoryDedupStore(
+            backend, SharedFingerprintTable(name, capacity=capacity, lock_dir=lock_dir)
+        )
+    else:
+        store = backend
+    go.wait()
+    start = time.perf_counter()
+    new = 0
+    for i in range(0, len(keys), batch):
+        new += sum(store.mark_processed_many(keys[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    backend_keys = store.snapshot()["backend_keys"] if mode == "shm" else len(keys)
+    store.close()
+    results.put((new, backend_keys, elapsed))
+
+
+def run(mode: str, args) -> dict:
+    tmp = tempfile.mkdtemp(prefix="shm-bench-")
+    ctx = multiprocessing.get_context("spawn")
+    go, results = ctx.Event(), ctx.Queue()
+    name = f"uts-bench-{os.getpid()}"
+    # Tabel dibuat oleh parent agar tetap hidup selama semua worker berjalan
+    table = SharedFingerprintTable(name, capacity=args.capacity, lock_dir=tmp) if mode == "shm" else None
+    db_path = os.path.join(tmp, "dedup.db")
+    DedupStore(db_path).close()
+    procs = []
+    for w in range(args.workers):
+        keys = make_keys(args.keys, args.dup_ratio, seed=w % 2)
+        procs.append(ctx.Process(
+            target=worker,
+            args=(mode, name, db_path, tmp, args.capacity, keys, args.batch, go, results),
+        ))
+    for p in procs:
+        p.start()
+    time.sleep(1.0)
+    start = time.perf_counter()
+    go.set()
+    collected = [results.get() for _ in procs]
+    wall = time.perf_counter() - start
+    for p in procs:
+        p.join()
+    if table is not None:
+        table.close()
+    shutil.rmtree(tmp)
+    total = args.keys * args.workers
+    return {
+        'new': sum(c[0] for c in collected),
+        'sqlite_keys': sum(c[1] for c in collected),
+        'keys_per_s': total / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100_000, help="Key per worker")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dup-ratio", type=float, default=0.5)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.keys:,} keys, dup ratio {args.dup_ratio}, batch {args.batch}, "
+          f"{os.cpu_count()} CPU")
+    for mode in ("sqlite", "shm"):
+        r = run(mode, args)
+        print(f"{mode:>7}: {r['keys_per_s']:>10,.0f} keys/s  new={r['new']:,}  "
+              f"keys sent to SQLite={r['sqlite_keys']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark TransformStage: pipeline inline di event loop vs process pool.
+
+Mengukur throughput (event/s) dan lag event loop maksimum selama transform
+berjalan, serta overhead submit per event (pickle per event) dibanding chunk
+NDJSON per batch. Speedup process pool hanya terlihat pada host multi-core.
+
+Usage:
+    python -m benchmarks.bench_transforms [--events 50000] [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.sinks import BaseSink
+from src.transforms import TransformStage, _init_worker, _run_chunk
+
+SPEC = "parse,redact,enrich"
+
+
+class _CountSink(BaseSink):
+    def __init__(self):
+        super().__init__("count", batch_size=100_000, flush_interval=0.01, max_buffer=10_000_000)
+
+    async def _write(self, batch):
+        pass
+
+
+def make_records(n: int) -> list[bytes]:
+    random.seed(0)
+    records = []
+    for i in range(n):
+        message = (
+            f"user=user{i % 500} email=user{i % 500}@example.com ip=10.0.{i % 256}.{i % 200} "
+            f"path=/api/v1/items/{i} status={random.choice([200, 404, 500])} "
+            f"latency_ms={random.randint(1, 900)} token=sk{random.getrandbits(64):x}"
+        )
+        records.append(json.dumps({
+            "topic": f"app.{i % 8}", "event_id": f"evt-{i:08d}",
+            "timestamp": "2025-01-01T00:00:00Z", "source": f"service-{i % 20}",
+            "payload": {"level": random.choice(["info", "warn", "err"]), "message": message},
+        }).encode("utf-8"))
+    return records
+
+
+async def _lag_probe(stop: asyncio.Event, result: dict):
+    while not stop.is_set():
+        expected = time.perf_counter() + 0.005
+        await asyncio.sleep(0.005)
+        result["max_lag"] = max(result["max_lag"], time.perf_counter() - expected)
+
+
+async def run_stage(records: list[bytes], workers: int) -> tuple[float, float]:
+    """Return (event/s, max loop lag ms)"""
+    sink = _CountSink()
+    stage = TransformStage(SPEC, workers=workers, downstream=[sink],
+                           batch_size=2000, chunk_size=500, max_buffer=len(records))
+    stage.start()
+    sink.start()
+    if workers:
+        # Warm-up: spawn worker sebelum pengukuran
+        stage.offer(records[:workers * 500])
+        await stage.flush()
+
+    stop = asyncio.Event()
+    lag = {"max_lag": 0.0}
+    probe = asyncio.create_task(_lag_probe(stop, lag))
+    start = time.perf_counter()
+    for i in range(0, len(records), 1000):
+        stage.offer(records[i:i + 1000])
+        await asyncio.sleep(0)
+    await stage.flush()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    await stage.stop()
+    await sink.stop()
+    return len(records) / elapsed, lag["max_lag"] * 1000
+
+
+def run_per_event(records: list[bytes], workers: int) -> float:
+    """Submit satu event per task (pickle per event) sebagai pembanding"""
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(SPEC,)) as pool:
+        list(pool.map(_run_chunk, records[:workers * 10]))
+        start = time.perf_counter()
+        list(pool.map(_run_chunk, records))
+        return len(records) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    records = make_records(args.events)
+    print(f"cpu_count={os.cpu_count()} events={args.events:,} pipeline={SPEC}")
+    print(f"{'mode':>22} {'event/s':>10} {'max lag ms':>11}")
+    rate, lag = asyncio.run(run_stage(records, 0))
+    print(f"{'inline (event loop)':>22} {rate:>10,.0f} {lag:>11.1f}")
+    for workers in args.workers:
+        rate, lag = asyncio.run(run_stage(records, workers))
+        print(f"{f'pool x{workers} (chunked)':>22} {rate:>10,.0f} {lag:>11.1f}")
+    for workers in args.workers:
+        rate = run_per_event(records, workers)
+        print(f"{f'pool x{workers} (per-event)':>22} {rate:>10,.0f} {'-':>11}")
+
+
+if __name__ == "__main__":
+    main()
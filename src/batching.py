@@ -0,0 +1,123 @@
+"""
+Adaptive micro-batching untuk EventConsumer.
+
+Ukuran batch dan linger time di-tune dari kedalaman queue dan latency commit
+ke dedup store, mirip congestion control TCP (slow start + AIMD):
+- Saat idle (queue kosong) linger turun ke 0 sehingga event diproses tanpa tambahan latency.
+- Saat burst (batch penuh dan queue masih berisi) batch size tumbuh eksponensial
+  sampai ssthresh, lalu linear.
+- Jika latency commit melewati target, batch size dan linger dipotong setengah.
+"""
+from typing import Any, Dict
+
+
+class AdaptiveBatcher:
+    """
+    Controller batch size dan linger time untuk consumer.
+    """
+
+    def __init__(
+        self,
+        min_batch: int = 1,
+        max_batch: int = 2000,
+        target_latency: float = 0.05,
+        max_linger: float = 0.005,
+        initial_batch: int = 16,
+        ewma_alpha: float = 0.2,
+    ):
+        """
+        Initialize controller.
+
+        Args:
+            min_batch: Batas bawah batch size
+            max_batch: Batas atas batch size
+            target_latency: Target latency commit per batch (detik)
+            max_linger: Linger time maksimum untuk mengumpulkan batch (detik)
+            initial_batch: Batch size awal
+            ewma_alpha: Bobot smoothing untuk rata-rata latency dan ukuran batch
+        """
+        if not 1 <= min_batch <= max_batch:
+            raise ValueError("Require 1 <= min_batch <= max_batch")
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_latency = target_latency
+        self.max_linger = max_linger
+        self.ewma_alpha = ewma_alpha
+
+        self.batch_size = max(min_batch, min(initial_batch, max_batch))
+        self.ssthresh = max_batch
+        self.linger = 0.0
+        self._linger_step = max_linger / 8
+
+        self.avg_latency = 0.0
+        self.avg_batch = 0.0
+        self.batches = 0
+        self.last_decision = "init"
+        self.decisions = {"increase": 0, "decrease": 0, "hold": 0, "idle": 0}
+
+    def record(self, batch_len: int, commit_latency: float, queue_depth: int) -> str:
+        """
+        Update controller setelah satu batch selesai di-commit.
+
+        Args:
+            batch_len: Jumlah event dalam batch
+            commit_latency: Durasi commit ke dedup store (detik)
+            queue_depth: Sisa event di queue setelah batch diambil
+
+        Returns:
+            Keputusan yang diambil: increase, decrease, hold, atau idle
+        """
+        a = self.ewma_alpha
+        self.avg_latency = commit_latency if not self.batches else (1 - a) * self.avg_latency + a * commit_latency
+        self.avg_batch = batch_len if not self.batches else (1 - a) * self.avg_batch + a * batch_len
+        self.batches += 1
+
+        if commit_latency > self.target_latency:
+            # Congestion: multiplicative decrease
+            self.ssthresh = max(self.min_batch, self.batch_size // 2)
+            self.batch_size = self.ssthresh
+            self.linger /= 2
+            decision = "decrease"
+        elif batch_len >= self.batch_size and queue_depth > 0:
+            # Backlog: slow start sampai ssthresh, lalu additive increase
+            if self.batch_size < self.ssthresh:
+                self.batch_size = min(self.max_batch, self.batch_size * 2)
+            else:
+                self.batch_size = min(self.max_batch, self.batch_size + max(1, self.batch_size // 8))
+            # Queue sudah cukup berisi, tidak perlu menunggu
+            self.linger = 0.0
+            decision = "increase"
+        elif queue_depth == 0 and batch_len <= 1:
+            # Idle: jangan tambahkan latency
+            self.linger = 0.0
+            decision = "idle"
+        elif queue_depth == 0:
+            # Queue terkuras sebelum batch penuh: kurangi linger
+            self.linger /= 2
+            decision = "hold"
+        else:
+            # Backlog mulai terbentuk tapi batch belum penuh: tunggu sedikit agar batch terisi
+            self.linger = min(self.max_linger, self.linger + self._linger_step)
+            decision = "hold"
+
+        self.decisions[decision] += 1
+        self.last_decision = decision
+        return decision
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get state controller untuk /stats.
+
+        Returns:
+            Dictionary berisi batch size, linger, rata-rata, dan jumlah keputusan
+        """
+        return {
+            "batch_size": self.batch_size,
+            "linger_ms": round(self.linger * 1000, 3),
+            "ssthresh": self.ssthresh,
+            "avg_batch": round(self.avg_batch, 2),
+            "avg_commit_latency_ms": round(self.avg_latency * 1000, 3),
+            "batches": self.batches,
+            "last_decision": self.last_decision,
+            "decisions": dict(self.decisions),
+        }
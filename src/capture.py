@@ -0,0 +1,192 @@
+"""
+Capture traffic /publish ke file untuk di-replay (lihat src/replay.py).
+
+Format file (seluruhnya dalam satu stream gzip):
+    MAGIC
+    header JSON + "\\n"            (versi, waktu mulai)
+    frame*                         struct "<QI" (offset_us, length) + body request
+
+offset_us adalah waktu kedatangan request relatif terhadap awal capture, dan
+body disimpan persis seperti diterima (single event atau batch), sehingga pola
+burst, ukuran batch, dan duplikasi dapat diputar ulang apa adanya.
+
+Request di-record secara sinkron ke buffer memori (tanpa I/O di handler);
+background task menulis buffer ke file lewat thread setiap flush_interval.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UTSCAP1\n"
+FRAME = struct.Struct("<QI")
+
+
+class CaptureWriter:
+    """
+    Penulis capture file dengan buffer berbatas.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.5,
+        max_pending_bytes: int = 64 * 1024 * 1024,
+        compresslevel: int = 6,
+    ):
+        """
+        Initialize writer.
+
+        Args:
+            path: Path capture file (disarankan berakhiran .cap.gz)
+            flush_interval: Interval penulisan buffer ke file (detik)
+            max_pending_bytes: Batas buffer memori; request di luar batas tidak di-capture
+            compresslevel: Level kompresi gzip
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending_bytes = max_pending_bytes
+        self.compresslevel = compresslevel
+        self.started_at: Optional[str] = None
+        self._start_ns = 0
+        self._file: Optional[gzip.GzipFile] = None
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        # _pending_lock hanya melindungi swap buffer (singkat, aman di event loop);
+        # _lock melindungi file selama kompresi/tulis di thread
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.stats = {'requests': 0, 'bytes': 0, 'dropped': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Buka file dan mulai background flush (harus dipanggil dari event loop)"""
+        if self._running:
+            return
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._start_ns = time.monotonic_ns()
+        self._file = gzip.open(self.path, "wb", compresslevel=self.compresslevel)
+        header = {'version': 1, 'started_at': self.started_at}
+        self._file.write(MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+        self._running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Capture started: {self.path}")
+
+    def record(self, body: bytes):
+        """
+        Catat satu request /publish beserta waktu kedatangannya.
+
+        Args:
+            body: Raw request body
+        """
+        if not self._running:
+            return
+        offset_us = (time.monotonic_ns() - self._start_ns) // 1000
+        frame = FRAME.pack(offset_us, len(body)) + body
+        with self._pending_lock:
+            if self._pending_bytes + len(body) > self.max_pending_bytes:
+                self.stats['dropped'] += 1
+                return
+            self._pending.append(frame)
+            self._pending_bytes += len(body)
+        self.stats['requests'] += 1
+        self.stats['bytes'] += len(body)
+
+    async def _flush_loop(self):
+        while self._running:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self._write_pending)
+
+    def _write_pending(self):
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending, self._pending_bytes = self._pending, [], 0
+            if pending and self._file is not None:
+                self._file.write(b"".join(pending))
+                self._file.flush()
+
+    async def stop(self) -> Dict[str, Any]:
+        """
+        Stop capture, tulis sisa buffer, dan tutup file.
+
+        Returns:
+            Ringkasan capture (snapshot)
+        """
+        if self._running:
+            self._running = False
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            await asyncio.to_thread(self._write_pending)
+            with self._lock:
+                self._file.close()
+                self._file = None
+            logger.info(f"Capture stopped: {self.path} ({self.stats['requests']} requests)")
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'path': self.path,
+            'started_at': self.started_at,
+            **self.stats,
+        }
+
+
+def read_capture(path: str) -> Tuple[Dict[str, Any], Iterator[Tuple[float, bytes]]]:
+    """
+    Baca capture file.
+    File yang terpotong (capture tidak di-stop dengan benar) dibaca sampai
+    frame utuh terakhir.
+
+    Args:
+        path: Path capture file
+
+    Returns:
+        (header, iterator (offset detik, body))
+
+    Raises:
+        ValueError: Jika file bukan capture file
+    """
+    f = gzip.open(path, "rb")
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise ValueError(f"{path} is not a capture file")
+    header = json.loads(f.readline())
+
+    def frames():
+        with f:
+            try:
+                while True:
+                    head = f.read(FRAME.size)
+                    if len(head) < FRAME.size:
+                        return
+                    offset_us, length = FRAME.unpack(head)
+                    body = f.read(length)
+                    if len(body) < length:
+                        return
+                    yield offset_us / 1e6, body
+            except (EOFError, gzip.BadGzipFile):
+                logger.warning(f"Capture file {path} is truncated")
+
+    return header, frames()
+
+
+def iter_body_events(body: bytes) -> List[Dict[str, Any]]:
+    """Ambil list event dari body /publish (single event atau batch)"""
+    data = json.loads(body)
+    return data["events"] if isinstance(data, dict) and "events" in data else [data]
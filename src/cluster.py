@@ -0,0 +1,506 @@
+"""
+Cluster mode: beberapa replica aggregator membentuk consistent-hash ring
+atas (topic, event_id) sehingga setiap key selalu di-dedup oleh satu node.
+
+Event yang diterima node non-pemilik diteruskan ke node pemilik secara batch
+melalui koneksi HTTP persisten. Buffer forwarding per peer berbatas: jika
+buffer peer penuh (mis. peer sedang down), route() menolak request dengan
+PeerBackpressure sehingga /publish membalas 503 alih-alih 202 untuk event
+yang belum tentu terkirim. Perubahan membership memicu key-range handoff:
+key yang pindah pemilik dikirim ke node baru lalu dihapus dari node lama.
+Handoff membaca key per topic di thread terpisah dan mengirimnya per chunk,
+sehingga /publish tidak terblokir. Sampai pemilik lama melaporkan handoff
+selesai, pemilik baru mengecek key yang pindah ke pemilik lama sebelum
+memproses event, sehingga duplikat di jendela handoff tetap terdeteksi.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Header penanda request antar-node (mencegah forwarding/propagasi berulang)
+FORWARDED_HEADER = "X-Cluster-Forwarded"
+
+
+def parse_members(spec: str) -> Dict[str, str]:
+    """
+    Parse daftar node dari format "id=url,id=url".
+
+    Args:
+        spec: String konfigurasi, mis. "a=http://127.0.0.1:8081,b=http://127.0.0.1:8082"
+
+    Returns:
+        Mapping node_id -> base URL
+    """
+    members = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        node_id, sep, url = item.partition("=")
+        if not sep or not node_id.strip() or not url.strip():
+            raise ValueError(f"Invalid cluster member spec: {item!r}")
+        members[node_id.strip()] = url.strip().rstrip("/")
+    return members
+
+
+class HashRing:
+    """
+    Consistent hash ring dengan virtual nodes.
+    Posisi dihitung dari hash MD5 sehingga deterministik di semua node.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 64):
+        """
+        Initialize ring.
+
+        Args:
+            nodes: Daftar node_id anggota ring
+            vnodes: Jumlah virtual node per node (pemerataan distribusi key)
+        """
+        self.vnodes = vnodes
+        self.nodes = sorted(set(nodes))
+        points = []
+        for node in self.nodes:
+            for i in range(vnodes):
+                points.append((self._hash(f"{node}#{i}"), node))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._owners = [n for _, n in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def owner(self, topic: str, event_id: str) -> str:
+        """
+        Tentukan node pemilik key (topic, event_id).
+
+        Returns:
+            node_id pemilik
+        """
+        if not self._hashes:
+            raise LookupError("Hash ring has no members")
+        h = self._hash(f"{topic}\x00{event_id}")
+        idx = bisect.bisect_right(self._hashes, h)
+        if idx == len(self._hashes):
+            idx = 0
+        return self._owners[idx]
+
+
+class PeerBackpressure(Exception):
+    """Buffer forwarding ke peer penuh; request harus di-retry nanti"""
+
+    def __init__(self, peer_id: str, pending: int, retry_after: float):
+        super().__init__(f"Forward buffer for peer {peer_id} is full ({pending} event(s) pending)")
+        self.peer_id = peer_id
+        self.pending = pending
+        self.retry_after = retry_after
+
+
+class PeerLink:
+    """
+    Koneksi persisten ke satu peer dengan buffer forwarding berbatas.
+    Event di-flush secara batch (ukuran atau linger time), dengan retry jika peer gagal.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        peer_id: str,
+        url: str,
+        batch_size: int = 500,
+        linger: float = 0.01,
+        retry_backoff: float = 0.5,
+        max_buffer: int = 50_000,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.node_id = node_id
+        self.peer_id = peer_id
+        self.url = url
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retry_backoff = retry_backoff
+        self.max_buffer = max_buffer
+        self._client = httpx.AsyncClient(base_url=url, timeout=30.0, transport=transport)
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.stats = {'forwarded': 0, 'batches': 0, 'errors': 0, 'rejected': 0, 'dropped': 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def has_room(self, n: int) -> bool:
+        return len(self._buffer) + n <= self.max_buffer
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop link setelah mencoba mengirim sisa buffer"""
+        self._running = False
+        self._wakeup.set()
+        if self._task:
+            await self._task
+        await self._client.aclose()
+
+    def enqueue(self, events: List[Dict[str, Any]]):
+        """Tambahkan event ke buffer; pemanggil memeriksa has_room() lebih dulu"""
+        self._buffer.extend(events)
+        self._wakeup.set()
+
+    async def _flush_loop(self):
+        while self._running or self._buffer:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._running and len(self._buffer) < self.batch_size:
+                # Tunggu sebentar agar event berikutnya ikut satu batch
+                await asyncio.sleep(self.linger)
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                if await self._send(batch):
+                    del self._buffer[:len(batch)]
+                elif not self._running:
+                    logger.error(
+                        f"Dropping {len(self._buffer)} undelivered event(s) for peer {self.peer_id}"
+                    )
+                    self.stats['dropped'] += len(self._buffer)
+                    self._buffer.clear()
+                else:
+                    await asyncio.sleep(self.retry_backoff)
+
+    async def _send(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            response = await self._client.post(
+                "/publish",
+                json={"events": batch},
+                headers={FORWARDED_HEADER: self.node_id},
+            )
+            response.raise_for_status()
+            self.stats['forwarded'] += len(batch)
+            self.stats['batches'] += 1
+            return True
+        except httpx.HTTPError as e:
+            self.stats['errors'] += 1
+            logger.warning(f"Forward to peer {self.peer_id} failed: {e}")
+            return False
+
+    async def post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Kirim request kontrol (handoff/membership) lewat koneksi yang sama"""
+        response = await self._client.post(
+            path, json=body, headers={FORWARDED_HEADER: self.node_id}
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+class ClusterRouter:
+    """
+    Routing event ke node pemilik berdasarkan HashRing.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        members: Dict[str, str],
+        dedup_store,
+        vnodes: int = 64,
+        batch_size: int = 500,
+        linger: float = 0.01,
+        handoff_batch_size: int = 1000,
+        max_forward_buffer: int = 50_000,
+        handoff_timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Initialize router.
+
+        Args:
+            node_id: ID node ini (harus ada di members)
+            members: Mapping node_id -> base URL semua anggota cluster
+            dedup_store: Dedup backend lokal (sumber key saat handoff)
+            vnodes: Virtual nodes per anggota ring
+            batch_size: Maksimum event per batch forwarding
+            linger: Waktu tunggu (detik) untuk mengumpulkan batch
+            handoff_batch_size: Jumlah key per request handoff
+            max_forward_buffer: Kapasitas buffer forwarding per peer (event)
+            handoff_timeout: Batas waktu (detik) menunggu pemilik lama menyelesaikan handoff
+            transport: Optional httpx transport (untuk testing)
+        """
+        if node_id not in members:
+            raise ValueError(f"Node {node_id!r} is not in cluster members")
+        self.node_id = node_id
+        self.dedup_store = dedup_store
+        self.vnodes = vnodes
+        self.batch_size = batch_size
+        self.linger = linger
+        self.handoff_batch_size = handoff_batch_size
+        self.max_forward_buffer = max_forward_buffer
+        self.handoff_timeout = handoff_timeout
+        self._transport = transport
+        self.members: Dict[str, str] = {}
+        self.ring = HashRing([], vnodes)
+        self._links: Dict[str, PeerLink] = {}
+        self._running = False
+        self._membership_lock = asyncio.Lock()
+        # Ring sebelum perubahan membership terakhir dan pemilik lama yang handoff-nya
+        # belum selesai (node_id -> deadline loop.time())
+        self._previous_ring: Optional[HashRing] = None
+        self._awaiting: Dict[str, float] = {}
+        # Membership (sorted node_id) yang handoff-nya sudah dilaporkan selesai per node
+        self._completed: Dict[str, Tuple[str, ...]] = {}
+        self.stats = {'local': 0, 'handoff_sent': 0, 'handoff_received': 0, 'handoff_checked': 0}
+        self._apply_members(members)
+
+        logger.info(f"ClusterRouter initialized: node={node_id}, members={sorted(members)}")
+
+    def _apply_members(self, members: Dict[str, str]):
+        """Ganti ring dan buka/tutup link peer sesuai membership baru"""
+        self.members = dict(members)
+        self.ring = HashRing(members, self.vnodes)
+        for peer_id, url in members.items():
+            if peer_id == self.node_id:
+                continue
+            link = self._links.get(peer_id)
+            if link is None or link.url != url:
+                self._links[peer_id] = PeerLink(
+                    self.node_id, peer_id, url,
+                    batch_size=self.batch_size,
+                    linger=self.linger,
+                    max_buffer=self.max_forward_buffer,
+                    transport=self._transport,
+                )
+                if self._running:
+                    self._links[peer_id].start()
+
+    async def start(self):
+        self._running = True
+        for link in self._links.values():
+            link.start()
+
+    async def stop(self):
+        self._running = False
+        for link in self._links.values():
+            await link.stop()
+
+    def route(self, events: list) -> list:
+        """
+        Pisahkan event lokal dan teruskan sisanya ke node pemilik.
+
+        Args:
+            events: List of Event
+
+        Returns:
+            Event yang dimiliki node ini (untuk dimasukkan ke queue lokal)
+
+        Raises:
+            PeerBackpressure: Jika buffer forwarding peer tujuan penuh
+        """
+        local = []
+        remote: Dict[str, list] = {}
+        for event in events:
+            owner = self.ring.owner(event.topic, event.event_id)
+            if owner == self.node_id:
+                local.append(event)
+            else:
+                remote.setdefault(owner, []).append(event)
+        # Semua atau tidak sama sekali: request ditolak utuh jika salah satu buffer peer
+        # penuh, sehingga client cukup me-retry request yang sama (aman karena dedup)
+        for owner, owned in remote.items():
+            link = self._links[owner]
+            if not link.has_room(len(owned)):
+                link.stats['rejected'] += len(owned)
+                raise PeerBackpressure(owner, link.pending, link.retry_backoff)
+        for owner, owned in remote.items():
+            self._links[owner].enqueue([event.model_dump() for event in owned])
+        self.stats['local'] += len(local)
+        return local
+
+    async def update_members(self, members: Dict[str, str], propagate: bool = True) -> Dict[str, Any]:
+        """
+        Terapkan membership baru dan lakukan key-range handoff.
+
+        Args:
+            members: Mapping node_id -> URL yang baru
+            propagate: Kirim membership ke semua node lama dan baru
+
+        Returns:
+            Ringkasan handoff
+        """
+        async with self._membership_lock:
+            old_members = dict(self.members)
+            epoch = tuple(sorted(members))
+            self._previous_ring = self.ring
+            # Jika node ini tidak ada di membership baru, semua key-nya akan diserahkan
+            self._apply_members(members)
+            # Key yang pindah ke node ini dicek ke pemilik lama sampai handoff-nya selesai
+            deadline = asyncio.get_running_loop().time() + self.handoff_timeout
+            self._awaiting = {
+                node: deadline for node in old_members
+                if node != self.node_id and self._completed.get(node) != epoch
+            }
+
+            moved, complete = await self._handoff()
+            if complete:
+                await self._announce_complete(members)
+
+            if propagate:
+                peers = (set(old_members) | set(members)) - {self.node_id}
+                for peer_id in sorted(peers):
+                    link = self._links.get(peer_id)
+                    if link is None:
+                        continue
+                    try:
+                        await link.post("/cluster/members", {"nodes": members, "propagate": False})
+                    except httpx.HTTPError as e:
+                        logger.error(f"Failed to propagate membership to {peer_id}: {e}")
+
+            # Tutup link ke node yang sudah tidak menjadi anggota (link ke pemilik
+            # lama dipertahankan sampai handoff-nya selesai)
+            for peer_id in list(self._links):
+                if peer_id not in members and peer_id not in self._awaiting:
+                    await self._links.pop(peer_id).stop()
+
+            logger.info(f"Membership updated: {sorted(members)}, handed off {moved} key(s)")
+            return {"members": sorted(members), "handed_off": moved}
+
+    async def _handoff(self) -> Tuple[int, bool]:
+        """
+        Kirim key yang sekarang dimiliki node lain, lalu hapus dari store lokal.
+        Key dibaca per topic dan dihapus per chunk di thread terpisah.
+
+        Returns:
+            (jumlah key yang dipindahkan, True jika semua chunk terkirim)
+        """
+        moved = 0
+        complete = True
+        for topic in await asyncio.to_thread(self.dedup_store.get_all_topics):
+            keys = await asyncio.to_thread(self.dedup_store.get_events_by_topic, topic)
+            by_owner: Dict[str, List[Tuple[str, str]]] = {}
+            for topic_, event_id in keys:
+                owner = self.ring.owner(topic_, event_id)
+                if owner != self.node_id:
+                    by_owner.setdefault(owner, []).append((topic_, event_id))
+            del keys
+
+            for owner, owned in by_owner.items():
+                link = self._links[owner]
+                for i in range(0, len(owned), self.handoff_batch_size):
+                    chunk = owned[i:i + self.handoff_batch_size]
+                    try:
+                        await link.post("/cluster/handoff", {"keys": chunk})
+                    except httpx.HTTPError as e:
+                        # Key tetap disimpan lokal agar tidak hilang; handoff dapat diulang
+                        logger.error(f"Handoff to {owner} failed: {e}")
+                        complete = False
+                        continue
+                    await asyncio.to_thread(self.dedup_store.remove_many, chunk)
+                    moved += len(chunk)
+        self.stats['handoff_sent'] += moved
+        return moved, complete
+
+    async def _announce_complete(self, members: Dict[str, str]):
+        """Beri tahu anggota baru bahwa node ini tidak lagi memegang key mereka"""
+        body = {"keys": [], "complete": True, "node": self.node_id, "members": sorted(members)}
+        for peer_id in sorted(set(members) - {self.node_id}):
+            try:
+                await self._links[peer_id].post("/cluster/handoff", body)
+            except httpx.HTTPError as e:
+                logger.error(f"Failed to announce handoff completion to {peer_id}: {e}")
+
+    async def handoff_complete(self, node: str, members: List[str]):
+        """
+        Catat bahwa node sudah menyelesaikan handoff untuk membership members.
+
+        Args:
+            node: node_id pemilik lama
+            members: Membership (node_id) tempat handoff dilakukan
+        """
+        epoch = tuple(sorted(members))
+        self._completed[node] = epoch
+        if epoch == tuple(sorted(self.members)) and self._awaiting.pop(node, None) is not None:
+            logger.info(f"Handoff from {node} complete")
+            await self._close_stale_link(node)
+
+    async def _close_stale_link(self, node: str):
+        if node not in self.members and node not in self._awaiting and node in self._links:
+            await self._links.pop(node).stop()
+
+    async def check_moved(self, events: list):
+        """
+        Cek event yang key-nya baru pindah ke node ini ke pemilik lama, selama
+        handoff pemilik lama belum selesai. Key yang sudah diproses di pemilik
+        lama ditandai processed lokal sehingga consumer men-drop event tersebut
+        sebagai duplikat.
+
+        Args:
+            events: Event yang akan diproses lokal
+
+        Raises:
+            PeerBackpressure: Jika pemilik lama tidak dapat dicek (request harus di-retry)
+        """
+        if not self._awaiting:
+            return
+        now = asyncio.get_running_loop().time()
+        for node, deadline in list(self._awaiting.items()):
+            if now >= deadline:
+                logger.warning(f"Handoff from {node} not confirmed within {self.handoff_timeout}s")
+                del self._awaiting[node]
+                await self._close_stale_link(node)
+
+        by_old: Dict[str, List[Tuple[str, str]]] = {}
+        for event in events:
+            old = self._previous_ring.owner(event.topic, event.event_id)
+            if old in self._awaiting:
+                by_old.setdefault(old, []).append((event.topic, event.event_id))
+        for old, keys in by_old.items():
+            try:
+                reply = await self._links[old].post("/cluster/contains", {"keys": keys})
+            except httpx.HTTPError as e:
+                logger.warning(f"Cannot check moved keys at previous owner {old}: {e}")
+                raise PeerBackpressure(old, len(keys), 1.0) from e
+            processed = [key for key, found in zip(keys, reply["processed"]) if found]
+            if processed:
+                await asyncio.to_thread(self.dedup_store.mark_processed_many, processed)
+            self.stats['handoff_checked'] += len(keys)
+
+    async def contains(self, keys: List[Tuple[str, str]]) -> List[bool]:
+        """Cek key di store lokal (dipanggil pemilik baru selama handoff)"""
+        return await asyncio.to_thread(self.dedup_store.contains_many, [tuple(k) for k in keys])
+
+    def accept_handoff(self, keys: List[Tuple[str, str]]) -> int:
+        """
+        Terima key dari node lain dan tandai sebagai processed.
+
+        Returns:
+            Jumlah key baru yang tersimpan
+        """
+        results = self.dedup_store.mark_processed_many([tuple(k) for k in keys])
+        accepted = sum(results)
+        self.stats['handoff_received'] += accepted
+        return accepted
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'node_id': self.node_id,
+            'members': self.members,
+            'local': self.stats['local'],
+            'handoff_sent': self.stats['handoff_sent'],
+            'handoff_received': self.stats['handoff_received'],
+            'handoff_checked': self.stats['handoff_checked'],
+            'awaiting_handoff': sorted(self._awaiting),
+            'peers': {
+                peer_id: {**link.stats, 'pending': link.pending}
+                for peer_id, link in self._links.items()
+            },
+        }
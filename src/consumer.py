@@ -4,30 +4,56 @@ Menggunakan asyncio.Queue untuk pipeline publisher → consumer.
 """
 import asyncio
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
-from .models import Event
-from .dedup_store import DedupStore
+from .models import Event, QueuedEvent
+from .dedup_store import BaseDedupStore
+from .batching import AdaptiveBatcher
+from .sinks import BaseSink, BufferedStage, encode_event
+from .transforms import TransformStage
 
 logger = logging.getLogger(__name__)
 
+# Item di queue: Event (Pydantic) atau QueuedEvent (representasi compact)
+QueueItem = Union[Event, QueuedEvent]
+
 
 class EventConsumer:
     """
     Idempotent consumer yang memproses event dari queue.
     Menerapkan at-least-once delivery semantics dengan deduplication.
+    Event diambil dari queue dalam micro-batch yang ukurannya diatur AdaptiveBatcher.
+    Event unik diteruskan ke output sink (jika ada) tanpa menunggu flush sink,
+    melalui TransformStage jika transform dikonfigurasi. Jika buffer output
+    penuh, consumer menunggu sebelum dedup commit (backpressure).
     """
     
-    def __init__(self, dedup_store: DedupStore, queue: asyncio.Queue):
+    def __init__(
+        self,
+        dedup_store: BaseDedupStore,
+        queue: asyncio.Queue,
+        batcher: Optional[AdaptiveBatcher] = None,
+        sinks: Optional[List[BaseSink]] = None,
+        transformer: Optional[TransformStage] = None
+    ):
         """
         Initialize consumer.
         
         Args:
-            dedup_store: DedupStore instance untuk deduplication
-            queue: asyncio.Queue untuk menerima event
+            dedup_store: Dedup backend (BaseDedupStore) untuk deduplication
+            queue: asyncio.Queue atau FairEventQueue untuk menerima event
+            batcher: Controller adaptive micro-batching (default AdaptiveBatcher())
+            sinks: Output sink untuk event unik (default tidak ada)
+            transformer: Stage transform sebelum sink (downstream-nya adalah sinks)
         """
         self.dedup_store = dedup_store
         self.queue = queue
+        self.batcher = batcher or AdaptiveBatcher()
+        self.sinks = sinks or []
+        self.transformer = transformer
+        # Event unik masuk ke transformer jika ada, jika tidak langsung ke sink
+        self._outputs: List[BufferedStage] = [transformer] if transformer else self.sinks
         self.running = False
         self._task = None
         
@@ -45,6 +71,10 @@ class EventConsumer:
         """Start consumer background task"""
         if not self.running:
             self.running = True
+            for sink in self.sinks:
+                sink.start()
+            if self.transformer:
+                self.transformer.start()
             self._task = asyncio.create_task(self._consume_loop())
             logger.info("EventConsumer started")
     
@@ -54,6 +84,11 @@ class EventConsumer:
             self.running = False
             if self._task:
                 await self._task
+            # Flush sisa buffer transformer lalu sink setelah tidak ada event baru
+            if self.transformer:
+                await self.transformer.stop()
+            for sink in self.sinks:
+                await sink.stop()
             logger.info("EventConsumer stopped")
     
     async def _consume_loop(self):
@@ -64,65 +99,132 @@ class EventConsumer:
             try:
                 # Wait for event with timeout to allow graceful shutdown
                 event = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                await self._process_event(event)
-                self.queue.task_done()
             except asyncio.TimeoutError:
                 # No event received, continue loop
                 continue
+            
+            batch = await self._drain_batch(event)
+            try:
+                await self._process_batch(batch)
             except Exception as e:
                 logger.error(f"Error in consumer loop: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
         
         logger.info("Consumer loop stopped")
     
-    async def _process_event(self, event: Event):
+    async def _drain_batch(self, first: QueueItem) -> list[QueueItem]:
         """
-        Process single event dengan idempotency check.
+        Kumpulkan micro-batch: ambil event yang sudah ada di queue, lalu tunggu
+        paling lama linger time (dari AdaptiveBatcher) untuk event berikutnya.
         
         Args:
-            event: Event to process
+            first: Event pertama yang sudah diambil dari queue
+            
+        Returns:
+            List of events (maksimum batcher.batch_size)
         """
-        self.stats['received'] += 1
+        batch = [first]
+        limit = self.batcher.batch_size
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batcher.linger
         
-        # Check for duplicate using (topic, event_id)
-        if self.dedup_store.is_duplicate(event.topic, event.event_id):
-            self.stats['duplicate_dropped'] += 1
-            logger.info(
-                f"Duplicate event dropped: topic={event.topic}, "
-                f"event_id={event.event_id}, source={event.source}"
-            )
-            return
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _process_batch(self, batch: list[QueueItem]):
+        """
+        Process micro-batch dengan idempotency check.
+        Dedup dilakukan dengan satu operasi atomik mark_processed_many per batch.
+        
+        Event diserahkan ke output sebelum dedup commit: consumer menunggu ruang
+        di buffer output lalu mencatat event ke outbox (jika aktif), sehingga
+        event yang sudah ditandai processed tidak bisa hilang sebelum sampai ke sink.
+        
+        Args:
+            batch: Events to process
+        """
+        self.stats['received'] += len(batch)
+        
+        staged = []
+        if self._outputs:
+            # Serialize sekali untuk semua sink; duplikat dibatalkan setelah commit
+            records = [encode_event(event) for event in batch]
+            for output in self._outputs:
+                await output.wait_for_room(len(records))
+            staged = [output.prepare(records) for output in self._outputs]
+        
+        # Mark as processed (atomic insert-or-ignore untuk seluruh batch)
+        start = time.perf_counter()
+        results = self.dedup_store.mark_processed_many(
+            [(event.topic, event.event_id) for event in batch]
+        )
+        self.batcher.record(len(batch), time.perf_counter() - start, self.queue.qsize())
+        
+        for output, entries in zip(self._outputs, staged):
+            output.commit(entries, results)
         
-        # Mark as processed (atomic operation)
-        if self.dedup_store.mark_processed(event.topic, event.event_id):
+        processed = []
+        for event, is_new in zip(batch, results):
+            if not is_new:
+                self.stats['duplicate_dropped'] += 1
+                logger.info(
+                    f"Duplicate event dropped: topic={event.topic}, "
+                    f"event_id={event.event_id}, source={event.source}"
+                )
+                continue
+            
             self.stats['unique_processed'] += 1
             logger.info(
                 f"Event processed: topic={event.topic}, "
                 f"event_id={event.event_id}, source={event.source}"
             )
             
+            processed.append(event)
+        
+        if processed:
             # Simulate event processing (dapat diganti dengan logic sesungguhnya)
-            await self._do_process(event)
-        else:
-            # Race condition: another thread marked it first
-            self.stats['duplicate_dropped'] += 1
-            logger.info(
-                f"Duplicate event (race condition): topic={event.topic}, "
-                f"event_id={event.event_id}"
-            )
+            await self._do_process_batch(processed)
     
-    async def _do_process(self, event: Event):
+    async def _process_event(self, event: QueueItem):
         """
-        Actual event processing logic.
-        Implementasi dapat disesuaikan dengan kebutuhan (mis. aggregasi, transform, dll).
+        Process single event dengan idempotency check.
         
         Args:
             event: Event to process
         """
-        # Simulasi processing time
+        await self._process_batch([event])
+    
+    async def _do_process_batch(self, events: List[QueueItem]):
+        """
+        Actual event processing logic untuk event unik dalam satu batch.
+        Implementasi dapat disesuaikan dengan kebutuhan (mis. aggregasi, transform, dll).
+        
+        Args:
+            events: Event unik (payload QueuedEvent baru di-parse saat diakses)
+        """
+        # Simulasi processing time: satu round-trip per batch (mis. satu write
+        # ke downstream), bukan per event, sehingga throughput ikut naik dengan
+        # ukuran batch seperti consumer sesungguhnya
         await asyncio.sleep(0.001)
         
-        # Log event payload untuk demonstrasi
-        logger.debug(f"Processing payload: {event.payload}")
+        # Log event payload untuk demonstrasi (hanya parse payload jika debug aktif)
+        if logger.isEnabledFor(logging.DEBUG):
+            for event in events:
+                logger.debug(f"Processing payload: {event.payload}")
         
         # Di sini bisa ditambahkan logic seperti:
         # - Aggregasi data per topic
@@ -139,13 +241,25 @@ class EventConsumer:
         """
         uptime = (datetime.now() - self.stats['start_time']).total_seconds()
         
-        return {
+        stats = {
             'received': self.stats['received'],
             'unique_processed': self.stats['unique_processed'],
             'duplicate_dropped': self.stats['duplicate_dropped'],
             'topics': self.dedup_store.get_all_topics(),
-            'uptime': uptime
+            'uptime': uptime,
+            'batching': self.batcher.snapshot()
         }
+        # Metrik per topic hanya tersedia jika queue mendukungnya (FairEventQueue)
+        if hasattr(self.queue, 'snapshot'):
+            stats['queues'] = self.queue.snapshot()
+        # Statistik dedup tier (SharedMemoryDedupStore)
+        if hasattr(self.dedup_store, 'snapshot'):
+            stats['dedup'] = self.dedup_store.snapshot()
+        if self.sinks:
+            stats['sinks'] = {sink.name: sink.snapshot() for sink in self.sinks}
+        if self.transformer:
+            stats['transform'] = self.transformer.snapshot()
+        return stats
     
     def get_events(self, topic: str = None) -> list[Dict[str, str]]:
         """
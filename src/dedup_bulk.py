@@ -0,0 +1,328 @@
+"""
+Offline bulk import/export untuk SQLite dedup store.
+
+Memuat (topic, event_id) historis dari arsip NDJSON/CSV (boleh .gz) langsung
+ke tabel processed_events tanpa melewati /publish, dan meng-export isi store
+secara streaming. Aggregator harus dalam keadaan berhenti selama import.
+
+Usage:
+    python -m src.dedup_bulk import --db /app/data/dedup.db keys.ndjson.gz archive.csv
+    python -m src.dedup_bulk export --db /app/data/dedup.db --output keys.ndjson.gz
+
+Optimasi import:
+- Key dibaca per chunk besar, di-sort, lalu di-insert dalam satu transaksi per chunk
+  (sorted insertion ke B-tree primary key).
+- Secondary index di-drop sebelum load dan dibangun ulang setelahnya.
+- PRAGMA untuk load: synchronous=OFF, journal_mode=MEMORY, locking_mode=EXCLUSIVE,
+  cache besar; journal dikembalikan ke WAL setelah selesai.
+"""
+import argparse
+import csv
+import gzip
+import json
+import logging
+import sqlite3
+import sys
+import time
+from operator import itemgetter
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+from .dedup_store import DedupStore
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str, Optional[str]]  # (topic, event_id, processed_at)
+
+
+def _open_text(path: str, mode: str = "rt") -> IO[str]:
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def _valid_key(topic, event_id, processed_at) -> bool:
+    return (
+        isinstance(topic, str) and topic != ""
+        and isinstance(event_id, str) and event_id != ""
+        and (processed_at is None or isinstance(processed_at, str))
+    )
+
+
+def iter_keys(path: str, fmt: Optional[str] = None) -> Iterator[Key]:
+    """
+    Baca key dari file NDJSON atau CSV.
+
+    NDJSON: satu object per baris dengan field topic dan event_id (field lain,
+    mis. payload event lengkap, diabaikan). CSV: header topic,event_id
+    (processed_at opsional), atau tanpa header dengan dua kolom pertama.
+    Record dengan topic/event_id yang bukan string non-kosong dilewati.
+
+    Args:
+        path: Path file ("-" untuk stdin)
+        fmt: "ndjson" atau "csv"; default dideteksi dari ekstensi
+
+    Yields:
+        (topic, event_id, processed_at)
+    """
+    fmt = fmt or _detect_format(path)
+    with _open_text(path) as f:
+        if fmt == "ndjson":
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    key = record["topic"], record["event_id"], record.get("processed_at")
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"{path}:{line_no}: skipping invalid record ({e})")
+                    continue
+                if not _valid_key(*key):
+                    logger.warning(
+                        f"{path}:{line_no}: skipping invalid record (topic/event_id must be non-empty strings)"
+                    )
+                    continue
+                yield key
+        elif fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            if "topic" in header and "event_id" in header:
+                t_idx, e_idx = header.index("topic"), header.index("event_id")
+                p_idx = header.index("processed_at") if "processed_at" in header else None
+            else:
+                t_idx, e_idx, p_idx = 0, 1, None
+                reader = _chain_row(header, reader)
+            for row in reader:
+                if len(row) <= max(t_idx, e_idx):
+                    continue
+                processed_at = row[p_idx] if p_idx is not None and p_idx < len(row) else None
+                if not _valid_key(row[t_idx], row[e_idx], None):
+                    logger.warning(f"{path}: skipping row with empty topic/event_id {row!r}")
+                    continue
+                yield row[t_idx], row[e_idx], processed_at or None
+        else:
+            raise ValueError(f"Unknown format: {fmt!r}")
+
+
+def _chain_row(first: list, rest: Iterable[list]) -> Iterator[list]:
+    yield first
+    yield from rest
+
+
+class _Progress:
+    """Laporan throughput berkala ke stderr"""
+
+    def __init__(self, label: str, stream: Optional[IO[str]] = sys.stderr, interval: float = 2.0):
+        self.label = label
+        self.stream = stream
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def update(self, processed: int, extra: str = "", force: bool = False):
+        now = time.perf_counter()
+        if self.stream is None or (not force and now - self._last < self.interval):
+            return
+        self._last = now
+        elapsed = now - self.start
+        rate = processed / elapsed if elapsed else 0.0
+        print(
+            f"[{self.label}] {processed:,} keys in {elapsed:.1f}s "
+            f"({rate * 60:,.0f} keys/min){extra}",
+            file=self.stream,
+        )
+
+
+def _secondary_indexes(conn: sqlite3.Connection) -> list[tuple[str, str]]:
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = 'processed_events' AND sql IS NOT NULL"
+    )
+    return rows.fetchall()
+
+
+def bulk_import(
+    db_path: str,
+    paths: list[str],
+    fmt: Optional[str] = None,
+    chunk_size: int = 500_000,
+    progress: Optional[IO[str]] = sys.stderr,
+) -> dict:
+    """
+    Bulk-load key ke processed_events.
+
+    Args:
+        db_path: Path SQLite database dedup store
+        paths: File input (NDJSON/CSV, boleh .gz, "-" untuk stdin)
+        fmt: Paksa format input; default dideteksi per file
+        chunk_size: Jumlah key per transaksi
+        progress: Stream untuk laporan throughput (None untuk diam)
+
+    Returns:
+        Statistik: read, inserted, duplicates, elapsed, keys_per_min
+    """
+    # Pastikan schema ada (dan sesuai versi DedupStore)
+    DedupStore(db_path).close()
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+
+    report = _Progress("import", progress)
+    read = inserted = 0
+
+    # Deferred index build: drop secondary index selama load
+    indexes = _secondary_indexes(conn)
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX "{name}"')
+
+    def flush(chunk: list[Key]):
+        nonlocal inserted
+        chunk.sort(key=itemgetter(0, 1))
+        before = conn.total_changes
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO processed_events (topic, event_id, processed_at) "
+                "VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+                chunk,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            # Jangan biarkan index dibangun ulang di dalam transaksi yang gagal
+            conn.execute("ROLLBACK")
+            raise
+        inserted += conn.total_changes - before
+
+    try:
+        chunk: list[Key] = []
+        for path in paths:
+            for key in iter_keys(path, fmt):
+                chunk.append(key)
+                read += 1
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+                    report.update(read, f", {inserted:,} inserted")
+        if chunk:
+            flush(chunk)
+    finally:
+        for name, sql in indexes:
+            conn.execute(sql)
+        conn.execute("PRAGMA locking_mode=NORMAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+
+    elapsed = time.perf_counter() - report.start
+    report.update(read, f", {inserted:,} inserted (done)", force=True)
+    return {
+        "read": read,
+        "inserted": inserted,
+        "duplicates": read - inserted,
+        "elapsed": elapsed,
+        "keys_per_min": read / elapsed * 60 if elapsed else 0.0,
+    }
+
+
+def bulk_export(
+    db_path: str,
+    output: str,
+    fmt: Optional[str] = None,
+    topic: Optional[str] = None,
+    progress: Optional[IO[str]] = sys.stderr,
+) -> int:
+    """
+    Stream-export processed_events ke NDJSON/CSV.
+
+    Args:
+        db_path: Path SQLite database dedup store
+        output: File output ("-" untuk stdout, akhiran .gz untuk kompresi)
+        fmt: "ndjson" atau "csv"; default dideteksi dari ekstensi output
+        topic: Optional filter by topic
+        progress: Stream untuk laporan throughput (None untuk diam)
+
+    Returns:
+        Jumlah key yang di-export
+    """
+    fmt = fmt or _detect_format(output)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    report = _Progress("export", progress)
+    count = 0
+    query = "SELECT topic, event_id, processed_at FROM processed_events"
+    params: tuple = ()
+    if topic:
+        query += " WHERE topic = ?"
+        params = (topic,)
+    query += " ORDER BY topic, event_id"
+
+    out = _open_text(output, "wt")
+    try:
+        writer = csv.writer(out) if fmt == "csv" else None
+        if writer:
+            writer.writerow(["topic", "event_id", "processed_at"])
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(10_000)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                out.write("".join(
+                    json.dumps({"topic": t, "event_id": e, "processed_at": p}) + "\n"
+                    for t, e, p in rows
+                ))
+            count += len(rows)
+            report.update(count)
+    finally:
+        if out not in (sys.stdout, sys.stdin):
+            out.close()
+        else:
+            out.flush()
+        conn.close()
+
+    report.update(count, " (done)", force=True)
+    return count
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.dedup_bulk", description="Bulk import/export dedup store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Bulk-load keys dari NDJSON/CSV")
+    p_import.add_argument("files", nargs="+", help="File input (.ndjson/.csv, boleh .gz, '-' untuk stdin)")
+    p_import.add_argument("--db", default="/app/data/dedup.db", help="Path SQLite dedup store")
+    p_import.add_argument("--format", choices=["ndjson", "csv"], help="Paksa format input")
+    p_import.add_argument("--chunk-size", type=int, default=500_000, help="Key per transaksi")
+
+    p_export = sub.add_parser("export", help="Stream-export keys ke NDJSON/CSV")
+    p_export.add_argument("--db", default="/app/data/dedup.db", help="Path SQLite dedup store")
+    p_export.add_argument("--output", default="-", help="File output ('-' untuk stdout)")
+    p_export.add_argument("--format", choices=["ndjson", "csv"], help="Format output")
+    p_export.add_argument("--topic", help="Export hanya satu topic")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+
+    if args.command == "import":
+        stats = bulk_import(args.db, args.files, args.format, args.chunk_size)
+        print(json.dumps(stats), file=sys.stderr)
+    else:
+        bulk_export(args.db, args.output, args.format, args.topic)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
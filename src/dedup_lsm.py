@@ -0,0 +1,510 @@
+"""
+Embedded LSM-style key-value dedup backend untuk key set yang sangat besar.
+
+Write masuk ke write-ahead log (WAL) dan memtable. Saat memtable penuh, isinya
+ditulis sebagai segment file terurut (SSTable) lengkap dengan sparse index dan
+bloom filter. Lookup memeriksa memtable lalu segment dari yang terbaru;
+bloom filter membuat lookup key baru hampir tidak menyentuh disk. Jika jumlah
+segment melewati batas, thread background me-merge semua segment (full
+compaction) tanpa memblokir write.
+
+Jumlah key per topic disimpan di manifest (`topics.json`) yang ditulis setiap
+flush, sehingga daftar topic dan jumlah key tidak memerlukan scan segment.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .dedup_store import BaseDedupStore
+
+logger = logging.getLogger(__name__)
+
+_RECORD = struct.Struct(">BH")        # flag, key length
+_INDEX_ENTRY = struct.Struct(">HQ")   # key length, offset
+_FOOTER = struct.Struct(">QQQIQ8s")   # index_offset, bloom_offset, count, num_hashes, num_bits, magic
+_MAGIC = b"DEDUPLSM"
+_TOPIC_LEN = struct.Struct(">H")
+
+_PUT = 1
+_TOMBSTONE = 0
+
+# Satu entry sparse index untuk setiap N record
+_INDEX_INTERVAL = 64
+
+
+def _encode_key(topic: str, event_id: str) -> bytes:
+    """Encode (topic, event_id) sehingga semua key satu topic berurutan"""
+    t = topic.encode("utf-8")
+    return _TOPIC_LEN.pack(len(t)) + t + event_id.encode("utf-8")
+
+
+def _decode_key(key: bytes) -> Tuple[str, str]:
+    (n,) = _TOPIC_LEN.unpack_from(key)
+    return key[2:2 + n].decode("utf-8"), key[2 + n:].decode("utf-8")
+
+
+def _encode_record(key: bytes, flag: int) -> bytes:
+    return _RECORD.pack(flag, len(key)) + key
+
+
+def _iter_records(buf, start: int, end: int) -> Iterator[Tuple[bytes, int]]:
+    pos = start
+    while pos + _RECORD.size <= end:
+        flag, n = _RECORD.unpack_from(buf, pos)
+        pos += _RECORD.size
+        if pos + n > end:
+            break
+        yield bytes(buf[pos:pos + n]), flag
+        pos += n
+
+
+class _BloomFilter:
+    """Bloom filter dengan double hashing dari satu digest BLAKE2b"""
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[bytes] = None):
+        self.num_bits = max(num_bits, 8)
+        self.num_hashes = num_hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, bits_per_key: int = 10) -> "_BloomFilter":
+        # k optimal = ln(2) * bits_per_key
+        return cls(max(capacity, 1) * bits_per_key, max(1, int(bits_per_key * 0.69)))
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class _Segment:
+    """
+    Immutable sorted segment file.
+
+    Layout: [records][sparse index][bloom bits][footer]
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, bloom_offset, count, num_hashes, num_bits, magic = _FOOTER.unpack_from(
+            self._mm, len(self._mm) - _FOOTER.size
+        )
+        if magic != _MAGIC:
+            raise ValueError(f"Corrupt LSM segment: {path}")
+        self.count = count
+        self._data_end = index_offset
+        self._bloom = _BloomFilter(
+            num_bits, num_hashes, self._mm[bloom_offset:len(self._mm) - _FOOTER.size]
+        )
+        self._index_keys: List[bytes] = []
+        self._index_offsets: List[int] = []
+        pos = index_offset
+        while pos < bloom_offset:
+            n, offset = _INDEX_ENTRY.unpack_from(self._mm, pos)
+            pos += _INDEX_ENTRY.size
+            self._index_keys.append(bytes(self._mm[pos:pos + n]))
+            self._index_offsets.append(offset)
+            pos += n
+
+    @staticmethod
+    def write(path: Path, items, expected: int) -> int:
+        """
+        Tulis record terurut ke segment baru secara atomik (tmp file + rename).
+
+        Args:
+            path: Path segment tujuan
+            items: Iterable of (key, flag) terurut by key
+            expected: Perkiraan jumlah record (untuk ukuran bloom filter)
+
+        Returns:
+            Jumlah record yang ditulis
+        """
+        bloom = _BloomFilter.for_capacity(expected)
+        index = []
+        count = 0
+        offset = 0
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            for key, flag in items:
+                if count % _INDEX_INTERVAL == 0:
+                    index.append((key, offset))
+                record = _encode_record(key, flag)
+                f.write(record)
+                offset += len(record)
+                bloom.add(key)
+                count += 1
+            index_offset = offset
+            for key, off in index:
+                f.write(_INDEX_ENTRY.pack(len(key), off) + key)
+                offset += _INDEX_ENTRY.size + len(key)
+            bloom_offset = offset
+            f.write(bloom.bits)
+            f.write(_FOOTER.pack(
+                index_offset, bloom_offset, count, bloom.num_hashes, bloom.num_bits, _MAGIC
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return count
+
+    def get(self, key: bytes) -> Optional[int]:
+        """Return flag record untuk key, atau None jika key tidak ada di segment"""
+        if key not in self._bloom:
+            return None
+        i = bisect.bisect_right(self._index_keys, key) - 1
+        if i < 0:
+            return None
+        start = self._index_offsets[i]
+        end = self._index_offsets[i + 1] if i + 1 < len(self._index_offsets) else self._data_end
+        for k, flag in _iter_records(self._mm, start, end):
+            if k == key:
+                return flag
+            if k > key:
+                break
+        return None
+
+    def scan(self, prefix: bytes = b"") -> Iterator[Tuple[bytes, int]]:
+        """Iterate record dengan key berawalan prefix, mulai dari sparse index terdekat"""
+        start = 0
+        if prefix:
+            i = bisect.bisect_left(self._index_keys, prefix) - 1
+            if i >= 0:
+                start = self._index_offsets[i]
+        for key, flag in _iter_records(self._mm, start, self._data_end):
+            if key < prefix:
+                continue
+            if not key.startswith(prefix):
+                break
+            yield key, flag
+
+    def __iter__(self) -> Iterator[Tuple[bytes, int]]:
+        return self.scan()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class LSMDedupStore(BaseDedupStore):
+    """
+    Dedup store LSM-style (WAL + memtable + sorted segments).
+    Thread-safe untuk concurrent access; compaction berjalan di thread background.
+    """
+
+    def __init__(
+        self,
+        path: str = "/app/data/dedup-lsm",
+        memtable_limit: int = 100_000,
+        max_segments: int = 8,
+        sync: bool = False,
+    ):
+        """
+        Initialize LSM store.
+
+        Args:
+            path: Direktori data (WAL dan segment files)
+            memtable_limit: Jumlah key di memtable sebelum di-flush ke segment
+            max_segments: Jumlah segment maksimum sebelum compaction
+            sync: fsync WAL setiap batch write (durable tetapi lebih lambat)
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.memtable_limit = memtable_limit
+        self.max_segments = max_segments
+        self.sync = sync
+        self._lock = threading.Lock()
+        # Diambil sebelum _lock; menjaga segment yang sedang di-merge tetap terbuka
+        self._compact_lock = threading.Lock()
+        self._memtable: Dict[bytes, int] = {}
+        self._segments: List[_Segment] = []
+        self._seq = 0
+        # Jumlah key live per topic (termasuk memtable) dan snapshot-nya saat flush terakhir
+        self._topic_counts: Counter = Counter()
+        self._flushed_counts: Counter = Counter()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        for seg_path in sorted(self.path.glob("seg-*.sst")):
+            self._segments.append(_Segment(seg_path))
+            self._seq = max(self._seq, int(seg_path.stem.split("-")[1]))
+        for tmp in self.path.glob("seg-*.tmp"):
+            tmp.unlink()
+
+        self._wal_path = self.path / "wal.log"
+        self._manifest_path = self.path / "topics.json"
+        self._load_counts(self._replay_wal())
+        self._wal = open(self._wal_path, "ab")
+
+        self._closing = False
+        self._compact_needed = threading.Event()
+        self._compactor = threading.Thread(
+            target=self._compaction_loop, name="lsm-compaction", daemon=True
+        )
+        self._compactor.start()
+        if len(self._segments) > self.max_segments:
+            self._compact_needed.set()
+
+        logger.info(
+            f"LSMDedupStore initialized at {path}: "
+            f"{len(self._segments)} segment(s), {len(self._memtable)} key(s) in memtable"
+        )
+
+    def _replay_wal(self) -> List[Tuple[bytes, int]]:
+        if not self._wal_path.exists():
+            return []
+        data = self._wal_path.read_bytes()
+        records = list(_iter_records(data, 0, len(data)))
+        for key, flag in records:
+            self._memtable[key] = flag
+        return records
+
+    def _load_counts(self, wal_records: List[Tuple[bytes, int]]):
+        """
+        Muat jumlah key per topic dari manifest lalu terapkan record WAL.
+
+        Manifest hanya dipakai jika daftar segment-nya sama dengan segment di
+        disk; jika tidak (mis. crash di tengah flush/compaction), jumlah dihitung
+        ulang dengan satu kali scan saat startup.
+        """
+        try:
+            manifest = json.loads(self._manifest_path.read_text())
+        except (FileNotFoundError, ValueError):
+            manifest = None
+        if manifest is not None and manifest.get("segments") == self._segment_names():
+            self._flushed_counts = Counter(manifest["topics"])
+            self._topic_counts = Counter(self._flushed_counts)
+            # Setiap record WAL adalah perubahan state (PUT hanya untuk key baru,
+            # tombstone hanya untuk key live)
+            for key, flag in wal_records:
+                self._count(_decode_key(key)[0], 1 if flag == _PUT else -1)
+        else:
+            self._flushed_counts = self._scan_counts(include_memtable=False)
+            self._topic_counts = self._scan_counts(include_memtable=True)
+            logger.info(f"LSM topic manifest rebuilt from {len(self._segments)} segment(s)")
+
+    def _scan_counts(self, include_memtable: bool) -> Counter:
+        counts = Counter()
+        for key, flag in self._merge(self._segments, include_memtable):
+            if flag == _PUT:
+                counts[_decode_key(key)[0]] += 1
+        return counts
+
+    def _count(self, topic: str, delta: int):
+        self._topic_counts[topic] += delta
+        if self._topic_counts[topic] <= 0:
+            del self._topic_counts[topic]
+
+    def _segment_names(self) -> List[str]:
+        return [segment.path.name for segment in self._segments]
+
+    def _write_manifest(self):
+        """Tulis jumlah key per topic untuk segment saat ini (tmp file + rename)"""
+        tmp = self._manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "segments": self._segment_names(),
+            "topics": dict(self._flushed_counts),
+        }))
+        os.replace(tmp, self._manifest_path)
+
+    def _lookup(self, key: bytes) -> bool:
+        flag = self._memtable.get(key)
+        if flag is None:
+            for segment in reversed(self._segments):
+                flag = segment.get(key)
+                if flag is not None:
+                    break
+        return flag == _PUT
+
+    def _append_wal(self, records: List[bytes]):
+        if not records:
+            return
+        self._wal.write(b"".join(records))
+        self._wal.flush()
+        if self.sync:
+            os.fsync(self._wal.fileno())
+
+    def contains_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        with self._lock:
+            return [self._lookup(_encode_key(t, e)) for t, e in keys]
+
+    def _mark_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        results = []
+        with self._lock:
+            records = []
+            for topic, event_id in keys:
+                key = _encode_key(topic, event_id)
+                if self._lookup(key):
+                    results.append(False)
+                    continue
+                self._memtable[key] = _PUT
+                records.append(_encode_record(key, _PUT))
+                self._count(topic, 1)
+                results.append(True)
+            self._append_wal(records)
+            self._maybe_flush()
+        return results
+
+    def _remove_many(self, keys: list[tuple[str, str]]) -> int:
+        with self._lock:
+            records = []
+            for topic, event_id in keys:
+                key = _encode_key(topic, event_id)
+                if self._lookup(key):
+                    self._memtable[key] = _TOMBSTONE
+                    records.append(_encode_record(key, _TOMBSTONE))
+                    self._count(topic, -1)
+            self._append_wal(records)
+            self._maybe_flush()
+            return len(records)
+
+    def _maybe_flush(self):
+        if len(self._memtable) >= self.memtable_limit:
+            self._flush_memtable()
+
+    def _flush_memtable(self):
+        """Tulis memtable sebagai segment baru, kosongkan WAL, lalu update manifest"""
+        if not self._memtable:
+            return
+        self._seq += 1
+        seg_path = self.path / f"seg-{self._seq:08d}.sst"
+        _Segment.write(seg_path, sorted(self._memtable.items()), len(self._memtable))
+        self._segments.append(_Segment(seg_path))
+        self._memtable.clear()
+        self._wal.truncate(0)
+        self._wal.seek(0)
+        self._flushed_counts = Counter(self._topic_counts)
+        self._write_manifest()
+        if len(self._segments) > self.max_segments:
+            # Compaction dijalankan thread background, bukan di jalur write
+            self._compact_needed.set()
+
+    def _compaction_loop(self):
+        while True:
+            self._compact_needed.wait()
+            self._compact_needed.clear()
+            if self._closing:
+                return
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"LSM compaction failed: {e}", exc_info=True)
+
+    def compact(self):
+        """
+        Merge semua segment menjadi satu jika jumlahnya melewati max_segments;
+        tombstone dibuang.
+
+        Merge berjalan tanpa memegang lock store sehingga read/write tetap
+        berjalan. Segment yang di-flush selama merge dipertahankan di atas
+        segment hasil merge.
+        """
+        with self._compact_lock:
+            with self._lock:
+                old = list(self._segments)
+                if len(old) <= self.max_segments:
+                    return
+                self._seq += 1
+                seg_path = self.path / f"seg-{self._seq:08d}.sst"
+            merged = (
+                (key, flag)
+                for key, flag in self._merge(old, include_memtable=False)
+                if flag == _PUT
+            )
+            count = _Segment.write(seg_path, merged, sum(s.count for s in old))
+            if not count:
+                seg_path.unlink()
+            with self._lock:
+                self._segments = ([_Segment(seg_path)] if count else []) + self._segments[len(old):]
+                for segment in old:
+                    segment.close()
+                    segment.path.unlink()
+                self._write_manifest()
+            logger.info(f"LSM compaction: {len(old)} segment(s) -> {count} key(s)")
+
+    def _merge(
+        self, segments: List[_Segment], include_memtable: bool = True, prefix: bytes = b""
+    ) -> Iterator[Tuple[bytes, int]]:
+        """
+        Merge-iterate sumber data; untuk key yang sama, sumber terbaru menang.
+        Jika prefix diberikan, hanya key berawalan prefix yang dibaca.
+        """
+        sources = []
+        if include_memtable:
+            memtable = sorted(kv for kv in self._memtable.items() if kv[0].startswith(prefix))
+            sources.append(((k, 0, f) for k, f in memtable))
+        for rank, segment in enumerate(reversed(segments), start=1):
+            sources.append(((k, rank, f) for k, f in segment.scan(prefix)))
+        last = None
+        for key, _, flag in heapq.merge(*sources):
+            if key != last:
+                last = key
+                yield key, flag
+
+    def _iter_live(self, prefix: bytes = b"") -> Iterator[Tuple[str, str]]:
+        for key, flag in self._merge(self._segments, prefix=prefix):
+            if flag == _PUT:
+                yield _decode_key(key)
+
+    def get_all_topics(self) -> list[str]:
+        with self._lock:
+            return sorted(self._topic_counts)
+
+    def get_events_by_topic(self, topic: Optional[str] = None) -> list[tuple[str, str]]:
+        with self._lock:
+            if topic:
+                # Semua key satu topic berurutan dengan prefix yang sama
+                return list(self._iter_live(_encode_key(topic, "")))
+            return list(self._iter_live())
+
+    def count_processed(self) -> int:
+        with self._lock:
+            return sum(self._topic_counts.values())
+
+    def flush(self):
+        """Paksa flush memtable ke segment"""
+        with self._lock:
+            self._flush_memtable()
+
+    def _clear(self):
+        with self._compact_lock, self._lock:
+            for segment in self._segments:
+                segment.close()
+                segment.path.unlink()
+            self._segments = []
+            self._memtable.clear()
+            self._wal.truncate(0)
+            self._wal.seek(0)
+            self._topic_counts.clear()
+            self._flushed_counts.clear()
+            self._write_manifest()
+            logger.warning("LSMDedupStore cleared")
+
+    def close(self):
+        self._closing = True
+        self._compact_needed.set()
+        self._compactor.join()
+        with self._lock:
+            self._flush_memtable()
+            self._wal.close()
+            for segment in self._segments:
+                segment.close()
@@ -0,0 +1,76 @@
+"""
+In-memory dedup backend berbasis hash set.
+Cocok untuk testing dan ephemeral run; data hilang saat proses berhenti.
+"""
+import logging
+import threading
+from typing import Dict, Optional, Set
+
+from .dedup_store import BaseDedupStore
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryDedupStore(BaseDedupStore):
+    """
+    Dedup store in-memory: mapping topic -> set of event_id.
+    Thread-safe untuk concurrent access.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._topics: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        logger.info("MemoryDedupStore initialized")
+
+    def contains_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        with self._lock:
+            return [
+                event_id in self._topics.get(topic, ())
+                for topic, event_id in keys
+            ]
+
+    def _mark_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        results = []
+        with self._lock:
+            for topic, event_id in keys:
+                ids = self._topics.get(topic)
+                if ids is None:
+                    ids = self._topics[topic] = set()
+                if event_id in ids:
+                    results.append(False)
+                else:
+                    ids.add(event_id)
+                    results.append(True)
+        return results
+
+    def _remove_many(self, keys: list[tuple[str, str]]) -> int:
+        removed = 0
+        with self._lock:
+            for topic, event_id in keys:
+                ids = self._topics.get(topic)
+                if ids and event_id in ids:
+                    ids.remove(event_id)
+                    removed += 1
+                    if not ids:
+                        del self._topics[topic]
+        return removed
+
+    def get_all_topics(self) -> list[str]:
+        with self._lock:
+            return list(self._topics)
+
+    def get_events_by_topic(self, topic: Optional[str] = None) -> list[tuple[str, str]]:
+        with self._lock:
+            if topic:
+                return [(topic, eid) for eid in self._topics.get(topic, ())]
+            return [(t, eid) for t, ids in self._topics.items() for eid in ids]
+
+    def count_processed(self) -> int:
+        with self._lock:
+            return sum(len(ids) for ids in self._topics.values())
+
+    def _clear(self):
+        with self._lock:
+            self._topics.clear()
+            logger.warning("MemoryDedupStore cleared")
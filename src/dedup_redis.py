@@ -0,0 +1,223 @@
+"""
+Dedup backend berbasis Redis protocol (RESP).
+
+Setiap topic disimpan sebagai Redis set berisi event_id. SADD bersifat atomik
+dan mengembalikan 1 hanya untuk member baru, sehingga cocok sebagai operasi
+mark_processed. Operasi batch dikirim dengan pipelining dalam satu round-trip.
+Client RESP minimal diimplementasikan di sini agar tidak menambah dependency.
+"""
+import logging
+import socket
+import threading
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+from .dedup_store import BaseDedupStore
+
+logger = logging.getLogger(__name__)
+
+
+class RedisError(Exception):
+    """Error reply dari server Redis"""
+
+
+class RespClient:
+    """
+    Client RESP2 sederhana dengan dukungan pipelining.
+    Koneksi yang terkena error di tengah send/read ditutup dan dibuka ulang
+    saat command berikutnya, sehingga reply yang belum terbaca tidak pernah
+    terbaca sebagai reply command lain.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._connect()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if self.db:
+            try:
+                self._sock.sendall(self._encode(("SELECT", self.db)))
+                reply = self._read_reply()
+            except BaseException:
+                self._disconnect()
+                raise
+            if isinstance(reply, RedisError):
+                self._disconnect()
+                raise reply
+
+    def _disconnect(self):
+        for resource in (self._reader, self._sock):
+            if resource is not None:
+                try:
+                    resource.close()
+                except OSError:
+                    pass
+        self._reader = None
+        self._sock = None
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._reader.read(n + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            n = int(rest)
+            if n < 0:
+                return None
+            return [self._read_reply() for _ in range(n)]
+        raise RedisError(f"Unknown RESP reply type: {line!r}")
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """
+        Kirim banyak command sekaligus lalu baca semua reply.
+
+        Raises:
+            RedisError: Jika salah satu command mengembalikan error
+        """
+        if not commands:
+            return []
+        if self._sock is None:
+            self._connect()
+            logger.info(f"Reconnected to Redis at {self.host}:{self.port}")
+        try:
+            self._sock.sendall(b"".join(self._encode(cmd) for cmd in commands))
+            replies = [self._read_reply() for _ in commands]
+        except BaseException:
+            # Reply yang belum terbaca tertinggal di stream: jangan pakai koneksi ini lagi
+            self._disconnect()
+            raise
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def execute(self, *args) -> Any:
+        return self.pipeline([args])[0]
+
+    def close(self):
+        self._disconnect()
+
+
+class RedisDedupStore(BaseDedupStore):
+    """
+    Dedup store di Redis: set "{prefix}:t:{topic}" per topic,
+    set "{prefix}:topics" berisi daftar topic, dan counter "{prefix}:version"
+    yang dinaikkan setiap write (untuk invalidasi cache antar instance).
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "dedup"):
+        """
+        Initialize Redis store.
+
+        Args:
+            url: Redis URL, format redis://host:port/db
+            prefix: Prefix semua key Redis yang dipakai store ini
+        """
+        super().__init__()
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self._client = RespClient(parsed.hostname or "localhost", parsed.port or 6379, db)
+        self._lock = threading.Lock()
+        logger.info(f"RedisDedupStore initialized: {url}")
+
+    def _topic_key(self, topic: str) -> str:
+        return f"{self.prefix}:t:{topic}"
+
+    @property
+    def _topics_key(self) -> str:
+        return f"{self.prefix}:topics"
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.prefix}:version"
+
+    def contains_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        with self._lock:
+            replies = self._client.pipeline([
+                ("SISMEMBER", self._topic_key(t), e) for t, e in keys
+            ])
+        return [reply == 1 for reply in replies]
+
+    def _mark_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        topics = {t for t, _ in keys}
+        commands = [("SADD", self._topic_key(t), e) for t, e in keys]
+        commands.append(("SADD", self._topics_key, *topics))
+        commands.append(("INCR", self._version_key))
+        with self._lock:
+            replies = self._client.pipeline(commands)
+        return [reply == 1 for reply in replies[:len(keys)]]
+
+    def _remove_many(self, keys: list[tuple[str, str]]) -> int:
+        topics = sorted({t for t, _ in keys})
+        with self._lock:
+            replies = self._client.pipeline([
+                ("SREM", self._topic_key(t), e) for t, e in keys
+            ] + [("INCR", self._version_key)])[:-1]
+            # Hapus topic yang sudah tidak memiliki event
+            sizes = self._client.pipeline([("SCARD", self._topic_key(t)) for t in topics])
+            empty = [t for t, size in zip(topics, sizes) if size == 0]
+            if empty:
+                self._client.execute("SREM", self._topics_key, *empty)
+        return sum(replies)
+
+    def get_all_topics(self) -> list[str]:
+        with self._lock:
+            return list(self._client.execute("SMEMBERS", self._topics_key))
+
+    def get_events_by_topic(self, topic: Optional[str] = None) -> list[tuple[str, str]]:
+        with self._lock:
+            topics = [topic] if topic else self._client.execute("SMEMBERS", self._topics_key)
+            replies = self._client.pipeline([("SMEMBERS", self._topic_key(t)) for t in topics])
+        return [(t, e) for t, members in zip(topics, replies) for e in members]
+
+    def count_processed(self) -> int:
+        with self._lock:
+            topics = self._client.execute("SMEMBERS", self._topics_key)
+            return sum(self._client.pipeline([("SCARD", self._topic_key(t)) for t in topics]))
+
+    def _clear(self):
+        with self._lock:
+            topics = self._client.execute("SMEMBERS", self._topics_key)
+            self._client.execute("DEL", self._topics_key, *[self._topic_key(t) for t in topics])
+            self._client.execute("INCR", self._version_key)
+            logger.warning("RedisDedupStore cleared")
+
+    def data_version(self) -> int:
+        with self._lock:
+            return int(self._client.execute("GET", self._version_key) or 0)
+
+    def close(self):
+        with self._lock:
+            self._client.close()
@@ -0,0 +1,521 @@
+"""
+Dedup tier bersama di shared memory untuk uvicorn --workers N.
+
+Setiap worker memiliki global sendiri dari lifespan, sehingga tanpa lapisan ini
+semua worker bersaing menulis ke file SQLite yang sama untuk setiap event.
+SharedMemoryDedupStore menaruh tabel fingerprint key di
+multiprocessing.shared_memory sebagai pemeriksaan pertama yang dipakai bersama
+oleh semua worker pada satu host:
+
+- Fingerprint ada di tabel -> duplikat, backend tidak disentuh.
+- Fingerprint belum ada -> di-claim secara atomik (hanya satu worker yang
+  berhasil) dalam status pending, lalu key yang di-claim dikirim ke backend
+  dalam satu batch. Setelah backend commit, claim dikonfirmasi; jika backend
+  gagal, claim dilepas.
+- Fingerprint masih pending (di-claim worker lain yang belum commit) -> key
+  dikirim ke backend, yang memutuskan secara atomik. Worker lain tidak pernah
+  men-drop event hanya karena claim yang mungkin masih gagal.
+  Backend tetap authoritative: key yang ter-evict atau sudah ada sebelum tabel
+  dibuat tetap terdeteksi sebagai duplikat oleh backend.
+
+Tabel berupa open addressing set-associative: fingerprint 64-bit menentukan
+bucket (width slot); probing hanya di dalam bucket, sehingga satu bucket selalu
+dijaga oleh satu stripe lock. Claim atomik antar proses memakai fcntl byte-range
+lock per stripe pada lock file, ditambah threading.Lock untuk thread di dalam
+proses yang sama (lock fcntl dimiliki per proses).
+
+Eviction saat bucket penuh:
+- "fifo": slot tertua di bucket ditimpa (cursor per bucket)
+- "none": key tidak dimasukkan ke tabel dan selalu diteruskan ke backend
+
+Lifecycle: setiap proses memegang shared lock pada byte liveness. Proses yang
+membuka tabel tanpa ada proses lain yang hidup membuat tabel baru (isi lama
+dari run sebelumnya dibuang); proses terakhir yang menutup tabel meng-unlink
+shared memory. Lock fcntl otomatis lepas saat proses crash.
+
+Bit tertinggi slot menandai claim pending, sehingga fingerprint berukuran 63 bit.
+False positive hanya terjadi jika dua key berbeda memiliki fingerprint yang sama
+(peluang ~n^2 / 2^63).
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .dedup_store import BaseDedupStore
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"UTSSHM02"
+_HEADER = struct.Struct("<8sIIII")   # magic, n_buckets, width, n_stripes, eviction (0 fifo, 1 none)
+_HEADER_SIZE = 64
+# Byte lock file: 0 init, 1 liveness, 2 + i stripe i (tetap meski konfigurasi berbeda)
+_INIT_BYTE = 0
+_LIVE_BYTE = 1
+_STRIPE_BYTE = 2
+EVICTION_POLICIES = ("fifo", "none")
+# Cursor FIFO per bucket berukuran uint8
+_MAX_WIDTH = 256
+# Bit penanda claim yang belum dikonfirmasi backend
+_PENDING = 1 << 63
+
+
+class _Attachment:
+    """
+    State per nama tabel yang dibagi semua instance di satu proses.
+    Lock fcntl dimiliki per proses dan close() pada fd mana pun ke lock file
+    melepas semua lock proses tersebut, sehingga fd harus dipakai bersama.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.lock = threading.Lock()
+        self.refs = 0
+
+
+_registry_lock = threading.Lock()
+_attached: Dict[str, _Attachment] = {}
+
+
+@contextmanager
+def _untracked():
+    """
+    Nonaktifkan resource tracker untuk shared memory tabel.
+    Lifetime dikelola lewat liveness lock; tracker (dipakai bersama oleh proses
+    hasil spawn) akan meng-unlink tabel saat satu proses keluar, dan register /
+    unregister dari banyak proses untuk nama yang sama membuatnya error.
+    Python >= 3.13 menyediakan SharedMemory(track=False).
+    """
+    register, unregister = resource_tracker.register, resource_tracker.unregister
+    resource_tracker.register = resource_tracker.unregister = lambda name, rtype: None
+    try:
+        yield
+    finally:
+        resource_tracker.register, resource_tracker.unregister = register, unregister
+
+
+def _shared_memory(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    with _untracked():
+        return shared_memory.SharedMemory(name, create=create, size=size)
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    with _untracked():
+        shm.unlink()
+
+
+def fingerprint(topic: str, event_id: str) -> int:
+    """Fingerprint 63-bit (bukan 0) yang stabil antar proses"""
+    digest = hashlib.blake2b(
+        topic.encode("utf-8") + b"\x00" + event_id.encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little") & (_PENDING - 1) or 1
+
+
+class SharedFingerprintTable:
+    """
+    Tabel fingerprint berkapasitas tetap di shared memory.
+
+    Layout: [header 64B][occupied per stripe (uint64)][evictions per stripe (uint64)]
+    [cursor FIFO per bucket (uint8), padding ke 8 byte][slot uint64 * n_buckets * width]
+    """
+
+    def __init__(
+        self,
+        name: str = "uts-dedup",
+        capacity: int = 1 << 22,
+        width: int = 16,
+        stripes: int = 64,
+        eviction: str = "fifo",
+        lock_dir: Optional[str] = None,
+    ):
+        """
+        Buat atau attach tabel.
+
+        Args:
+            name: Nama shared memory (sama untuk semua worker)
+            capacity: Jumlah slot (dibulatkan ke atas menjadi kelipatan width)
+            width: Slot per bucket
+            stripes: Jumlah stripe lock
+            eviction: "fifo" atau "none"
+            lock_dir: Direktori lock file (default tempdir)
+
+        Raises:
+            ValueError: Jika eviction/width tidak valid atau tabel yang sudah ada
+                dibuat dengan konfigurasi berbeda
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {eviction!r} (expected one of {EVICTION_POLICIES})")
+        if not 1 <= width <= _MAX_WIDTH:
+            raise ValueError(f"Invalid bucket width: {width} (expected 1..{_MAX_WIDTH})")
+        self.name = name
+        self.width = width
+        self.n_buckets = max(1, -(-capacity // width))
+        self.n_stripes = max(1, min(stripes, self.n_buckets))
+        self.eviction = eviction
+        self._bucket = struct.Struct(f"<{width}Q")
+
+        cursors_size = -(-self.n_buckets // 8) * 8
+        self._occupied_offset = _HEADER_SIZE
+        self._evicted_offset = self._occupied_offset + 8 * self.n_stripes
+        self._cursor_offset = self._evicted_offset + 8 * self.n_stripes
+        self._slots_offset = self._cursor_offset + cursors_size
+        size = self._slots_offset + 8 * self.n_buckets * width
+
+        with _registry_lock:
+            attachment = _attached.get(name)
+            first_in_process = attachment is None
+            if first_in_process:
+                lock_path = os.path.join(lock_dir or tempfile.gettempdir(), f"{name}.lock")
+                attachment = _Attachment(os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600))
+            self._lock_fd = attachment.fd
+            self._thread_lock = attachment.lock
+            try:
+                self._open(size, first_in_process)
+            except Exception:
+                if first_in_process:
+                    os.close(attachment.fd)
+                raise
+            attachment.refs += 1
+            _attached[name] = attachment
+        self._buf = self._shm.buf
+        self._occupied = self._buf[self._occupied_offset:self._evicted_offset].cast("Q")
+        self._evicted = self._buf[self._evicted_offset:self._cursor_offset].cast("Q")
+        self._closed = False
+        logger.info(
+            f"SharedFingerprintTable {name}: {self.capacity:,} slots, "
+            f"{size / 2**20:.1f} MiB, eviction={eviction}"
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.n_buckets * self.width
+
+    def _lockf(self, op: int, byte: int):
+        fcntl.lockf(self._lock_fd, op, 1, byte, os.SEEK_SET)
+
+    def _lock_stripe(self, op: int, stripe: int):
+        self._lockf(op, _STRIPE_BYTE + stripe)
+
+    def _open(self, size: int, first_in_process: bool):
+        self._lockf(fcntl.LOCK_EX, _INIT_BYTE)
+        try:
+            alone = False
+            if first_in_process:
+                try:
+                    self._lockf(fcntl.LOCK_EX | fcntl.LOCK_NB, _LIVE_BYTE)
+                    alone = True
+                except OSError:
+                    pass
+            if alone:
+                # Tidak ada proses lain yang hidup: buang tabel sisa run sebelumnya
+                try:
+                    stale = _shared_memory(self.name)
+                    stale.close()
+                    _unlink(stale)
+                except FileNotFoundError:
+                    pass
+                self._shm = _shared_memory(self.name, create=True, size=size)
+                _HEADER.pack_into(
+                    self._shm.buf, 0, _MAGIC, self.n_buckets, self.width, self.n_stripes,
+                    EVICTION_POLICIES.index(self.eviction),
+                )
+            else:
+                self._shm = _shared_memory(self.name)
+                magic, n_buckets, width, n_stripes, _ = _HEADER.unpack_from(self._shm.buf, 0)
+                if (magic, n_buckets, width, n_stripes) != (_MAGIC, self.n_buckets, self.width, self.n_stripes):
+                    self._shm.close()
+                    raise ValueError(f"Shared dedup table {self.name!r} exists with a different configuration")
+            self._lockf(fcntl.LOCK_SH, _LIVE_BYTE)
+        finally:
+            self._lockf(fcntl.LOCK_UN, _INIT_BYTE)
+
+    def _locate(self, fp: int) -> Tuple[int, int]:
+        """(bucket, stripe) untuk fingerprint"""
+        bucket = (fp >> 16) % self.n_buckets
+        return bucket, bucket % self.n_stripes
+
+    def _group(self, fps: Iterable[int]) -> Dict[int, List[int]]:
+        """Index fingerprint dikelompokkan per stripe (satu lock per stripe per batch)"""
+        groups: Dict[int, List[int]] = {}
+        for i, fp in enumerate(fps):
+            groups.setdefault(self._locate(fp)[1], []).append(i)
+        return groups
+
+    def claim_many(self, fps: List[int], pending: bool = False) -> List[Optional[bool]]:
+        """
+        Claim fingerprint secara atomik.
+
+        Args:
+            fps: Fingerprint (63-bit, bukan 0)
+            pending: Simpan claim sebagai pending sampai confirm_many()
+
+        Returns:
+            List sejajar fps: True jika di-claim (sebelumnya tidak ada), False
+            jika sudah ada (terkonfirmasi), None jika tidak dimasukkan (bucket
+            penuh dengan eviction "none", atau masih pending di claim lain)
+        """
+        mark = _PENDING if pending else 0
+        results: List[Optional[bool]] = [None] * len(fps)
+        buf, bucket_struct, width = self._buf, self._bucket, self.width
+        with self._thread_lock:
+            for stripe, indexes in self._group(fps).items():
+                self._lock_stripe(fcntl.LOCK_EX, stripe)
+                try:
+                    for i in indexes:
+                        fp = fps[i]
+                        bucket = self._locate(fp)[0]
+                        offset = self._slots_offset + 8 * width * bucket
+                        slots = bucket_struct.unpack_from(buf, offset)
+                        if fp in slots:
+                            results[i] = False
+                            continue
+                        if fp | _PENDING in slots:
+                            continue
+                        if 0 in slots:
+                            slot = slots.index(0)
+                            self._occupied[stripe] += 1
+                        elif self.eviction == "fifo":
+                            cursor_at = self._cursor_offset + bucket
+                            slot = buf[cursor_at]
+                            buf[cursor_at] = (slot + 1) % width
+                            self._evicted[stripe] += 1
+                        else:
+                            continue
+                        struct.pack_into("<Q", buf, offset + 8 * slot, fp | mark)
+                        results[i] = True
+                finally:
+                    self._lock_stripe(fcntl.LOCK_UN, stripe)
+        return results
+
+    def confirm_many(self, fps: List[int]):
+        """Konfirmasi claim pending (key sudah di-commit backend)"""
+        self._replace_many(fps, lambda fp: fp | _PENDING, lambda fp: fp)
+
+    def _replace_many(self, fps: List[int], old, new) -> int:
+        replaced = 0
+        buf, bucket_struct, width = self._buf, self._bucket, self.width
+        with self._thread_lock:
+            for stripe, indexes in self._group(fps).items():
+                self._lock_stripe(fcntl.LOCK_EX, stripe)
+                try:
+                    for i in indexes:
+                        bucket = self._locate(fps[i])[0]
+                        offset = self._slots_offset + 8 * width * bucket
+                        slots = bucket_struct.unpack_from(buf, offset)
+                        value = old(fps[i])
+                        if value in slots:
+                            struct.pack_into("<Q", buf, offset + 8 * slots.index(value), new(fps[i]))
+                            replaced += 1
+                finally:
+                    self._lock_stripe(fcntl.LOCK_UN, stripe)
+        return replaced
+
+    def contains_many(self, fps: List[int]) -> List[bool]:
+        """Check fingerprint terkonfirmasi tanpa mengubah tabel"""
+        results = [False] * len(fps)
+        buf, bucket_struct, width = self._buf, self._bucket, self.width
+        with self._thread_lock:
+            for stripe, indexes in self._group(fps).items():
+                self._lock_stripe(fcntl.LOCK_SH, stripe)
+                try:
+                    for i in indexes:
+                        bucket = self._locate(fps[i])[0]
+                        results[i] = fps[i] in bucket_struct.unpack_from(buf, self._slots_offset + 8 * width * bucket)
+                finally:
+                    self._lock_stripe(fcntl.LOCK_UN, stripe)
+        return results
+
+    def remove_many(self, fps: List[int]) -> int:
+        """Hapus fingerprint (terkonfirmasi atau pending); Returns jumlah yang terhapus"""
+        removed = 0
+        buf, bucket_struct, width = self._buf, self._bucket, self.width
+        with self._thread_lock:
+            for stripe, indexes in self._group(fps).items():
+                self._lock_stripe(fcntl.LOCK_EX, stripe)
+                try:
+                    for i in indexes:
+                        bucket = self._locate(fps[i])[0]
+                        offset = self._slots_offset + 8 * width * bucket
+                        slots = bucket_struct.unpack_from(buf, offset)
+                        for value in (fps[i], fps[i] | _PENDING):
+                            if value in slots:
+                                struct.pack_into("<Q", buf, offset + 8 * slots.index(value), 0)
+                                self._occupied[stripe] -= 1
+                                removed += 1
+                finally:
+                    self._lock_stripe(fcntl.LOCK_UN, stripe)
+        return removed
+
+    def clear(self):
+        """Kosongkan seluruh tabel (semua stripe di-lock)"""
+        with self._thread_lock:
+            for stripe in range(self.n_stripes):
+                self._lock_stripe(fcntl.LOCK_EX, stripe)
+            try:
+                self._buf[self._occupied_offset:] = bytes(len(self._buf) - self._occupied_offset)
+            finally:
+                for stripe in range(self.n_stripes):
+                    self._lock_stripe(fcntl.LOCK_UN, stripe)
+
+    def snapshot(self) -> Dict[str, int]:
+        occupied = sum(self._occupied)
+        return {
+            'capacity': self.capacity,
+            'occupied': occupied,
+            'load_factor': round(occupied / self.capacity, 4),
+            'evictions': sum(self._evicted),
+        }
+
+    def close(self):
+        """Detach; proses terakhir yang menutup tabel meng-unlink shared memory"""
+        if self._closed:
+            return
+        self._closed = True
+        self._occupied.release()
+        self._evicted.release()
+        self._buf = None
+        with _registry_lock:
+            attachment = _attached[self.name]
+            attachment.refs -= 1
+            last_in_process = attachment.refs == 0
+            self._lockf(fcntl.LOCK_EX, _INIT_BYTE)
+            try:
+                unlink = False
+                if last_in_process:
+                    try:
+                        # Konversi shared -> exclusive hanya berhasil jika tidak ada proses lain
+                        self._lockf(fcntl.LOCK_EX | fcntl.LOCK_NB, _LIVE_BYTE)
+                        unlink = True
+                    except OSError:
+                        pass
+                self._shm.close()
+                if unlink:
+                    _unlink(self._shm)
+                if last_in_process:
+                    self._lockf(fcntl.LOCK_UN, _LIVE_BYTE)
+            finally:
+                self._lockf(fcntl.LOCK_UN, _INIT_BYTE)
+                if last_in_process:
+                    del _attached[self.name]
+                    os.close(self._lock_fd)
+
+
+class SharedMemoryDedupStore(BaseDedupStore):
+    """
+    Dedup store dua tingkat: SharedFingerprintTable di depan backend authoritative.
+    Backend hanya menerima key yang berhasil di-claim di tabel (atau tidak
+    muat di tabel, atau masih pending di worker lain), dalam satu batch per
+    mark_processed_many.
+    """
+
+    def __init__(self, backend: BaseDedupStore, table: SharedFingerprintTable):
+        """
+        Args:
+            backend: Backend authoritative (mis. DedupStore SQLite)
+            table: Tabel fingerprint bersama
+        """
+        super().__init__()
+        self.backend = backend
+        self.table = table
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'table_hits': 0, 'claimed': 0, 'overflow': 0, 'backend_keys': 0, 'backend_duplicates': 0,
+        }
+        logger.info(f"SharedMemoryDedupStore initialized ({type(backend).__name__} backend)")
+
+    def contains_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        results = self.table.contains_many([fingerprint(t, e) for t, e in keys])
+        misses = [i for i, hit in enumerate(results) if not hit]
+        if misses:
+            for i, found in zip(misses, self.backend.contains_many([keys[i] for i in misses])):
+                results[i] = found
+        return results
+
+    def _mark_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        fps = [fingerprint(t, e) for t, e in keys]
+        # Claim pending: worker lain yang menemukan key ini ikut bertanya ke backend
+        # alih-alih menganggapnya duplikat, sampai claim dikonfirmasi
+        claims = self.table.claim_many(fps, pending=True)
+        candidates = [i for i, claim in enumerate(claims) if claim is not False]
+        results = [False] * len(keys)
+        if candidates:
+            claimed = [fps[i] for i in candidates if claims[i]]
+            try:
+                marked = self.backend.mark_processed_many([keys[i] for i in candidates])
+            except Exception:
+                # Lepas claim agar retry tidak dianggap duplikat
+                self.table.remove_many(claimed)
+                raise
+            self.table.confirm_many(claimed)
+            for i, is_new in zip(candidates, marked):
+                results[i] = is_new
+        with self._stats_lock:
+            self.stats['table_hits'] += len(keys) - len(candidates)
+            self.stats['claimed'] += sum(1 for claim in claims if claim)
+            self.stats['overflow'] += sum(1 for claim in claims if claim is None)
+            self.stats['backend_keys'] += len(candidates)
+            self.stats['backend_duplicates'] += sum(1 for i in candidates if not results[i])
+        return results
+
+    def _remove_many(self, keys: list[tuple[str, str]]) -> int:
+        self.table.remove_many([fingerprint(t, e) for t, e in keys])
+        return self.backend.remove_many(keys)
+
+    def _clear(self):
+        self.table.clear()
+        self.backend.clear()
+
+    def get_all_topics(self) -> list[str]:
+        return self.backend.get_all_topics()
+
+    def get_events_by_topic(self, topic: Optional[str] = None) -> list[tuple[str, str]]:
+        return self.backend.get_events_by_topic(topic)
+
+    def count_processed(self) -> int:
+        return self.backend.count_processed()
+
+    def data_version(self):
+        # Key baru selalu ditulis ke backend, jadi versi backend mencakup semua worker
+        return self.backend.data_version()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Statistik tabel bersama ditambah counter proses ini"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {**self.table.snapshot(), **stats}
+
+    def close(self):
+        self.table.close()
+        self.backend.close()
+
+
+def create_shared_table(name: Optional[str] = None, **options) -> SharedFingerprintTable:
+    """
+    Buat SharedFingerprintTable dari environment variable.
+
+    Args:
+        name: Override DEDUP_SHM_NAME
+        **options: Override capacity, width, stripes, eviction, lock_dir
+
+    Returns:
+        SharedFingerprintTable
+    """
+    config = {
+        'capacity': int(os.getenv("DEDUP_SHM_CAPACITY", str(1 << 22))),
+        'width': int(os.getenv("DEDUP_SHM_BUCKET_WIDTH", "16")),
+        'stripes': int(os.getenv("DEDUP_SHM_STRIPES", "64")),
+        'eviction': os.getenv("DEDUP_SHM_EVICTION", "fifo").lower(),
+        'lock_dir': os.getenv("DEDUP_SHM_LOCK_DIR") or None,
+    }
+    config.update(options)
+    return SharedFingerprintTable(name or os.getenv("DEDUP_SHM_NAME", "uts-dedup"), **config)
@@ -1,154 +1,377 @@
 """
 Deduplication Store menggunakan SQLite untuk persistensi.
 Menyimpan (topic, event_id) yang sudah diproses untuk idempotency.
+
+Modul ini juga mendefinisikan interface BaseDedupStore yang diimplementasikan
+oleh semua backend (SQLite, in-memory, LSM, Redis) serta factory
+create_dedup_store() untuk memilih backend dari konfigurasi.
 """
+import os
 import sqlite3
 import logging
+from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Set, Optional
+from typing import Hashable, Optional
 import threading
 
 logger = logging.getLogger(__name__)
 
 
-class DedupStore:
+class WriteVersions:
+    """
+    Versi tulis per topic dan global.
+    Setiap write yang mengubah isi store menaikkan versi topic terkait, sehingga
+    cache response dapat memvalidasi entry tanpa query ulang.
+    """
+
+    def __init__(self):
+        self._topics: dict[str, int] = {}
+        self.global_version = 0
+        self._lock = threading.Lock()
+
+    def bump(self, topics):
+        """Naikkan versi untuk topic-topic yang berubah"""
+        with self._lock:
+            changed = False
+            for topic in set(topics):
+                self._topics[topic] = self._topics.get(topic, 0) + 1
+                changed = True
+            if changed:
+                self.global_version += 1
+
+    def bump_all(self):
+        """Naikkan versi semua topic (mis. setelah clear)"""
+        self.bump(list(self._topics))
+        with self._lock:
+            self.global_version += 1
+
+    def get(self, topic: Optional[str] = None) -> int:
+        """Versi topic, atau versi global jika topic None"""
+        if topic is None:
+            return self.global_version
+        return self._topics.get(topic, 0)
+
+
+class BaseDedupStore(ABC):
+    """
+    Interface untuk dedup backend.
+    Backend wajib mengimplementasikan operasi batch; operasi single-key
+    (is_duplicate, mark_processed) diturunkan dari operasi batch.
+    Operasi tulis publik menaikkan WriteVersions setelah backend selesai menulis.
+    """
+
+    def __init__(self):
+        self.versions = WriteVersions()
+
+    @abstractmethod
+    def contains_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        """
+        Check banyak key sekaligus.
+
+        Args:
+            keys: List of (topic, event_id) tuples
+
+        Returns:
+            List of bool sejajar dengan keys: True jika sudah pernah diproses
+        """
+
+    @abstractmethod
+    def _mark_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        """Implementasi backend untuk mark_processed_many"""
+
+    @abstractmethod
+    def _remove_many(self, keys: list[tuple[str, str]]) -> int:
+        """Implementasi backend untuk remove_many"""
+
+    @abstractmethod
+    def _clear(self):
+        """Implementasi backend untuk clear"""
+
+    def mark_processed_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        """
+        Mark banyak event sekaligus secara atomik.
+
+        Args:
+            keys: List of (topic, event_id) tuples
+
+        Returns:
+            List of bool sejajar dengan keys: True jika event baru, False jika duplicate
+            (termasuk duplikat di dalam batch yang sama)
+        """
+        if not keys:
+            return []
+        results = self._mark_many(keys)
+        self.versions.bump(key[0] for key, is_new in zip(keys, results) if is_new)
+        return results
+
+    def remove_many(self, keys: list[tuple[str, str]]) -> int:
+        """
+        Hapus (topic, event_id) dari store, mis. setelah key-range handoff ke node lain.
+
+        Returns:
+            Jumlah key yang terhapus
+        """
+        if not keys:
+            return 0
+        removed = self._remove_many(keys)
+        if removed:
+            self.versions.bump(key[0] for key in keys)
+        return removed
+
+    def clear(self):
+        """Clear all data (for testing purposes)"""
+        self._clear()
+        self.versions.bump_all()
+
+    @abstractmethod
+    def get_all_topics(self) -> list[str]:
+        """Get list of unique topics"""
+
+    @abstractmethod
+    def get_events_by_topic(self, topic: Optional[str] = None) -> list[tuple[str, str]]:
+        """Get (topic, event_id) yang sudah diproses, optional filter by topic"""
+
+    @abstractmethod
+    def count_processed(self) -> int:
+        """Get total count of unique processed events"""
+
+    def close(self):
+        """Lepaskan resource backend (koneksi, file handle)"""
+
+    def data_version(self) -> Optional[Hashable]:
+        """
+        Versi data yang terlihat oleh semua proses/instance yang berbagi store.
+
+        WriteVersions hanya menghitung write dari proses ini; backend yang bisa
+        ditulis proses lain (SQLite dengan beberapa worker uvicorn, Redis yang
+        dipakai beberapa instance) mengembalikan token yang berubah setiap kali
+        ada write dari luar, sehingga cache response ikut ter-invalidate.
+
+        Returns:
+            Token versi, atau None jika store hanya dapat ditulis proses ini
+        """
+        return None
+
+    def is_duplicate(self, topic: str, event_id: str) -> bool:
+        """
+        Check apakah event sudah pernah diproses.
+
+        Returns:
+            True jika duplicate (sudah ada), False jika baru
+        """
+        return self.contains_many([(topic, event_id)])[0]
+
+    def mark_processed(self, topic: str, event_id: str) -> bool:
+        """
+        Mark event sebagai sudah diproses.
+
+        Returns:
+            True jika berhasil mark (event baru), False jika sudah ada (duplicate)
+        """
+        marked = self.mark_processed_many([(topic, event_id)])[0]
+        if marked:
+            logger.debug(f"Marked as processed: topic={topic}, event_id={event_id}")
+        else:
+            logger.info(f"Duplicate detected: topic={topic}, event_id={event_id}")
+        return marked
+
+
+class DedupStore(BaseDedupStore):
     """
     Persistent deduplication store menggunakan SQLite.
     Thread-safe untuk concurrent access.
+
+    Satu koneksi persisten dipakai bersama (dilindungi lock) dengan WAL journal,
+    sehingga tidak ada biaya open/close database per operasi.
     """
-    
+
     def __init__(self, db_path: str = "/app/data/dedup.db"):
         """
         Initialize dedup store dengan SQLite database.
-        
+
         Args:
             db_path: Path ke SQLite database file
         """
+        super().__init__()
         self.db_path = db_path
         self._lock = threading.Lock()
-        
+
         # Create directory if not exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+
         # Initialize database
         self._init_db()
         logger.info(f"DedupStore initialized with database: {db_path}")
-    
+
     def _init_db(self):
         """Create table if not exists"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS processed_events (
-                    topic TEXT NOT NULL,
-                    event_id TEXT NOT NULL,
-                    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (topic, event_id)
-                )
-            """)
-            # Create index for faster lookups
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_topic 
-                ON processed_events(topic)
-            """)
-            conn.commit()
-    
-    def is_duplicate(self, topic: str, event_id: str) -> bool:
-        """
-        Check apakah event sudah pernah diproses.
-        
-        Args:
-            topic: Topic event
-            event_id: Event ID
-            
-        Returns:
-            True jika duplicate (sudah ada), False jika baru
-        """
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        # WITHOUT ROWID: primary key (topic, event_id) sekaligus menjadi clustered
+        # index, sehingga lookup by topic tidak memerlukan index tambahan
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_events (
+                topic TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (topic, event_id)
+            ) WITHOUT ROWID
+        """)
+
+    def contains_many(self, keys: list[tuple[str, str]]) -> list[bool]:
+        # Point lookup per key via primary key; lebih cepat daripada
+        # "(topic, event_id) IN (VALUES ...)" yang tidak memakai index
         with self._lock:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute(
+            execute = self._conn.execute
+            return [
+                execute(
                     "SELECT 1 FROM processed_events WHERE topic = ? AND event_id = ?",
-                    (topic, event_id)
-                )
-                result = cursor.fetchone()
-                return result is not None
-    
-    def mark_processed(self, topic: str, event_id: str) -> bool:
-        """
-        Mark event sebagai sudah diproses.
-        
-        Args:
-            topic: Topic event
-            event_id: Event ID
-            
-        Returns:
-            True jika berhasil mark (event baru), False jika sudah ada (duplicate)
-        """
+                    key
+                ).fetchone() is not None
+                for key in keys
+            ]
+
+    def _mark_many(self, keys: list[tuple[str, str]]) -> list[bool]:
         with self._lock:
+            results = []
+            self._conn.execute("BEGIN IMMEDIATE")
             try:
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute(
-                        "INSERT INTO processed_events (topic, event_id) VALUES (?, ?)",
+                for topic, event_id in keys:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO processed_events (topic, event_id) VALUES (?, ?)",
                         (topic, event_id)
                     )
-                    conn.commit()
-                    logger.debug(f"Marked as processed: topic={topic}, event_id={event_id}")
-                    return True
-            except sqlite3.IntegrityError:
-                # Already exists (duplicate)
-                logger.info(f"Duplicate detected: topic={topic}, event_id={event_id}")
-                return False
-    
+                    results.append(cursor.rowcount == 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return results
+
+    def _remove_many(self, keys: list[tuple[str, str]]) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.executemany(
+                    "DELETE FROM processed_events WHERE topic = ? AND event_id = ?",
+                    keys
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
     def get_all_topics(self) -> list[str]:
         """
         Get list of unique topics.
-        
+
         Returns:
             List of unique topics
         """
         with self._lock:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT DISTINCT topic FROM processed_events")
-                return [row[0] for row in cursor.fetchall()]
-    
+            cursor = self._conn.execute("SELECT DISTINCT topic FROM processed_events")
+            return [row[0] for row in cursor.fetchall()]
+
     def get_events_by_topic(self, topic: Optional[str] = None) -> list[tuple[str, str]]:
         """
         Get processed events by topic.
-        
+
         Args:
             topic: Filter by topic, None for all events
-            
+
         Returns:
             List of (topic, event_id) tuples
         """
         with self._lock:
-            with sqlite3.connect(self.db_path) as conn:
-                if topic:
-                    cursor = conn.execute(
-                        "SELECT topic, event_id FROM processed_events WHERE topic = ?",
-                        (topic,)
-                    )
-                else:
-                    cursor = conn.execute(
-                        "SELECT topic, event_id FROM processed_events"
-                    )
-                return cursor.fetchall()
-    
+            if topic:
+                cursor = self._conn.execute(
+                    "SELECT topic, event_id FROM processed_events WHERE topic = ?",
+                    (topic,)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "SELECT topic, event_id FROM processed_events"
+                )
+            return cursor.fetchall()
+
     def count_processed(self) -> int:
         """
         Get total count of unique processed events.
-        
+
         Returns:
             Total unique events processed
         """
         with self._lock:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT COUNT(*) FROM processed_events")
-                return cursor.fetchone()[0]
-    
-    def clear(self):
-        """Clear all data (for testing purposes)"""
+            cursor = self._conn.execute("SELECT COUNT(*) FROM processed_events")
+            return cursor.fetchone()[0]
+
+    def data_version(self) -> int:
+        # Berubah setiap kali koneksi lain (worker/proses lain) commit ke database;
+        # write dari koneksi ini sendiri sudah tercatat di WriteVersions
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM processed_events")
+            logger.warning("DedupStore cleared")
+
+    def close(self):
         with self._lock:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("DELETE FROM processed_events")
-                conn.commit()
-                logger.warning("DedupStore cleared")
+            self._conn.close()
+
+
+BACKENDS = ("sqlite", "memory", "lsm", "redis")
+
+
+def create_dedup_store(backend: Optional[str] = None, **options) -> BaseDedupStore:
+    """
+    Buat dedup backend berdasarkan nama atau environment variable.
+    Dengan DEDUP_SHM=1 (atau shm=True) backend dibungkus SharedMemoryDedupStore
+    agar semua worker uvicorn di satu host berbagi tabel fingerprint.
+
+    Args:
+        backend: "sqlite", "memory", "lsm", atau "redis"; default dari DEDUP_BACKEND
+        **options: Override opsi backend (db_path, path, url, shm, shm_name)
+
+    Returns:
+        Instance BaseDedupStore
+
+    Raises:
+        ValueError: Jika nama backend tidak dikenal
+    """
+    backend = (backend or os.getenv("DEDUP_BACKEND", "sqlite")).lower()
+
+    if backend == "sqlite":
+        db_path = options.get("db_path") or os.getenv("DEDUP_DB_PATH", "/app/data/dedup.db")
+        store = DedupStore(db_path)
+    elif backend == "memory":
+        from .dedup_memory import MemoryDedupStore
+        store = MemoryDedupStore()
+    elif backend == "lsm":
+        from .dedup_lsm import LSMDedupStore
+        path = options.get("path") or os.getenv("DEDUP_LSM_PATH", "/app/data/dedup-lsm")
+        store = LSMDedupStore(path)
+    elif backend == "redis":
+        from .dedup_redis import RedisDedupStore
+        url = options.get("url") or os.getenv("DEDUP_REDIS_URL", "redis://localhost:6379/0")
+        store = RedisDedupStore(url)
+    else:
+        raise ValueError(f"Unknown dedup backend: {backend!r} (expected one of {BACKENDS})")
+
+    shm = options.get("shm")
+    if shm is None:
+        shm = os.getenv("DEDUP_SHM", "0") == "1"
+    if shm:
+        from .dedup_shm import SharedMemoryDedupStore, create_shared_table
+        try:
+            table = create_shared_table(options.get("shm_name"))
+        except Exception:
+            store.close()
+            raise
+        return SharedMemoryDedupStore(store, table)
+    return store
@@ -0,0 +1,204 @@
+"""
+Queue event dengan sub-queue per topic dan weighted fair scheduling.
+
+Topic dikelompokkan ke priority class (0 = tertinggi); class yang lebih tinggi
+selalu dilayani lebih dulu. Di dalam satu class, topic dilayani dengan
+deficit round robin (DRR) sehingga flood pada satu topic tidak membuat topic
+lain kelaparan. Interface-nya kompatibel dengan asyncio.Queue
+(put, get, get_nowait, qsize, task_done, join) sehingga dapat langsung
+dipakai oleh EventConsumer.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+
+def parse_topic_map(spec: Optional[str], cast: Callable[[str], Any]) -> Dict[str, Any]:
+    """
+    Parse konfigurasi per topic dari format "topic=value,topic=value".
+
+    Args:
+        spec: String konfigurasi (boleh kosong/None)
+        cast: Fungsi konversi value, mis. int atau float
+
+    Returns:
+        Mapping topic -> value
+    """
+    result = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        topic, sep, value = item.rpartition("=")
+        if not sep or not topic.strip():
+            raise ValueError(f"Invalid topic mapping: {item!r}")
+        result[topic.strip()] = cast(value.strip())
+    return result
+
+
+class _TopicQueue:
+    """State satu sub-queue topic"""
+
+    __slots__ = ("items", "priority", "quantum", "deficit", "enqueued", "dequeued",
+                 "total_wait", "max_wait")
+
+    def __init__(self, priority: int, quantum: float):
+        self.items: Deque[Tuple[float, Any]] = deque()
+        self.priority = priority
+        self.quantum = quantum
+        self.deficit = 0.0
+        self.enqueued = 0
+        self.dequeued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class FairEventQueue:
+    """
+    Queue per topic dengan priority class dan deficit round robin.
+    """
+
+    def __init__(
+        self,
+        priorities: Optional[Dict[str, int]] = None,
+        weights: Optional[Dict[str, float]] = None,
+        default_priority: int = 1,
+        quantum: int = 8,
+    ):
+        """
+        Initialize queue.
+
+        Args:
+            priorities: Mapping topic -> priority class (0 = tertinggi)
+            weights: Mapping topic -> bobot DRR (default 1.0)
+            default_priority: Priority class untuk topic yang tidak dikonfigurasi
+            quantum: Jumlah event per giliran untuk topic dengan bobot 1.0
+        """
+        if any(w <= 0 for w in (weights or {}).values()):
+            raise ValueError("Topic weights must be positive")
+        self.priorities = dict(priorities or {})
+        self.weights = dict(weights or {})
+        self.default_priority = default_priority
+        self.quantum = quantum
+
+        self._topics: Dict[str, _TopicQueue] = {}
+        # Per priority class: deque of topic yang sub-queue-nya tidak kosong
+        self._active: Dict[int, Deque[str]] = {}
+        self._size = 0
+        self._unfinished = 0
+        self._not_empty = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def _topic_queue(self, topic: str) -> _TopicQueue:
+        tq = self._topics.get(topic)
+        if tq is None:
+            tq = _TopicQueue(
+                self.priorities.get(topic, self.default_priority),
+                self.quantum * self.weights.get(topic, 1.0),
+            )
+            self._topics[topic] = tq
+        return tq
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return False
+
+    def put_nowait(self, event: Any):
+        tq = self._topic_queue(event.topic)
+        if not tq.items:
+            self._active.setdefault(tq.priority, deque()).append(event.topic)
+        tq.items.append((time.monotonic(), event))
+        tq.enqueued += 1
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._not_empty.set()
+
+    async def put(self, event: Any):
+        self.put_nowait(event)
+
+    def get_nowait(self) -> Any:
+        """
+        Ambil event berikutnya sesuai priority class lalu DRR.
+
+        Raises:
+            asyncio.QueueEmpty: Jika semua sub-queue kosong
+        """
+        if not self._size:
+            raise asyncio.QueueEmpty
+        priority = min(p for p, active in self._active.items() if active)
+        active = self._active[priority]
+        while True:
+            topic = active[0]
+            tq = self._topics[topic]
+            if tq.deficit < 1:
+                # Topic mendapat giliran baru: tambahkan quantum
+                tq.deficit += tq.quantum
+                if tq.deficit < 1:
+                    active.rotate(-1)
+                    continue
+            break
+
+        enqueued_at, event = tq.items.popleft()
+        tq.deficit -= 1
+        wait = time.monotonic() - enqueued_at
+        tq.dequeued += 1
+        tq.total_wait += wait
+        if wait > tq.max_wait:
+            tq.max_wait = wait
+
+        if not tq.items:
+            tq.deficit = 0.0
+            active.popleft()
+        elif tq.deficit < 1:
+            active.rotate(-1)
+
+        self._size -= 1
+        if not self._size:
+            self._not_empty.clear()
+        return event
+
+    async def get(self) -> Any:
+        while not self._size:
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def task_done(self):
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get metrik per topic: depth dan wait time.
+
+        Returns:
+            Mapping topic -> {depth, priority, weight, enqueued, dequeued,
+            avg_wait_ms, max_wait_ms, oldest_wait_ms}
+        """
+        now = time.monotonic()
+        return {
+            topic: {
+                "depth": len(tq.items),
+                "priority": tq.priority,
+                "weight": tq.quantum / self.quantum,
+                "enqueued": tq.enqueued,
+                "dequeued": tq.dequeued,
+                "avg_wait_ms": round(tq.total_wait / tq.dequeued * 1000, 3) if tq.dequeued else 0.0,
+                "max_wait_ms": round(tq.max_wait * 1000, 3),
+                "oldest_wait_ms": round((now - tq.items[0][0]) * 1000, 3) if tq.items else 0.0,
+            }
+            for topic, tq in self._topics.items()
+        }
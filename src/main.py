@@ -3,16 +3,31 @@ FastAPI application untuk Pub-Sub Log Aggregator.
 Menyediakan endpoint untuk publish event dan query statistics.
 """
 import asyncio
+import json
 import logging
+import os
+import re
+import time
 from contextlib import asynccontextmanager
 from typing import List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 
-from .models import Event, EventBatch, StatsResponse
-from .dedup_store import DedupStore
+from .models import Event, EventBatch, QueuedEvent, StatsResponse, MembershipUpdate, HandoffRequest, KeysRequest
+from .dedup_store import BaseDedupStore, create_dedup_store
 from .consumer import EventConsumer
+from .batching import AdaptiveBatcher
+from .fair_queue import FairEventQueue, parse_topic_map
+from .cluster import ClusterRouter, FORWARDED_HEADER, PeerBackpressure, parse_members
+from .response_cache import CacheEntry, ResponseCache
+from .profiling import LoopMonitor, profile_cprofile, profile_sampling
+from .sinks import create_sinks
+from .transforms import create_transform_stage
+from .capture import CaptureWriter
+from .search_index import SearchIndex, create_search_index
+from .rate_limit import RateLimiter, create_rate_limiter, retry_after_header
+from .rollups import RollupStore, create_rollups, parse_time
 
 # Configure logging
 logging.basicConfig(
@@ -22,9 +37,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Global instances
-event_queue: asyncio.Queue = None
-dedup_store: DedupStore = None
+event_queue: FairEventQueue = None
+dedup_store: BaseDedupStore = None
 consumer: EventConsumer = None
+cluster: Optional[ClusterRouter] = None
+response_cache: Optional[ResponseCache] = None
+loop_monitor: Optional[LoopMonitor] = None
+capture: Optional[CaptureWriter] = None
+search_index: Optional[SearchIndex] = None
+rate_limiter: Optional[RateLimiter] = None
+rollups: Optional[RollupStore] = None
+_profile_lock = asyncio.Lock()
 
 
 @asynccontextmanager
@@ -33,14 +56,76 @@ async def lifespan(app: FastAPI):
     Lifecycle manager untuk startup dan shutdown.
     Initialize dedup store, queue, dan consumer.
     """
-    global event_queue, dedup_store, consumer
+    global event_queue, dedup_store, consumer, cluster, response_cache, loop_monitor, capture, search_index
+    global rate_limiter, rollups
     
     logger.info("Starting Pub-Sub Log Aggregator...")
     
     # Initialize components
-    event_queue = asyncio.Queue()
-    dedup_store = DedupStore()
-    consumer = EventConsumer(dedup_store, event_queue)
+    # Sub-queue per topic: priority class + weighted deficit round robin
+    event_queue = FairEventQueue(
+        priorities=parse_topic_map(os.getenv("QUEUE_PRIORITIES", "error.reports=0"), int),
+        weights=parse_topic_map(os.getenv("QUEUE_WEIGHTS"), float),
+        default_priority=int(os.getenv("QUEUE_DEFAULT_PRIORITY", "1")),
+    )
+    # Backend dipilih via DEDUP_BACKEND (sqlite, memory, lsm, redis)
+    dedup_store = create_dedup_store()
+    batcher = AdaptiveBatcher(
+        min_batch=int(os.getenv("BATCH_MIN", "1")),
+        max_batch=int(os.getenv("BATCH_MAX", "2000")),
+        target_latency=float(os.getenv("BATCH_TARGET_LATENCY_MS", "50")) / 1000,
+        max_linger=float(os.getenv("BATCH_MAX_LINGER_MS", "5")) / 1000,
+    )
+    # Output sink aktif jika SINK_FILE_DIR dan/atau SINK_WEBHOOK_URL di-set,
+    # transform (process pool) aktif jika TRANSFORMS di-set
+    sinks = create_sinks()
+    # Inverted index untuk /search (SEARCH_INDEX=1) sebagai sink setelah transform
+    search_index = create_search_index()
+    if search_index:
+        sinks.append(search_index)
+    # Rollup 10s/1m/1h untuk topic metrik (ROLLUP_TOPICS) sebagai sink setelah transform
+    rollups = create_rollups()
+    if rollups:
+        sinks.append(rollups)
+    consumer = EventConsumer(
+        dedup_store, event_queue, batcher,
+        sinks=sinks, transformer=create_transform_stage(sinks),
+    )
+    
+    # Token bucket per source/topic di /publish (RATE_LIMIT_SOURCE, RATE_LIMIT_TOPIC, ...)
+    rate_limiter = create_rate_limiter()
+    
+    # Response cache untuk /events dan /stats (RESPONSE_CACHE_BYTES=0 menonaktifkan)
+    cache_bytes = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+    response_cache = ResponseCache(cache_bytes) if cache_bytes > 0 else None
+    
+    # Cluster mode aktif jika CLUSTER_NODE_ID dan CLUSTER_NODES di-set
+    node_id = os.getenv("CLUSTER_NODE_ID")
+    members = os.getenv("CLUSTER_NODES")
+    if node_id and members:
+        cluster = ClusterRouter(
+            node_id,
+            parse_members(members),
+            dedup_store,
+            batch_size=int(os.getenv("CLUSTER_BATCH_SIZE", "500")),
+            linger=float(os.getenv("CLUSTER_LINGER_MS", "10")) / 1000,
+            max_forward_buffer=int(os.getenv("CLUSTER_FORWARD_BUFFER", "50000")),
+        )
+        await cluster.start()
+    else:
+        cluster = None
+    
+    # Loop lag monitor hanya dibuat jika diaktifkan (LOOP_MONITOR=1 atau via /debug/loop)
+    loop_monitor = None
+    if os.getenv("LOOP_MONITOR", "0") == "1":
+        loop_monitor = _create_loop_monitor()
+        loop_monitor.start()
+    
+    # Capture traffic /publish sejak startup jika CAPTURE_PATH di-set
+    capture = None
+    if os.getenv("CAPTURE_PATH"):
+        capture = CaptureWriter(os.getenv("CAPTURE_PATH"))
+        capture.start()
     
     # Start consumer
     await consumer.start()
@@ -51,10 +136,23 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Pub-Sub Log Aggregator...")
+    if cluster:
+        await cluster.stop()
+    if loop_monitor:
+        await loop_monitor.stop()
+    if capture:
+        await capture.stop()
     await consumer.stop()
+    dedup_store.close()
     logger.info("Shutdown complete")
 
 
+def _create_loop_monitor() -> LoopMonitor:
+    return LoopMonitor(
+        threshold=float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100")) / 1000
+    )
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Pub-Sub Log Aggregator",
@@ -75,15 +173,21 @@ async def root():
 
 
 @app.post("/publish", status_code=202)
-async def publish_events(payload: Union[Event, EventBatch]):
+async def publish_events(payload: Union[Event, EventBatch], request: Request):
     """
     Publish event atau batch events ke aggregator.
+    Dalam cluster mode, event milik node lain diteruskan ke node pemiliknya.
+    Jika rate limit aktif, event yang melebihi quota source/topic ditolak:
+    batch diterima sebagian (202 dengan rejected_indices), atau 429 jika
+    seluruh event ditolak; keduanya dengan header Retry-After.
     
     Args:
         payload: Single Event atau EventBatch
+        request: HTTP request (untuk mendeteksi forwarding antar node)
         
     Returns:
-        Acceptance message
+        Acceptance message, 429 jika seluruh event di-throttle, atau 503 jika
+        buffer forwarding ke peer pemilik penuh
         
     Raises:
         HTTPException: Jika validation gagal
@@ -95,12 +199,74 @@ async def publish_events(payload: Union[Event, EventBatch]):
         else:
             events = payload.events
         
-        # Put events ke queue untuk processing
-        for event in events:
-            await event_queue.put(event)
+        forwarded = FORWARDED_HEADER in request.headers
+        
+        # Capture body asli request client (bukan forwarding antar node) untuk replay
+        if capture and capture.running and not forwarded:
+            capture.record(await request.body())
+        
+        # Rate limit hanya di node ingress (event forwarding sudah dibatasi di sana)
+        limited = None
+        if rate_limiter and not forwarded:
+            limited = rate_limiter.admit((event.source, event.topic) for event in events)
+            if limited.rejected:
+                events = [events[i] for i in limited.admitted]
+                if not events:
+                    logger.warning(f"Rate limited: rejected {len(limited.rejected)} event(s)")
+                    return JSONResponse(
+                        status_code=429,
+                        content={
+                            "detail": "Rate limit exceeded",
+                            "rejected": len(limited.rejected),
+                            "rejected_indices": limited.rejected,
+                            "retry_after": round(limited.retry_after, 3),
+                        },
+                        headers={"Retry-After": retry_after_header(limited.retry_after)},
+                    )
+        
+        # Event yang sudah diteruskan node lain langsung diproses lokal
+        local_events = events
+        if cluster:
+            try:
+                if not forwarded:
+                    local_events = cluster.route(events)
+                # Key yang baru pindah ke node ini dicek ke pemilik lama selama handoff
+                await cluster.check_moved(local_events)
+            except PeerBackpressure as e:
+                # Peer pemilik tidak mengikuti (mis. down): tolak daripada 202 tanpa jaminan
+                logger.warning(f"Rejected {len(events)} event(s): {e}")
+                if limited:
+                    # Seluruh request ditolak: token event yang sudah di-admit dikembalikan
+                    rate_limiter.refund((event.source, event.topic) for event in events)
+                return JSONResponse(
+                    status_code=503,
+                    content={"detail": str(e), "peer": e.peer_id, "retry_after": e.retry_after},
+                    headers={"Retry-After": retry_after_header(e.retry_after)},
+                )
+        
+        # Put events ke queue untuk processing (dalam representasi compact)
+        for event in local_events:
+            await event_queue.put(QueuedEvent.from_event(event))
         
         logger.info(f"Accepted {len(events)} event(s) for processing")
         
+        if limited and limited.rejected:
+            logger.warning(
+                f"Rate limited: accepted {len(events)}, rejected {len(limited.rejected)} event(s)"
+            )
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "status": "partial",
+                    "count": len(events),
+                    "message": f"{len(events)} event(s) queued, {len(limited.rejected)} rate limited",
+                    "rejected": len(limited.rejected),
+                    "rejected_indices": limited.rejected,
+                    "retry_after": round(limited.retry_after, 3),
+                },
+                headers={"Retry-After": retry_after_header(limited.retry_after)},
+            )
+        
         return {
             "status": "accepted",
             "count": len(events),
@@ -112,10 +278,41 @@ async def publish_events(payload: Union[Event, EventBatch]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _json_bytes(data) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _cached_response(request: Request, key, tag, render, ttl: Optional[float] = None) -> Response:
+    """
+    Layani response dari cache (pre-serialized) dengan dukungan ETag.
+    
+    Args:
+        request: HTTP request (untuk header If-None-Match)
+        key: Cache key (endpoint + params)
+        tag: Versi data saat ini; entry dengan tag berbeda dianggap stale
+        render: Fungsi yang menghasilkan body JSON (bytes) saat cache miss
+        ttl: Optional masa berlaku entry (detik)
+        
+    Returns:
+        200 dengan body, atau 304 jika ETag cocok dengan If-None-Match
+    """
+    if response_cache:
+        entry, hit = response_cache.get_or_render(key, tag, render, ttl)
+    else:
+        entry, hit = CacheEntry(render(), tag), False
+    
+    headers = {"ETag": entry.etag, "X-Cache": "HIT" if hit else "MISS"}
+    if entry.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 @app.get("/events")
-async def get_events(topic: Optional[str] = Query(None, description="Filter by topic")):
+async def get_events(request: Request, topic: Optional[str] = Query(None, description="Filter by topic")):
     """
     Get daftar event unik yang telah diproses.
+    Response di-cache dan divalidasi dengan versi tulis topic serta versi data
+    backend yang dibagi antar worker (ETag / If-None-Match).
     
     Args:
         topic: Optional filter by topic
@@ -124,13 +321,17 @@ async def get_events(topic: Optional[str] = Query(None, description="Filter by t
         List of processed events
     """
     try:
-        events = consumer.get_events(topic)
+        def render() -> bytes:
+            events = consumer.get_events(topic)
+            return _json_bytes({
+                "count": len(events),
+                "topic": topic,
+                "events": events
+            })
         
-        return {
-            "count": len(events),
-            "topic": topic,
-            "events": events
-        }
+        # data_version menangkap write dari worker/instance lain yang berbagi store
+        tag = (dedup_store.versions.get(topic), dedup_store.data_version())
+        return _cached_response(request, ("events", topic), tag, render)
     
     except Exception as e:
         logger.error(f"Error getting events: {e}", exc_info=True)
@@ -138,22 +339,270 @@ async def get_events(topic: Optional[str] = Query(None, description="Filter by t
 
 
 @app.get("/stats", response_model=StatsResponse)
-async def get_stats():
+async def get_stats(request: Request):
     """
     Get statistics aggregator.
+    Response di-cache selama STATS_CACHE_TTL_MS selama tidak ada event baru yang diterima.
     
     Returns:
         Statistics: received, unique_processed, duplicate_dropped, topics, uptime
     """
     try:
-        stats = consumer.get_stats()
-        return StatsResponse(**stats)
+        def render() -> bytes:
+            stats = consumer.get_stats()
+            if response_cache:
+                stats['cache'] = response_cache.snapshot()
+            if rate_limiter:
+                stats['rate_limit'] = rate_limiter.snapshot()
+            return StatsResponse(**stats).model_dump_json().encode('utf-8')
+        
+        tag = (dedup_store.versions.get(), dedup_store.data_version(), consumer.stats['received'])
+        ttl = float(os.getenv("STATS_CACHE_TTL_MS", "1000")) / 1000
+        return _cached_response(request, ("stats",), tag, render, ttl)
     
     except Exception as e:
         logger.error(f"Error getting stats: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/rate-limits")
+async def get_rate_limits(limit: int = Query(100, ge=1, le=10000, description="Jumlah source maksimum")):
+    """
+    Get metrik throttling per source (bucket aktif), paling banyak di-throttle dulu.
+    
+    Raises:
+        HTTPException: Jika rate limit tidak aktif
+    """
+    if not rate_limiter:
+        raise HTTPException(status_code=404, detail="Rate limiting is disabled")
+    return {
+        **rate_limiter.snapshot(top=0),
+        "sources": rate_limiter.source_metrics(limit),
+    }
+
+
+@app.get("/cluster")
+async def get_cluster():
+    """
+    Get status cluster: membership, statistik forwarding dan handoff.
+    
+    Raises:
+        HTTPException: Jika cluster mode tidak aktif
+    """
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster mode is disabled")
+    return cluster.get_stats()
+
+
+@app.post("/cluster/members")
+async def update_cluster_members(update: MembershipUpdate):
+    """
+    Update membership cluster dan jalankan key-range handoff.
+    
+    Args:
+        update: Membership baru
+        
+    Returns:
+        Ringkasan handoff
+    """
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster mode is disabled")
+    try:
+        return await cluster.update_members(update.nodes, propagate=update.propagate)
+    except Exception as e:
+        logger.error(f"Error updating cluster members: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/cluster/handoff")
+async def accept_handoff(handoff: HandoffRequest):
+    """
+    Terima key yang diserahkan node lain setelah perubahan membership, atau
+    tanda bahwa node pengirim sudah menyelesaikan handoff (complete).
+    
+    Args:
+        handoff: List of (topic, event_id)
+        
+    Returns:
+        Jumlah key yang diterima
+    """
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster mode is disabled")
+    accepted = await asyncio.to_thread(cluster.accept_handoff, handoff.keys) if handoff.keys else 0
+    if handoff.complete:
+        if not handoff.node or handoff.members is None:
+            raise HTTPException(status_code=400, detail="complete requires node and members")
+        await cluster.handoff_complete(handoff.node, handoff.members)
+    return {"received": len(handoff.keys), "accepted": accepted}
+
+
+@app.post("/cluster/contains")
+async def contains_keys(request: KeysRequest):
+    """
+    Cek apakah key sudah diproses node ini (dipakai pemilik baru selama handoff).
+    
+    Args:
+        request: List of (topic, event_id)
+        
+    Returns:
+        Flag processed per key
+    """
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster mode is disabled")
+    return {"processed": await cluster.contains(request.keys)}
+
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, description="Kata kunci (semua token harus cocok)"),
+    topic: Optional[str] = Query(None, description="Filter by topic"),
+    limit: int = Query(50, ge=1, le=1000, description="Jumlah hasil maksimum"),
+):
+    """
+    Cari event berdasarkan isi payload (default payload.message), terbaru lebih dulu.
+    
+    Returns:
+        Dictionary dengan hasil pencarian, count, truncated, dan took_ms
+        
+    Raises:
+        HTTPException: 503 jika search index tidak diaktifkan
+    """
+    if not search_index:
+        raise HTTPException(status_code=503, detail="Search index is disabled (set SEARCH_INDEX=1)")
+    result = await asyncio.to_thread(search_index.search, q, topic, limit)
+    return {"query": q, "topic": topic, **result}
+
+
+@app.get("/rollups")
+async def get_rollups(
+    topic: str = Query(..., min_length=1, description="Topic"),
+    field: Optional[str] = Query(None, description="Field numerik payload; kosong = jumlah event"),
+    source: Optional[str] = Query(None, description="Filter by source"),
+    start: Optional[str] = Query(None, description="Awal rentang (ISO 8601 atau epoch); default end - 1 jam"),
+    end: Optional[str] = Query(None, description="Akhir rentang (ISO 8601 atau epoch); default sekarang"),
+    group_by: Optional[str] = Query(None, pattern="^source$", description="'source' = series per source"),
+    tier: Optional[str] = Query(None, description="Paksa tier tertentu (mis. 1m)"),
+    max_points: int = Query(1000, ge=1, le=100_000, description="Batas bucket untuk pemilihan tier"),
+):
+    """
+    Query rollup count/sum/min/max/avg per bucket dari satu tier: tier paling
+    halus yang mencakup rentang dalam max_points, sehingga rentang panjang
+    dibaca dari tier kasar.
+    
+    Returns:
+        Dictionary dengan tier, step, points (atau series per source), dan took_ms
+        
+    Raises:
+        HTTPException: 503 jika rollup tidak diaktifkan, 400 jika parameter tidak valid
+    """
+    if not rollups:
+        raise HTTPException(status_code=503, detail="Rollups are disabled (set ROLLUP_TOPICS)")
+    try:
+        end_ts = parse_time(end) if end else time.time()
+        start_ts = parse_time(start) if start else end_ts - 3600
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        result = await asyncio.to_thread(
+            rollups.query, topic, start_ts, end_ts, field, source, group_by == "source", tier, max_points,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"topic": topic, "field": field, "source": source, **result}
+
+
+@app.get("/capture")
+async def capture_status():
+    """
+    Get status capture traffic /publish.
+    """
+    if not capture:
+        return {"running": False}
+    return capture.snapshot()
+
+
+@app.post("/capture/start")
+async def start_capture(name: Optional[str] = Query(None, description="Nama file capture (tanpa ekstensi)")):
+    """
+    Mulai capture request /publish ke {CAPTURE_DIR}/{name}.cap.gz.
+    
+    Raises:
+        HTTPException: 409 jika capture sedang berjalan, 400 jika nama tidak valid
+    """
+    global capture
+    if capture and capture.running:
+        raise HTTPException(status_code=409, detail=f"Capture already running: {capture.path}")
+    name = name or time.strftime("capture-%Y%m%dT%H%M%S", time.gmtime())
+    if not re.fullmatch(r"[\w.-]+", name):
+        raise HTTPException(status_code=400, detail="Invalid capture name")
+    directory = os.getenv("CAPTURE_DIR", "/app/data/captures")
+    os.makedirs(directory, exist_ok=True)
+    capture = CaptureWriter(os.path.join(directory, f"{name}.cap.gz"))
+    capture.start()
+    return capture.snapshot()
+
+
+@app.post("/capture/stop")
+async def stop_capture():
+    """
+    Stop capture dan tutup file.
+    
+    Returns:
+        Ringkasan capture (path, jumlah request, bytes)
+    """
+    if not capture or not capture.running:
+        raise HTTPException(status_code=409, detail="No capture running")
+    return await capture.stop()
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    seconds: float = Query(5.0, gt=0, le=60, description="Durasi profiling"),
+    mode: str = Query("sampling", pattern="^(sampling|cprofile)$", description="sampling atau cprofile"),
+    interval_ms: float = Query(5.0, gt=0, le=1000, description="Interval sampling"),
+):
+    """
+    Capture profile proses yang sedang berjalan selama N detik.
+    Output berupa collapsed stacks (kompatibel dengan flamegraph.pl / speedscope).
+    
+    Raises:
+        HTTPException: 409 jika profiling lain sedang berjalan
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="Another profile is already running")
+    async with _profile_lock:
+        if mode == "cprofile":
+            return await profile_cprofile(seconds)
+        return await profile_sampling(seconds, interval_ms / 1000)
+
+
+@app.get("/debug/loop")
+async def debug_loop():
+    """
+    Get statistik event-loop lag dan daftar slow callback terakhir.
+    """
+    if not loop_monitor:
+        return {"running": False}
+    return loop_monitor.snapshot()
+
+
+@app.post("/debug/loop")
+async def toggle_loop_monitor(enabled: bool = Query(..., description="Aktifkan/nonaktifkan monitor")):
+    """
+    Aktifkan atau nonaktifkan loop lag monitor saat runtime.
+    """
+    global loop_monitor
+    if enabled:
+        if not loop_monitor:
+            loop_monitor = _create_loop_monitor()
+        loop_monitor.start()
+    elif loop_monitor:
+        await loop_monitor.stop()
+    return {"running": bool(loop_monitor and loop_monitor.running)}
+
+
 @app.get("/health")
 async def health_check():
     """
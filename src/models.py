@@ -2,8 +2,10 @@
 Model untuk Event yang akan diproses oleh aggregator.
 Menggunakan Pydantic untuk validasi schema.
 """
+import json
+import sys
 from pydantic import BaseModel, Field, field_validator
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from datetime import datetime
 
 
@@ -50,6 +52,61 @@ class Event(BaseModel):
         }
 
 
+class QueuedEvent:
+    """
+    Representasi event yang compact untuk disimpan di queue.
+    
+    Menggantikan instance Pydantic Event (dengan nested payload dict) selama event
+    menunggu di queue: topic dan source di-intern (nilainya berulang antar event)
+    dan payload disimpan sebagai JSON bytes yang baru di-parse saat diakses.
+    
+    Attributes:
+        topic: Nama topic (interned)
+        event_id: Unique identifier event
+        timestamp: Timestamp ISO8601
+        source: Sumber event (interned)
+        payload_raw: Payload dalam bentuk JSON bytes (None jika kosong)
+    """
+    __slots__ = ('topic', 'event_id', 'timestamp', 'source', 'payload_raw')
+    
+    def __init__(self, topic: str, event_id: str, timestamp: str, source: str,
+                 payload_raw: Optional[bytes] = None):
+        self.topic = sys.intern(topic)
+        self.event_id = event_id
+        self.timestamp = timestamp
+        self.source = sys.intern(source)
+        self.payload_raw = payload_raw or None
+    
+    @classmethod
+    def from_event(cls, event: Event) -> "QueuedEvent":
+        """Konversi Event tervalidasi menjadi QueuedEvent"""
+        payload_raw = None
+        if event.payload:
+            payload_raw = json.dumps(event.payload, separators=(',', ':')).encode('utf-8')
+        return cls(event.topic, event.event_id, event.timestamp, event.source, payload_raw)
+    
+    @property
+    def payload(self) -> Dict[str, Any]:
+        """Payload di-parse secara lazy dari JSON bytes"""
+        if self.payload_raw is None:
+            return {}
+        return json.loads(self.payload_raw)
+    
+    def model_dump(self) -> Dict[str, Any]:
+        """Dictionary dengan field yang sama seperti Event.model_dump()"""
+        return {
+            'topic': self.topic,
+            'event_id': self.event_id,
+            'timestamp': self.timestamp,
+            'source': self.source,
+            'payload': self.payload,
+        }
+    
+    def __repr__(self) -> str:
+        return (f"QueuedEvent(topic={self.topic!r}, event_id={self.event_id!r}, "
+                f"source={self.source!r})")
+
+
 class EventBatch(BaseModel):
     """Model untuk batch events"""
     events: list[Event] = Field(..., min_length=1)
@@ -62,3 +119,29 @@ class StatsResponse(BaseModel):
     duplicate_dropped: int = Field(..., description="Total duplicate events dropped")
     topics: list[str] = Field(..., description="List of unique topics")
     uptime: float = Field(..., description="Uptime in seconds")
+    batching: Optional[Dict[str, Any]] = Field(None, description="Adaptive micro-batching state")
+    queues: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Per-topic queue depth and wait time")
+    cache: Optional[Dict[str, Any]] = Field(None, description="Response cache hit-rate counters")
+    sinks: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Per-sink delivery counters")
+    transform: Optional[Dict[str, Any]] = Field(None, description="Transform pipeline counters and recent errors")
+    rate_limit: Optional[Dict[str, Any]] = Field(None, description="Ingress rate limiter counters and top throttled sources")
+    dedup: Optional[Dict[str, Any]] = Field(None, description="Shared-memory dedup table occupancy and hit counters")
+
+
+class MembershipUpdate(BaseModel):
+    """Request body untuk perubahan membership cluster"""
+    nodes: Dict[str, str] = Field(..., min_length=1, description="Mapping node_id -> base URL")
+    propagate: bool = Field(True, description="Teruskan membership baru ke semua node")
+
+
+class HandoffRequest(BaseModel):
+    """Request body untuk key-range handoff antar node"""
+    keys: list[tuple[str, str]] = Field(..., description="List of (topic, event_id)")
+    complete: bool = Field(False, description="Node pengirim sudah menyelesaikan handoff")
+    node: Optional[str] = Field(None, description="node_id pengirim (wajib jika complete)")
+    members: Optional[list[str]] = Field(None, description="Membership tempat handoff dilakukan")
+
+
+class KeysRequest(BaseModel):
+    """Request body untuk pengecekan key ke pemilik lama"""
+    keys: list[tuple[str, str]] = Field(..., description="List of (topic, event_id)")
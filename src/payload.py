@@ -0,0 +1,20 @@
+"""
+Helper untuk membaca payload event (dict JSON hasil decode).
+Dipakai bersama oleh search index dan rollup.
+"""
+from typing import Any, Dict
+
+
+def get_field(payload: Dict[str, Any], path: str) -> Any:
+    """
+    Ambil nilai dari payload dengan dotted path, mis. "fields.latency_ms".
+
+    Returns:
+        Nilai field, atau None jika salah satu bagian path tidak ada
+    """
+    value: Any = payload
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
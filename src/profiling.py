@@ -0,0 +1,245 @@
+"""
+Profiling on-demand dan instrumentasi event-loop lag.
+
+- SamplingProfiler: thread yang mengambil sample stack semua thread via
+  sys._current_frames() pada interval tetap, hasilnya collapsed stacks
+  ("frame;frame;frame count") untuk flamegraph.
+- profile_cprofile(): cProfile pada thread event loop selama N detik, hasilnya
+  dikonversi ke collapsed stacks caller;callee.
+- LoopMonitor: watchdog thread yang mendeteksi event loop terblokir (mis. call
+  DedupStore sinkron) dan mencatat stack loop thread saat blokir terjadi.
+
+Semua komponen hanya aktif saat diminta; tanpa itu tidak ada thread, hook,
+atau task tambahan.
+"""
+import asyncio
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+def _collapse(frame) -> str:
+    """Stack dari root ke leaf, dipisah ';'"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def format_collapsed(counts: Counter) -> str:
+    """Format Counter stack -> teks collapsed stacks (satu stack per baris)"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class SamplingProfiler:
+    """
+    Sampling profiler berbasis thread.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[List[int]] = None):
+        """
+        Initialize profiler.
+
+        Args:
+            interval: Jarak antar sample (detik)
+            thread_ids: Hanya sample thread ini (default semua kecuali thread profiler)
+        """
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.counts: Counter = Counter()
+        self.samples = 0
+
+    def run(self, seconds: float) -> Counter:
+        """
+        Jalankan sampling secara blocking (panggil dari thread terpisah).
+
+        Returns:
+            Counter collapsed stack -> jumlah sample
+        """
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for tid, frame in sys._current_frames().items():
+                if tid == me or (self.thread_ids and tid not in self.thread_ids):
+                    continue
+                thread = names.get(tid, str(tid))
+                self.counts[f"thread:{thread};{_collapse(frame)}"] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        return self.counts
+
+
+async def profile_sampling(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sampling profile semua thread selama N detik tanpa memblokir event loop.
+
+    Returns:
+        Collapsed stacks
+    """
+    profiler = SamplingProfiler(interval)
+    counts = await asyncio.to_thread(profiler.run, seconds)
+    return format_collapsed(counts)
+
+
+async def profile_cprofile(seconds: float) -> str:
+    """
+    cProfile thread event loop selama N detik.
+    Karena cProfile tidak merekam stack penuh, output berupa edge caller;callee
+    dengan bobot total time (mikrodetik).
+
+    Returns:
+        Collapsed stacks
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+
+    stats = pstats.Stats(profiler)
+    counts: Counter = Counter()
+    for func, (_, _, tottime, _, callers) in stats.stats.items():
+        callee = _pstats_name(func)
+        if not callers:
+            counts[callee] += int(tottime * 1e6)
+        for caller, caller_stats in callers.items():
+            # caller_stats: (cc, nc, tt, ct) untuk edge caller -> callee
+            counts[f"{_pstats_name(caller)};{callee}"] += int(caller_stats[2] * 1e6)
+    return format_collapsed(Counter({k: v for k, v in counts.items() if v > 0}))
+
+
+def _pstats_name(func) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{filename.rsplit('/', 1)[-1]}:{name}:{lineno}"
+
+
+class LoopMonitor:
+    """
+    Monitor event-loop lag dan slow callback.
+
+    Heartbeat coroutine memperbarui timestamp setiap `interval`. Watchdog thread
+    memeriksa timestamp tersebut; jika loop tidak merespons lebih dari
+    `threshold`, stack thread event loop direkam sebagai blocking callback.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, history: int = 50):
+        """
+        Initialize monitor.
+
+        Args:
+            interval: Interval heartbeat (detik)
+            threshold: Durasi blokir minimum untuk dicatat sebagai slow callback (detik)
+            history: Jumlah slow callback terakhir yang disimpan
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.slow_callbacks: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.lag_total = 0.0
+        self.ticks = 0
+        self._beat = time.monotonic()
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start heartbeat task dan watchdog thread (harus dipanggil dari event loop)"""
+        if self._running:
+            return
+        self._running = True
+        self._loop_thread_id = threading.get_ident()
+        self._loop = asyncio.get_running_loop()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._thread.join)
+
+    async def _heartbeat(self):
+        while self._running:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            self.lag_total += lag
+            self.ticks += 1
+            if lag > self.max_lag:
+                self.max_lag = lag
+            self._beat = now
+
+    def _watchdog(self):
+        reported_beat = None
+        check = min(self.threshold / 4, self.interval)
+        while self._running:
+            time.sleep(check)
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold:
+                continue
+            if beat == reported_beat:
+                # Blokir yang sama masih berlangsung: perbarui durasinya
+                self.slow_callbacks[-1]["blocked_ms"] = round(blocked * 1000, 3)
+                continue
+            # Rekam sekali per blokir: stack loop thread saat ini
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            task = asyncio.current_task(self._loop)
+            self.slow_callbacks.append({
+                "detected_at": time.time(),
+                "blocked_ms": round(blocked * 1000, 3),
+                "task": task.get_coro().__qualname__ if task else None,
+                "callback": _frame_name(frame),
+                "stack": _collapse(frame).split(";"),
+            })
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get statistik lag dan slow callback terakhir.
+
+        Returns:
+            Dictionary: running, last/max/avg lag (ms), jumlah tick, slow_callbacks
+        """
+        return {
+            "running": self._running,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "avg_lag_ms": round(self.lag_total / self.ticks * 1000, 3) if self.ticks else 0.0,
+            "ticks": self.ticks,
+            "threshold_ms": self.threshold * 1000,
+            "slow_callbacks": list(self.slow_callbacks),
+        }
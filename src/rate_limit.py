@@ -0,0 +1,300 @@
+"""
+Rate limiting ingress /publish dengan token bucket per source dan per topic.
+
+Setiap event memerlukan satu token dari bucket source-nya dan satu token dari
+bucket topic-nya (jika limit untuk dimensi tersebut dikonfigurasi). Event
+dalam satu batch diperiksa berurutan: event yang bucket-nya habis ditolak,
+event lain tetap diterima (partial admission), sehingga satu publisher yang
+sedang retry storm tidak menghabiskan kapasitas consumer untuk source lain.
+
+Retry-After dihitung dari defisit token: untuk setiap bucket yang menolak k
+event, waktu sampai min(k, burst) token tersedia; nilai terbesar dipakai.
+
+Bucket disimpan di OrderedDict dengan urutan akses (LRU): setiap check O(1)
+(lookup, refill, move_to_end). Bucket di depan yang idle lebih dari idle_ttl
+dibuang jika sudah penuh kembali, atau dipindah ke belakang jika belum.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .fair_queue import parse_topic_map
+
+
+class Quota(NamedTuple):
+    """Quota token bucket: rate (token/detik) dan burst (kapasitas bucket)"""
+    rate: float
+    burst: float
+
+
+def parse_quota(spec: str) -> Quota:
+    """
+    Parse quota dari format "rate" atau "rate:burst" (burst default = rate).
+
+    Raises:
+        ValueError: Jika rate/burst tidak positif
+    """
+    rate, _, burst = spec.partition(":")
+    quota = Quota(float(rate), float(burst) if burst else float(rate))
+    if quota.rate <= 0 or quota.burst < 1:
+        raise ValueError(f"Invalid quota: {spec!r} (rate must be > 0, burst >= 1)")
+    return quota
+
+
+class _Bucket:
+    """State satu token bucket beserta counter throttling"""
+
+    __slots__ = ("quota", "tokens", "updated", "admitted", "throttled", "last_throttled")
+
+    def __init__(self, quota: Quota, now: float):
+        self.quota = quota
+        self.tokens = quota.burst
+        self.updated = now
+        self.admitted = 0
+        self.throttled = 0
+        self.last_throttled: Optional[float] = None
+
+    def refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.quota.burst, self.tokens + (now - self.updated) * self.quota.rate)
+            self.updated = now
+
+
+class _BucketSet:
+    """Bucket per key (source atau topic) dengan quota default dan override per key"""
+
+    def __init__(self, default: Optional[Quota], overrides: Dict[str, Quota], idle_ttl: float):
+        self.default = default
+        self.overrides = overrides
+        self.idle_ttl = idle_ttl
+        self.buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.default is not None or bool(self.overrides)
+
+    def get(self, key: str, now: float) -> Optional[_Bucket]:
+        """Bucket key (sudah di-refill), atau None jika key tidak dibatasi"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            quota = self.overrides.get(key, self.default)
+            if quota is None:
+                return None
+            bucket = self.buckets[key] = _Bucket(quota, now)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.refill(now)
+        return bucket
+
+    def evict_idle(self, now: float):
+        """Buang bucket idle dari depan (LRU); amortized O(1) per check"""
+        buckets = self.buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if bucket.updated >= now or now - bucket.updated < self.idle_ttl:
+                break
+            bucket.refill(now)
+            if bucket.tokens >= bucket.quota.burst:
+                del buckets[key]
+                self.evicted += 1
+            else:
+                # Belum penuh: dibuang nanti agar eviction tidak memberi token gratis
+                buckets.move_to_end(key)
+
+
+class AdmitResult(NamedTuple):
+    """Hasil admit(): index event yang diterima/ditolak dan saran retry (detik)"""
+    admitted: List[int]
+    rejected: List[int]
+    retry_after: float
+
+
+class RateLimiter:
+    """
+    Token bucket per source dan per topic untuk /publish.
+    Tidak thread-safe; dipanggil dari event loop.
+    """
+
+    def __init__(
+        self,
+        source_quota: Optional[Quota] = None,
+        topic_quota: Optional[Quota] = None,
+        source_overrides: Optional[Dict[str, Quota]] = None,
+        topic_overrides: Optional[Dict[str, Quota]] = None,
+        idle_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize limiter.
+
+        Args:
+            source_quota: Quota default per source (None = source tanpa override tidak dibatasi)
+            topic_quota: Quota default per topic (None = topic tanpa override tidak dibatasi)
+            source_overrides: Quota khusus per source
+            topic_overrides: Quota khusus per topic
+            idle_ttl: Bucket yang tidak diakses selama ini (dan sudah penuh) dibuang (detik)
+            clock: Sumber waktu monotonic (untuk testing)
+        """
+        self.sources = _BucketSet(source_quota, source_overrides or {}, idle_ttl)
+        self.topics = _BucketSet(topic_quota, topic_overrides or {}, idle_ttl)
+        self._clock = clock
+        self.stats = {'requests': 0, 'admitted': 0, 'throttled': 0, 'limited_requests': 0, 'refunded': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.sources.enabled or self.topics.enabled
+
+    def admit(self, keys: Iterable[Tuple[str, str]]) -> AdmitResult:
+        """
+        Ambil token untuk setiap event secara berurutan.
+
+        Args:
+            keys: (source, topic) per event
+
+        Returns:
+            AdmitResult; retry_after 0.0 jika tidak ada event yang ditolak
+        """
+        now = self._clock()
+        self.sources.evict_idle(now)
+        self.topics.evict_idle(now)
+
+        admitted: List[int] = []
+        rejected: List[int] = []
+        # Bucket yang menolak -> jumlah event yang ditolak
+        deficits: Dict[_Bucket, int] = {}
+        for i, (source, topic) in enumerate(keys):
+            source_bucket = self.sources.get(source, now)
+            topic_bucket = self.topics.get(topic, now)
+            source_ok = source_bucket is None or source_bucket.tokens >= 1
+            topic_ok = topic_bucket is None or topic_bucket.tokens >= 1
+            if source_ok and topic_ok:
+                admitted.append(i)
+                if source_bucket is not None:
+                    source_bucket.tokens -= 1
+                    source_bucket.admitted += 1
+                if topic_bucket is not None:
+                    topic_bucket.tokens -= 1
+                continue
+            rejected.append(i)
+            if not source_ok:
+                deficits[source_bucket] = deficits.get(source_bucket, 0) + 1
+            if not topic_ok:
+                deficits[topic_bucket] = deficits.get(topic_bucket, 0) + 1
+            if source_bucket is not None:
+                source_bucket.throttled += 1
+                source_bucket.last_throttled = now
+
+        retry_after = 0.0
+        for bucket, count in deficits.items():
+            needed = min(count, bucket.quota.burst) - bucket.tokens
+            retry_after = max(retry_after, needed / bucket.quota.rate)
+
+        self.stats['requests'] += 1
+        self.stats['admitted'] += len(admitted)
+        self.stats['throttled'] += len(rejected)
+        if rejected:
+            self.stats['limited_requests'] += 1
+        return AdmitResult(admitted, rejected, retry_after)
+
+    def refund(self, keys: Iterable[Tuple[str, str]]):
+        """
+        Kembalikan token event yang sudah di-admit tetapi akhirnya ditolak
+        (mis. 503 karena peer pemilik penuh), agar client tidak dibebani dua kali
+        saat retry. Token dibatasi burst.
+
+        Args:
+            keys: (source, topic) per event yang di-admit
+        """
+        now = self._clock()
+        refunded = 0
+        for source, topic in keys:
+            source_bucket = self.sources.get(source, now)
+            topic_bucket = self.topics.get(topic, now)
+            for bucket in (source_bucket, topic_bucket):
+                if bucket is not None:
+                    bucket.tokens = min(bucket.quota.burst, bucket.tokens + 1)
+            if source_bucket is not None:
+                source_bucket.admitted = max(0, source_bucket.admitted - 1)
+            refunded += 1
+        self.stats['admitted'] -= refunded
+        self.stats['refunded'] += refunded
+
+    def source_metrics(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Metrik throttling per source (bucket aktif), paling banyak di-throttle dulu.
+
+        Args:
+            limit: Jumlah source maksimum
+
+        Returns:
+            List of dict: source, admitted, throttled, tokens, rate, burst,
+            seconds_since_throttled
+        """
+        now = self._clock()
+        items = sorted(self.sources.buckets.items(), key=lambda kv: kv[1].throttled, reverse=True)
+        result = []
+        for source, bucket in items[:limit]:
+            bucket.refill(now)
+            result.append({
+                'source': source,
+                'admitted': bucket.admitted,
+                'throttled': bucket.throttled,
+                'tokens': round(bucket.tokens, 3),
+                'rate': bucket.quota.rate,
+                'burst': bucket.quota.burst,
+                'seconds_since_throttled': (
+                    round(now - bucket.last_throttled, 3) if bucket.last_throttled is not None else None
+                ),
+            })
+        return result
+
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Ringkasan limiter untuk /stats.
+
+        Args:
+            top: Jumlah source teratas yang di-throttle (0 = tanpa daftar)
+
+        Returns:
+            Counter global, jumlah bucket aktif/evicted, dan top source yang di-throttle
+        """
+        snapshot = {
+            **self.stats,
+            'source_buckets': len(self.sources.buckets),
+            'topic_buckets': len(self.topics.buckets),
+            'evicted_buckets': self.sources.evicted + self.topics.evicted,
+        }
+        if top:
+            snapshot['top_throttled'] = [m for m in self.source_metrics(top) if m['throttled']]
+        return snapshot
+
+
+def retry_after_header(seconds: float) -> str:
+    """Nilai header Retry-After (delta-seconds integer, dibulatkan ke atas)"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def create_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Buat RateLimiter dari environment variable.
+
+    RATE_LIMIT_SOURCE / RATE_LIMIT_TOPIC: quota default "rate[:burst]";
+    RATE_LIMIT_SOURCE_OVERRIDES / RATE_LIMIT_TOPIC_OVERRIDES: "key=rate[:burst],...";
+    RATE_LIMIT_IDLE_S: idle TTL bucket.
+
+    Returns:
+        RateLimiter, atau None jika tidak ada limit yang dikonfigurasi
+    """
+    source_quota = os.getenv("RATE_LIMIT_SOURCE")
+    topic_quota = os.getenv("RATE_LIMIT_TOPIC")
+    limiter = RateLimiter(
+        source_quota=parse_quota(source_quota) if source_quota else None,
+        topic_quota=parse_quota(topic_quota) if topic_quota else None,
+        source_overrides=parse_topic_map(os.getenv("RATE_LIMIT_SOURCE_OVERRIDES"), parse_quota),
+        topic_overrides=parse_topic_map(os.getenv("RATE_LIMIT_TOPIC_OVERRIDES"), parse_quota),
+        idle_ttl=float(os.getenv("RATE_LIMIT_IDLE_S", "300")),
+    )
+    return limiter if limiter.enabled else None
@@ -0,0 +1,311 @@
+"""
+Replay capture file (src/capture.py) ke aggregator.
+
+Request dikirim ulang dengan jarak waktu asli dibagi speed (1x, Nx) atau
+secepat mungkin (max), lalu dilaporkan:
+- throughput kirim (request/s, event/s) dan latency /publish (p50/p90/p99/max)
+- schedule lag: keterlambatan request terhadap jadwal (replay tidak mampu mengikuti)
+- waktu sampai seluruh event selesai diproses consumer
+- kebenaran dedup: delta unique_processed/duplicate_dropped di /stats harus sama
+  dengan jumlah key unik/duplikat di capture, dan semua key harus ada di /events
+
+Dedup check mengasumsikan aggregator dengan store kosong (key yang sudah ada
+sebelum replay terhitung sebagai duplikat). Hanya event yang benar-benar
+diterima yang dihitung: event di rejected_indices (202 partial) dan request 429
+dilaporkan sebagai throttled, bukan error.
+
+Usage:
+    python -m src.replay inspect capture.cap.gz
+    python -m src.replay run capture.cap.gz --url http://localhost:8080 --speed 10
+    python -m src.replay run capture.cap.gz --speed max --concurrency 128 --json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from .capture import iter_body_events, read_capture
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile dari list yang sudah di-sort"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def load_capture(path: str) -> Tuple[Dict[str, Any], List[Tuple[float, bytes]], Dict[str, Any]]:
+    """
+    Baca seluruh capture dan hitung profil traffic-nya.
+
+    Returns:
+        (header, frames, profile) dengan profile berisi jumlah request/event,
+        key unik, rasio duplikat, distribusi topic, dan puncak event per detik
+    """
+    header, frames = read_capture(path)
+    frames = list(frames)
+    keys = Counter()
+    topics = Counter()
+    per_second = Counter()
+    batch_sizes = []
+    for offset, body in frames:
+        events = iter_body_events(body)
+        batch_sizes.append(len(events))
+        per_second[int(offset)] += len(events)
+        for event in events:
+            keys[(event["topic"], event["event_id"])] += 1
+            topics[event["topic"]] += 1
+
+    total = sum(batch_sizes)
+    profile = {
+        'requests': len(frames),
+        'events': total,
+        'unique_keys': len(keys),
+        'duplicates': total - len(keys),
+        'duplicate_ratio': round((total - len(keys)) / total, 4) if total else 0.0,
+        'duration_s': round(frames[-1][0], 3) if frames else 0.0,
+        'peak_events_per_s': max(per_second.values(), default=0),
+        'max_batch': max(batch_sizes, default=0),
+        'topics': dict(topics.most_common()),
+        'keys': keys,
+    }
+    return header, frames, profile
+
+
+async def _wait_processed(client: httpx.AsyncClient, target: int, timeout: float) -> Optional[Dict[str, Any]]:
+    """Tunggu sampai jumlah event yang selesai di-dedup (unique + duplicate) mencapai target"""
+    deadline = time.perf_counter() + timeout
+    while True:
+        stats = (await client.get("/stats")).json()
+        if stats["unique_processed"] + stats["duplicate_dropped"] >= target:
+            return stats
+        if time.perf_counter() > deadline:
+            return None
+        await asyncio.sleep(0.05)
+
+
+async def replay(
+    path: str,
+    url: str = "http://localhost:8080",
+    speed: Optional[float] = 1.0,
+    concurrency: int = 64,
+    verify: bool = True,
+    wait: float = 60.0,
+    client: Optional[httpx.AsyncClient] = None,
+) -> Dict[str, Any]:
+    """
+    Replay capture file.
+
+    Args:
+        path: Capture file
+        url: Base URL aggregator
+        speed: Faktor percepatan (1.0 = waktu asli); None = secepat mungkin
+        concurrency: Jumlah request in-flight maksimum
+        verify: Jalankan dedup correctness check setelah replay
+        wait: Batas waktu menunggu seluruh event diproses (detik)
+        client: Optional httpx.AsyncClient (default dibuat dari url)
+
+    Returns:
+        Report dictionary
+    """
+    _, frames, profile = load_capture(path)
+    profile.pop('keys')
+    owns_client = client is None
+    if owns_client:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        client = httpx.AsyncClient(base_url=url, timeout=30.0, limits=limits)
+
+    try:
+        baseline = (await client.get("/stats")).json()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+        lags: List[float] = []
+        sent_events = 0
+        errors = 0
+        throttled_requests = 0
+        throttled_events = 0
+        # Key yang diterima aggregator (tanpa event yang di-throttle)
+        accepted: Counter = Counter()
+
+        async def send(body: bytes, batch_keys: List[Tuple[str, str]]):
+            nonlocal sent_events, errors, throttled_requests, throttled_events
+            try:
+                t0 = time.perf_counter()
+                response = await client.post(
+                    "/publish", content=body, headers={"Content-Type": "application/json"}
+                )
+                latencies.append(time.perf_counter() - t0)
+                if response.status_code == 202:
+                    # 202 partial: event di rejected_indices tidak diterima
+                    rejected = set(response.json().get("rejected_indices", ()))
+                    accepted.update(key for i, key in enumerate(batch_keys) if i not in rejected)
+                    sent_events += len(batch_keys) - len(rejected)
+                    throttled_events += len(rejected)
+                elif response.status_code == 429:
+                    throttled_requests += 1
+                    throttled_events += len(batch_keys)
+                else:
+                    errors += 1
+            except httpx.HTTPError as e:
+                errors += 1
+                logger.warning(f"Replay request failed: {e}")
+            finally:
+                semaphore.release()
+
+        tasks = []
+        start = time.perf_counter()
+        for offset, body in frames:
+            if speed:
+                target = start + offset / speed
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await semaphore.acquire()
+            if speed:
+                lags.append(max(0.0, time.perf_counter() - (start + offset / speed)))
+            batch_keys = [(event["topic"], event["event_id"]) for event in iter_body_events(body)]
+            tasks.append(asyncio.create_task(send(body, batch_keys)))
+        await asyncio.gather(*tasks)
+        send_elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        lags.sort()
+        report: Dict[str, Any] = {
+            'capture': profile,
+            'speed': speed if speed else "max",
+            'requests_ok': len(frames) - errors - throttled_requests,
+            'errors': errors,
+            'throttled_requests': throttled_requests,
+            'throttled_events': throttled_events,
+            'send_s': round(send_elapsed, 3),
+            'requests_per_s': round(len(frames) / send_elapsed, 1) if send_elapsed else 0.0,
+            'events_per_s': round(sent_events / send_elapsed, 1) if send_elapsed else 0.0,
+            'latency_ms': {
+                name: round(percentile(latencies, q) * 1000, 3)
+                for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))
+            },
+        }
+        if speed:
+            report['schedule_lag_ms'] = {
+                'p99': round(percentile(lags, 99) * 1000, 3),
+                'max': round(percentile(lags, 100) * 1000, 3),
+            }
+
+        if verify:
+            done = baseline["unique_processed"] + baseline["duplicate_dropped"]
+            final = await _wait_processed(client, done + sent_events, wait)
+            if final is None:
+                report['dedup'] = {'ok': False, 'error': f"events not processed within {wait}s"}
+            else:
+                report['processed_s'] = round(time.perf_counter() - start, 3)
+                report['dedup'] = await _verify(client, baseline, final, accepted, errors)
+        return report
+    finally:
+        if owns_client:
+            await client.aclose()
+
+
+async def _verify(client, baseline, final, keys: Counter, errors: int) -> Dict[str, Any]:
+    """Bandingkan delta /stats dan isi /events dengan key yang diterima aggregator"""
+    unique = final["unique_processed"] - baseline["unique_processed"]
+    duplicates = final["duplicate_dropped"] - baseline["duplicate_dropped"]
+    expected_unique = len(keys)
+    expected_duplicates = sum(keys.values()) - expected_unique
+
+    by_topic: Dict[str, set] = {}
+    for topic, event_id in keys:
+        by_topic.setdefault(topic, set()).add(event_id)
+    missing = 0
+    for topic, event_ids in by_topic.items():
+        data = (await client.get("/events", params={"topic": topic})).json()
+        missing += len(event_ids - {e["event_id"] for e in data["events"]})
+
+    return {
+        'ok': errors == 0 and unique == expected_unique and duplicates == expected_duplicates and missing == 0,
+        'unique_processed': unique,
+        'expected_unique': expected_unique,
+        'duplicate_dropped': duplicates,
+        'expected_duplicates': expected_duplicates,
+        'missing_keys': missing,
+    }
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    value = value.lower()
+    if value == "max":
+        return None
+    speed = float(value.removesuffix("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be > 0 or 'max'")
+    return speed
+
+
+def _print_report(report: Dict[str, Any]):
+    capture = report['capture']
+    print(f"capture: {capture['requests']:,} requests, {capture['events']:,} events, "
+          f"{capture['unique_keys']:,} unique ({capture['duplicate_ratio']:.1%} duplicates), "
+          f"{capture['duration_s']}s, peak {capture['peak_events_per_s']:,} events/s")
+    print(f"replay @ {report['speed']}: {report['send_s']}s, {report['requests_per_s']:,} req/s, "
+          f"{report['events_per_s']:,} events/s, errors={report['errors']}, "
+          f"throttled={report['throttled_events']:,} events")
+    latency = report['latency_ms']
+    print(f"publish latency ms: p50={latency['p50']} p90={latency['p90']} "
+          f"p99={latency['p99']} max={latency['max']}")
+    if 'schedule_lag_ms' in report:
+        lag = report['schedule_lag_ms']
+        print(f"schedule lag ms: p99={lag['p99']} max={lag['max']}")
+    if 'dedup' in report:
+        dedup = report['dedup']
+        if 'processed_s' in report:
+            print(f"all events processed after {report['processed_s']}s")
+        print(f"dedup: {'OK' if dedup['ok'] else 'MISMATCH'} {json.dumps(dedup)}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.replay", description="Replay capture /publish")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_inspect = sub.add_parser("inspect", help="Tampilkan profil traffic capture file")
+    p_inspect.add_argument("capture", help="Capture file (.cap.gz)")
+
+    p_run = sub.add_parser("run", help="Replay capture ke aggregator")
+    p_run.add_argument("capture", help="Capture file (.cap.gz)")
+    p_run.add_argument("--url", default=os.getenv("AGGREGATOR_URL", "http://localhost:8080"))
+    p_run.add_argument("--speed", type=_parse_speed, default=1.0, help="1, 10 (atau 10x), max")
+    p_run.add_argument("--concurrency", type=int, default=64, help="Request in-flight maksimum")
+    p_run.add_argument("--no-verify", action="store_true", help="Lewati dedup correctness check")
+    p_run.add_argument("--wait", type=float, default=60.0, help="Batas waktu menunggu processing (detik)")
+    p_run.add_argument("--json", action="store_true", help="Output report sebagai JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+
+    if args.command == "inspect":
+        header, _, profile = load_capture(args.capture)
+        profile.pop('keys')
+        print(json.dumps({'header': header, **profile}, indent=2))
+        return 0
+
+    report = asyncio.run(replay(
+        args.capture, args.url, args.speed, args.concurrency,
+        verify=not args.no_verify, wait=args.wait,
+    ))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 0 if report.get('dedup', {}).get('ok', True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Versioned response cache untuk endpoint read-heavy (/events, /stats).
+
+Entry disimpan sebagai body JSON yang sudah di-serialize beserta ETag, dan
+di-tag dengan versi tulis (WriteVersions) saat entry dibuat. Entry hanya
+dianggap valid jika tag-nya masih sama dengan versi saat ini, sehingga
+mark_processed otomatis meng-invalidate response topic terkait.
+Eviction LRU berdasarkan total ukuran body (bytes).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class CacheEntry:
+    """Response yang sudah di-serialize"""
+
+    __slots__ = ("body", "etag", "tag", "expires_at")
+
+    def __init__(self, body: bytes, tag: Hashable, expires_at: Optional[float] = None):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.tag = tag
+        self.expires_at = expires_at
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Check header If-None-Match terhadap ETag entry"""
+        if not if_none_match:
+            return False
+        candidates = [c.strip() for c in if_none_match.split(",")]
+        return "*" in candidates or self.etag in candidates or f"W/{self.etag}" in candidates
+
+
+class ResponseCache:
+    """
+    LRU cache berbatas ukuran byte dengan validasi berbasis versi.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize cache.
+
+        Args:
+            max_bytes: Total ukuran body maksimum sebelum entry lama di-evict
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def get(self, key: Hashable, tag: Hashable) -> Optional[CacheEntry]:
+        """
+        Ambil entry yang masih valid untuk tag saat ini.
+
+        Returns:
+            CacheEntry, atau None jika tidak ada / tag berubah / expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry.tag != tag or (entry.expires_at is not None and entry.expires_at < time.monotonic()):
+                self._remove(key)
+                self.stats["stale"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: Hashable, tag: Hashable, body: bytes, ttl: Optional[float] = None) -> CacheEntry:
+        """
+        Simpan body untuk key dengan tag versi saat ini.
+
+        Args:
+            key: Cache key (endpoint + params)
+            tag: Versi data saat body dibuat
+            body: Response yang sudah di-serialize
+            ttl: Optional masa berlaku (detik) untuk data yang berubah tanpa write
+
+        Returns:
+            CacheEntry baru (tetap dikembalikan meski terlalu besar untuk disimpan)
+        """
+        entry = CacheEntry(body, tag, time.monotonic() + ttl if ttl is not None else None)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+        return entry
+
+    def get_or_render(
+        self,
+        key: Hashable,
+        tag: Hashable,
+        render: Callable[[], bytes],
+        ttl: Optional[float] = None,
+    ) -> tuple[CacheEntry, bool]:
+        """
+        Ambil entry dari cache atau render dan simpan.
+
+        Returns:
+            (entry, hit)
+        """
+        entry = self.get(key, tag)
+        if entry is not None:
+            return entry, True
+        return self.put(key, tag, render(), ttl), False
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Get statistik cache.
+
+        Returns:
+            Dictionary: hits, misses, stale, evictions, hit_rate, entries, bytes, max_bytes
+        """
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,519 @@
+"""
+Rollup bertingkat (downsampled) untuk topic metrik, mis. system.metrics.
+
+RollupStore menerima event unik sebagai output sink (setelah transform, jadi
+field hasil parse/enrich juga bisa di-rollup) dan menyimpan agregat
+count/sum/min/max per (topic, source, field) dalam beberapa tier, default
+10s -> 1m -> 1h. Setiap tier memiliki retention sendiri, sehingga data
+resolusi tinggi hanya disimpan untuk rentang pendek dan grafik mingguan/
+bulanan dibaca dari tier kasar tanpa menyimpan atau men-scan event mentah.
+
+Karena count/sum/min/max dapat digabung, setiap event langsung ditambahkan ke
+semua tier (bucket waktu event di masing-masing tier); isi setiap tier sama
+dengan hasil downsampling tier yang lebih halus, dan event terlambat tetap
+tercatat tepat selama masih di dalam retention.
+
+Struktur per tier (time-major): bucket index -> (topic, field) -> source ->
+[count, sum, min, max], ditambah agregat semua source di key None. Field None
+adalah jumlah event. Retention membuang bucket index dari yang tertua; query
+membaca bucket dalam rentang dari satu tier saja (rentang yang lebih lebar dari
+jumlah bucket di tier hanya mengiterasi bucket yang ada).
+
+Persistence: snapshot ditulis setiap save_interval, dan setiap batch di-append
+(fsync) ke journal "<path>.journal" sebelum masuk tier. Snapshot mencatat seq
+journal terakhir yang sudah tercakup; saat load, record journal setelah seq itu
+di-replay, sehingga crash di antara dua snapshot tidak menghilangkan rollup.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .payload import get_field
+from .sinks import BaseSink, Outbox
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+DEFAULT_TIERS = "10s:6h,1m:7d,1h:90d"
+
+
+def parse_duration(spec: str) -> float:
+    """
+    Parse durasi "10s", "5m", "6h", "7d", "2w" menjadi detik.
+
+    Raises:
+        ValueError: Jika format tidak dikenal
+    """
+    match = _DURATION_RE.match(spec.strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {spec!r} (expected e.g. 10s, 5m, 6h, 7d)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def parse_tiers(spec: str) -> List[Tuple[str, float, float]]:
+    """
+    Parse konfigurasi tier "step:retention,...", mis. "10s:6h,1m:7d,1h:90d".
+
+    Returns:
+        List of (nama, step detik, retention detik), dari yang paling halus
+
+    Raises:
+        ValueError: Jika step tidak naik atau bukan kelipatan step sebelumnya
+    """
+    tiers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        step, sep, retention = item.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid rollup tier: {item!r} (expected step:retention)")
+        tiers.append((step.strip(), parse_duration(step), parse_duration(retention)))
+    if not tiers:
+        raise ValueError("At least one rollup tier is required")
+    for (_, prev, _), (name, step, _) in zip(tiers, tiers[1:]):
+        if step <= prev or step % prev:
+            raise ValueError(f"Rollup tier {name} must be a coarser multiple of the previous tier")
+    return tiers
+
+
+def parse_time(value: Any) -> float:
+    """
+    Parse waktu (ISO 8601 atau epoch detik) menjadi epoch detik.
+    Timestamp tanpa zona waktu dianggap UTC.
+
+    Raises:
+        ValueError: Jika format tidak dikenal
+    """
+    try:
+        ts = float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        ts = parsed.timestamp()
+    if not math.isfinite(ts):
+        raise ValueError(f"Invalid time: {value!r}")
+    return ts
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class _Tier:
+    """Bucket satu tier beserta retention-nya"""
+
+    def __init__(self, name: str, step: float, retention: float):
+        self.name = name
+        self.step = step
+        self.retention = retention
+        # bucket index -> (topic, field) -> source (None = semua) -> [count, sum, min, max]
+        self.buckets: Dict[int, Dict[Tuple[str, Optional[str]], Dict[Optional[str], list]]] = {}
+        self.oldest: Optional[int] = None
+
+    def index(self, ts: float) -> int:
+        return int(ts // self.step)
+
+    def min_index(self, now: float) -> int:
+        return self.index(now - self.retention)
+
+    def add(self, index: int, topic: str, source: str, values: Iterable[Tuple[Optional[str], float]]):
+        bucket = self.buckets.get(index)
+        if bucket is None:
+            bucket = self.buckets[index] = {}
+            if self.oldest is None or index < self.oldest:
+                self.oldest = index
+        for field, value in values:
+            per_source = bucket.get((topic, field))
+            if per_source is None:
+                per_source = bucket[(topic, field)] = {}
+            # Key None = agregat semua source, agar query tanpa filter O(1) per bucket
+            for key in (source, None):
+                agg = per_source.get(key)
+                if agg is None:
+                    per_source[key] = [1, value, value, value]
+                else:
+                    agg[0] += 1
+                    agg[1] += value
+                    if value < agg[2]:
+                        agg[2] = value
+                    if value > agg[3]:
+                        agg[3] = value
+
+    def expire(self, now: float) -> int:
+        """Buang bucket di luar retention; Returns jumlah bucket yang dibuang"""
+        if self.oldest is None:
+            return 0
+        limit = self.min_index(now)
+        if self.oldest >= limit:
+            return 0
+        if limit - self.oldest > len(self.buckets):
+            expired = [i for i in self.buckets if i < limit]
+        else:
+            expired = [i for i in range(self.oldest, limit) if i in self.buckets]
+        for i in expired:
+            del self.buckets[i]
+        self.oldest = min(self.buckets) if self.buckets else None
+        return len(expired)
+
+
+class RollupStore(BaseSink):
+    """
+    Rollup count/sum/min/max bertingkat sebagai output sink; query lewat query().
+    Thread-safe: write (thread sink) dan query (thread request) dilindungi lock.
+    """
+
+    def __init__(
+        self,
+        topics: Sequence[str] = ("system.metrics",),
+        fields: Sequence[str] = ("random_value",),
+        tiers: str = DEFAULT_TIERS,
+        path: Optional[str] = None,
+        save_interval: float = 60.0,
+        journal: bool = True,
+        clock: Callable[[], float] = time.time,
+        **options,
+    ):
+        """
+        Initialize rollup store.
+
+        Args:
+            topics: Topic yang di-rollup ("*" = semua topic)
+            fields: Field payload numerik (dotted path, mis. "fields.latency_ms")
+            tiers: Konfigurasi tier "step:retention,..." dari yang paling halus
+            path: Optional file snapshot (gzip JSON) untuk bertahan saat restart
+            save_interval: Interval penyimpanan snapshot (detik)
+            journal: Append setiap batch ke journal agar data sejak snapshot
+                terakhir tidak hilang saat crash (hanya jika path diisi)
+            clock: Sumber waktu wall-clock (untuk testing)
+            **options: Opsi BaseSink (batch_size, flush_interval, max_buffer)
+        """
+        options.setdefault("flush_interval", 0.2)
+        super().__init__(options.pop("name", "rollups"), **options)
+        self.topics = None if "*" in topics else set(topics)
+        self.fields = list(fields)
+        self.tiers = [_Tier(name, step, retention) for name, step, retention in parse_tiers(tiers)]
+        self.path = Path(path) if path else None
+        self.save_interval = save_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self.rollup_stats = {
+            'events': 0, 'values': 0, 'skipped': 0, 'late': 0, 'expired_buckets': 0, 'journal_replayed': 0,
+        }
+        self._journal: Optional[Outbox] = None
+        # Seq journal terakhir yang sudah masuk ke tier
+        self._journal_seq = -1
+        if self.path:
+            self._load(journal)
+
+    # -- Ingest -----------------------------------------------------------
+
+    async def _write(self, batch: List[bytes]):
+        await asyncio.to_thread(self._ingest, batch)
+        if self.path and time.monotonic() - self._last_save >= self.save_interval:
+            await asyncio.to_thread(self.save)
+
+    def _ingest(self, batch: List[bytes]):
+        if self._journal is not None:
+            seqs = self._journal.append(batch)
+            self.add_records(batch)
+            self._journal_seq = seqs[-1]
+        else:
+            self.add_records(batch)
+
+    def add_records(self, records: Iterable[bytes]) -> int:
+        """
+        Rollup event (JSON bytes seperti output encode_event).
+
+        Returns:
+            Jumlah event yang masuk ke minimal satu tier
+        """
+        prepared = []
+        skipped = 0
+        for record in records:
+            event = json.loads(record)
+            topic = event["topic"]
+            if self.topics is not None and topic not in self.topics:
+                continue
+            try:
+                ts = parse_time(event["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            payload = event.get("payload") or {}
+            values: List[Tuple[Optional[str], float]] = [(None, 1)]
+            for field in self.fields:
+                value = get_field(payload, field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+                    values.append((field, value))
+            prepared.append((ts, topic, event.get("source") or "", values))
+
+        added = late = 0
+        with self._lock:
+            now = self._clock()
+            for tier in self.tiers:
+                self.rollup_stats['expired_buckets'] += tier.expire(now)
+            for ts, topic, source, values in prepared:
+                stored = False
+                for tier in self.tiers:
+                    index = tier.index(ts)
+                    if index < tier.min_index(now):
+                        continue
+                    tier.add(index, topic, source, values)
+                    stored = True
+                if stored:
+                    added += 1
+                    self.rollup_stats['values'] += len(values) - 1
+                else:
+                    late += 1
+            self.rollup_stats['events'] += added
+            self.rollup_stats['late'] += late
+            self.rollup_stats['skipped'] += skipped
+        return added
+
+    # -- Query ------------------------------------------------------------
+
+    def pick_tier(self, start: float, end: float, max_points: int = 1000) -> _Tier:
+        """
+        Pilih tier untuk rentang [start, end).
+
+        Tier paling kasar yang mencakup rentang selalu tier terakhir (retention
+        terpanjang), sehingga query 10 menit hanya mendapat satu point 1h. Karena
+        itu yang dipilih adalah tier kasar seperlunya: tier paling halus yang
+        retention-nya mencakup start dan jumlah bucket-nya <= max_points. Rentang
+        panjang tetap dibaca dari tier kasar (30 hari -> 1h). Jika tidak ada yang
+        memenuhi, dipakai tier paling kasar yang mencakup start (atau tier paling
+        kasar).
+        """
+        now = self._clock()
+        covering = [t for t in self.tiers if start >= now - t.retention]
+        for tier in covering:
+            if math.ceil((end - start) / tier.step) <= max_points:
+                return tier
+        return covering[-1] if covering else self.tiers[-1]
+
+    def query(
+        self,
+        topic: str,
+        start: float,
+        end: float,
+        field: Optional[str] = None,
+        source: Optional[str] = None,
+        group_by_source: bool = False,
+        tier: Optional[str] = None,
+        max_points: int = 1000,
+    ) -> Dict[str, Any]:
+        """
+        Baca rollup satu tier untuk rentang waktu.
+
+        Args:
+            topic: Topic
+            start: Awal rentang (epoch detik, inklusif)
+            end: Akhir rentang (epoch detik, eksklusif)
+            field: Field numerik; None = jumlah event
+            source: Optional filter source
+            group_by_source: Pisahkan series per source
+            tier: Nama tier (mis. "1m"); default dipilih otomatis (pick_tier)
+            max_points: Batas jumlah bucket untuk pemilihan tier otomatis
+
+        Returns:
+            Dictionary: tier, step, retention, points (atau series per source jika
+            group_by_source), took_ms
+
+        Raises:
+            ValueError: Jika nama tier tidak dikenal
+        """
+        if tier is None:
+            selected = self.pick_tier(start, end, max_points)
+        else:
+            matches = [t for t in self.tiers if t.name == tier]
+            if not matches:
+                raise ValueError(f"Unknown rollup tier: {tier!r} (expected one of {[t.name for t in self.tiers]})")
+            selected = matches[0]
+
+        began = time.perf_counter()
+        series: Dict[str, List[Dict[str, Any]]] = {}
+        key = (topic, field)
+        # Bucket setelah sekarang tidak mungkin terisi: end dibatasi agar rentang
+        # sembarang (mis. end=1e15) tidak menjadi loop panjang yang menahan lock
+        end = min(end, self._clock() + selected.step)
+        first, last = selected.index(start), math.ceil(end / selected.step)
+        with self._lock:
+            buckets = selected.buckets
+            if last - first > len(buckets):
+                # Rentang lebih lebar dari jumlah bucket: iterasi bucket yang ada saja
+                indices = sorted(i for i in buckets if first <= i < last)
+            else:
+                indices = range(first, last)
+            for index in indices:
+                bucket = buckets.get(index)
+                per_source = bucket.get(key) if bucket else None
+                if not per_source:
+                    continue
+                if source is not None:
+                    agg = per_source.get(source)
+                    groups = {source if group_by_source else "": agg} if agg else {}
+                elif group_by_source:
+                    groups = {s: agg for s, agg in per_source.items() if s is not None}
+                else:
+                    groups = {"": per_source[None]}
+                ts = _iso(index * selected.step)
+                for name, (count, total, lo, hi) in groups.items():
+                    series.setdefault(name, []).append({
+                        "t": ts, "count": count, "sum": total, "min": lo, "max": hi, "avg": total / count,
+                    })
+
+        result = {
+            "tier": selected.name,
+            "step": selected.step,
+            "retention": selected.retention,
+        }
+        if group_by_source:
+            result["series"] = series
+        else:
+            result["points"] = series.get("", [])
+        result["took_ms"] = round((time.perf_counter() - began) * 1000, 3)
+        return result
+
+    # -- Persistence ------------------------------------------------------
+
+    def save(self):
+        """Tulis snapshot seluruh tier (tmp + fsync + rename), lalu ack journal yang tercakup"""
+        if self.path is None:
+            return
+        with self._lock:
+            journal_seq = self._journal_seq
+            data = {
+                "version": 1,
+                "journal_seq": journal_seq,
+                "tiers": [
+                    {
+                        "name": tier.name,
+                        "step": tier.step,
+                        "buckets": [
+                            [index, [
+                                [topic, field, source, *agg]
+                                for (topic, field), per_source in bucket.items()
+                                for source, agg in per_source.items()
+                            ]]
+                            for index, bucket in tier.buckets.items()
+                        ],
+                    }
+                    for tier in self.tiers
+                ],
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._last_save = time.monotonic()
+        if self._journal is not None:
+            self._journal.ack([seq for seq, _ in self._journal.pending() if seq <= journal_seq])
+
+    def _load(self, journal: bool):
+        data = {}
+        if self.path.exists():
+            with open(self.path, "rb") as f:
+                data = json.loads(gzip.decompress(f.read()))
+            logger.info(f"Rollups loaded from {self.path}")
+        tiers = {(t.name, t.step): t for t in self.tiers}
+        for saved in data.get("tiers", []):
+            tier = tiers.get((saved["name"], saved["step"]))
+            if tier is None:
+                # Konfigurasi tier berubah: data tier lama dibuang
+                logger.warning(f"Rollup tier {saved['name']} no longer configured, dropping")
+                continue
+            for index, rows in saved["buckets"]:
+                bucket = tier.buckets[index] = {}
+                for topic, field, source, *agg in rows:
+                    bucket.setdefault((topic, field), {})[source] = agg
+            tier.oldest = min(tier.buckets) if tier.buckets else None
+
+        saved_seq = data.get("journal_seq", -1)
+        self._journal_seq = saved_seq
+        if journal:
+            self._journal = Outbox(str(self.path) + ".journal", first_seq=saved_seq + 1)
+            pending = self._journal.pending()
+            # Record sampai saved_seq sudah ada di snapshot (crash sebelum ack)
+            self._journal.ack([seq for seq, _ in pending if seq <= saved_seq])
+            replay = [(seq, record) for seq, record in pending if seq > saved_seq]
+            if replay:
+                self.add_records([record for _, record in replay])
+                self._journal_seq = replay[-1][0]
+                self.rollup_stats['journal_replayed'] = len(replay)
+                logger.info(f"Rollups replayed {len(replay)} events from journal")
+
+        # Snapshot bisa berumur lama: buang bucket yang sudah di luar retention
+        now = self._clock()
+        for tier in self.tiers:
+            self.rollup_stats['expired_buckets'] += tier.expire(now)
+
+    async def _close(self):
+        if self.path is not None:
+            await asyncio.to_thread(self.save)
+        if self._journal is not None:
+            self._journal.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get statistik rollup.
+
+        Returns:
+            Dictionary: counter BaseSink ditambah counter rollup dan jumlah
+            bucket per tier
+        """
+        with self._lock:
+            tiers = {
+                tier.name: {
+                    "step": tier.step,
+                    "retention": tier.retention,
+                    "buckets": len(tier.buckets),
+                    "series": sum(
+                        len(per_source) - 1 for bucket in tier.buckets.values() for per_source in bucket.values()
+                    ),
+                }
+                for tier in self.tiers
+            }
+        return {
+            **super().snapshot(),
+            **self.rollup_stats,
+            "topics": sorted(self.topics) if self.topics is not None else ["*"],
+            "fields": self.fields,
+            "tiers": tiers,
+        }
+
+
+def create_rollups() -> Optional[RollupStore]:
+    """
+    Buat RollupStore dari environment variable (ROLLUP_TOPICS mengaktifkan).
+
+    Returns:
+        RollupStore atau None
+    """
+    topics = [t.strip() for t in os.getenv("ROLLUP_TOPICS", "").split(",") if t.strip()]
+    if not topics:
+        return None
+    fields = [f.strip() for f in os.getenv("ROLLUP_FIELDS", "random_value").split(",") if f.strip()]
+    return RollupStore(
+        topics=topics,
+        fields=fields,
+        tiers=os.getenv("ROLLUP_TIERS", DEFAULT_TIERS),
+        path=os.getenv("ROLLUP_PATH") or None,
+        save_interval=float(os.getenv("ROLLUP_SAVE_S", "60")),
+        journal=os.getenv("ROLLUP_JOURNAL", "1") == "1",
+    )
@@ -0,0 +1,698 @@
+"""
+Inverted index incremental atas payload event untuk endpoint /search.
+
+Index menerima event unik sebagai output sink (setelah transform, sehingga yang
+di-index adalah payload yang sudah diredaksi). Setiap event mendapat doc id
+berurutan; token dari field yang dikonfigurasi (default payload.message) dan
+topic event (term khusus) dicatat di posting list.
+
+- Memtable: posting list per term sebagai array delta doc id, ditambah dokumen
+  tersimpan (topic, event_id, timestamp, source, field ter-index).
+- Segment: saat memtable penuh, isinya dibekukan menjadi segment immutable.
+  Posting list disimpan sebagai delta uint32 yang dikompresi zlib (list pendek
+  disimpan tanpa kompresi), sehingga decode berjalan di C (zlib + array +
+  accumulate). List panjang dipecah menjadi blok _BLOCK doc dengan skip table
+  (doc id terakhir per blok), sehingga query hanya men-decode blok yang
+  dibutuhkan. Dengan path, segment ditulis ke file dan dibaca lewat mmap.
+- Merge: thread background menggabungkan merge_factor segment bersebelahan
+  dengan ukuran setara (tiered). Karena posting berupa delta, merge cukup
+  menyambung array dan menyesuaikan satu delta per term per segment.
+
+Query: semua term harus cocok (AND), hasil terbaru lebih dulu. Blok term
+paling jarang dibaca dari yang terbaru; term lain hanya di-decode pada blok
+yang rentang doc id-nya beririsan. Pencarian berhenti setelah limit terpenuhi,
+sehingga biaya query bergantung pada limit dan selektivitas, bukan total dokumen.
+"""
+import asyncio
+import bisect
+import io
+import itertools
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .payload import get_field
+from .sinks import BaseSink
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"SEARCHIX"
+_FOOTER = struct.Struct("<QIQQQ8s")   # base_doc, n_docs, docs_offset, offsets_offset, dict_offset, magic
+_DICT_ENTRY = struct.Struct("<HIQI")   # term length, df, postings offset, postings length
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+_BLOCKED = b"\x02"
+_U32 = struct.Struct("<I")
+# Jumlah doc id per blok untuk posting list panjang
+_BLOCK = 512
+# Posting list lebih pendek dari ini (bytes) tidak dikompresi
+_COMPRESS_MIN = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_MAX_TOKEN = 64
+_TOPIC_PREFIX = "\x00t:"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase token alfanumerik (unik, urutan kemunculan)"""
+    return list(dict.fromkeys(
+        t for t in _TOKEN_RE.findall(text.lower()) if len(t) <= _MAX_TOKEN
+    ))
+
+
+def _topic_term(topic: str) -> str:
+    return _TOPIC_PREFIX + topic
+
+
+def _to_array(data: bytes) -> array:
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _from_array(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array("I", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_block(deltas: array) -> bytes:
+    raw = _from_array(deltas)
+    if len(raw) < _COMPRESS_MIN:
+        return _RAW + raw
+    return _ZLIB + zlib.compress(raw, 6)
+
+
+def _decode_block(data) -> array:
+    kind, body = bytes(data[:1]), data[1:]
+    return _to_array(zlib.decompress(body) if kind == _ZLIB else bytes(body))
+
+
+def encode_postings(deltas: array) -> bytes:
+    """
+    Encode delta doc id (uint32).
+
+    List sampai _BLOCK doc menjadi satu blok (zlib jika cukup panjang). List
+    lebih panjang: _BLOCKED + n_blocks + doc id terakhir per blok + offset akhir
+    per blok + blok zlib. Delta pertama tiap blok tetap relatif ke doc
+    sebelumnya, jadi gabungan semua blok adalah array delta semula.
+    """
+    if len(deltas) <= _BLOCK:
+        return _encode_block(deltas)
+    ids = list(itertools.accumulate(deltas))
+    lasts = array("I", ids[_BLOCK - 1::_BLOCK])
+    if len(ids) % _BLOCK:
+        lasts.append(ids[-1])
+    blocks = [zlib.compress(_from_array(deltas[i:i + _BLOCK]), 6) for i in range(0, len(deltas), _BLOCK)]
+    ends = array("I", itertools.accumulate(len(b) for b in blocks))
+    return b"".join([_BLOCKED, _U32.pack(len(blocks)), _from_array(lasts), _from_array(ends), *blocks])
+
+
+def decode_deltas(data) -> array:
+    """Kebalikan encode_postings: kembalikan array delta"""
+    if bytes(data[:1]) != _BLOCKED:
+        return _decode_block(data)
+    postings = _PostingList.from_encoded(data, 0)
+    deltas = array("I")
+    for i in range(postings.n_blocks):
+        deltas.extend(postings.load(i))
+    return deltas
+
+
+class _PostingList:
+    """
+    Akses per blok ke satu posting list.
+    lasts[i] = doc id terakhir blok i (relatif ke base); blok yang sudah
+    di-decode di-cache selama objek hidup (satu query).
+    """
+
+    def __init__(self, base: int, df: int, lasts: Sequence[int], load):
+        self.base = base
+        self.df = df
+        self.lasts = lasts
+        self.load = load
+        self._cache: Dict[int, List[int]] = {}
+
+    @classmethod
+    def from_deltas(cls, deltas: array, base: int, last: int) -> "_PostingList":
+        return cls(base, len(deltas), [last - base], lambda i: deltas)
+
+    @classmethod
+    def from_encoded(cls, data, base: int, df: int = 0) -> "_PostingList":
+        if bytes(data[:1]) != _BLOCKED:
+            deltas = _decode_block(data)
+            return cls(base, df or len(deltas), [sum(deltas)], lambda i: deltas)
+        (n,) = _U32.unpack_from(data, 1)
+        lasts = _to_array(bytes(data[5:5 + 4 * n]))
+        ends = _to_array(bytes(data[5 + 4 * n:5 + 8 * n]))
+        start = 5 + 8 * n
+
+        def load(i: int) -> array:
+            begin = start + (ends[i - 1] if i else 0)
+            return _to_array(zlib.decompress(data[begin:start + ends[i]]))
+
+        return cls(base, df, lasts, load)
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self.lasts)
+
+    def block(self, i: int) -> List[int]:
+        """Doc id absolut di blok i (ascending)"""
+        ids = self._cache.get(i)
+        if ids is None:
+            initial = self.base + (self.lasts[i - 1] if i else 0)
+            ids = list(itertools.accumulate(self.load(i), initial=initial))[1:]
+            self._cache[i] = ids
+        return ids
+
+    def filter(self, ids: List[int]) -> List[int]:
+        """Doc id dari ids (ascending) yang juga ada di posting list ini"""
+        lo = bisect.bisect_left(self.lasts, ids[0] - self.base)
+        if lo >= self.n_blocks:
+            return []
+        hi = min(bisect.bisect_left(self.lasts, ids[-1] - self.base), self.n_blocks - 1)
+        present = set()
+        for i in range(lo, hi + 1):
+            present.update(self.block(i))
+        return [d for d in ids if d in present]
+
+
+class _Memtable:
+    """Segment mutable yang sedang diisi"""
+
+    def __init__(self, base_doc: int):
+        self.base_doc = base_doc
+        self.docs: List[bytes] = []
+        # term -> [array delta, doc id terakhir]
+        self.postings: Dict[str, list] = {}
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc: bytes, terms: Iterable[str]) -> int:
+        doc_id = self.base_doc + len(self.docs)
+        self.docs.append(doc)
+        postings = self.postings
+        for term in terms:
+            entry = postings.get(term)
+            if entry is None:
+                postings[term] = [array("I", [doc_id - self.base_doc]), doc_id]
+            else:
+                entry[0].append(doc_id - entry[1])
+                entry[1] = doc_id
+        return doc_id
+
+    def posting_list(self, term: str) -> Optional[_PostingList]:
+        entry = self.postings.get(term)
+        if entry is None:
+            return None
+        return _PostingList.from_deltas(entry[0], self.base_doc, entry[1])
+
+    def doc(self, doc_id: int) -> bytes:
+        return self.docs[doc_id - self.base_doc]
+
+
+class _IndexSegment:
+    """
+    Segment immutable.
+
+    Layout: [postings][docs][doc offsets (uint64)][term dictionary][footer]
+    """
+
+    def __init__(self, buf, path: Optional[Path] = None):
+        self.path = path
+        self._buf = buf
+        (self.base_doc, self.n_docs, docs_offset, offsets_offset, dict_offset, magic) = \
+            _FOOTER.unpack_from(buf, len(buf) - _FOOTER.size)
+        if magic != _MAGIC:
+            raise ValueError(f"Corrupt search segment: {path}")
+        self._docs_offset = docs_offset
+        self._offsets = memoryview(buf)[offsets_offset:dict_offset].cast("Q")
+        self.terms: Dict[str, Tuple[int, int, int]] = {}
+        pos = dict_offset
+        end = len(buf) - _FOOTER.size
+        while pos < end:
+            n, df, offset, length = _DICT_ENTRY.unpack_from(buf, pos)
+            pos += _DICT_ENTRY.size
+            self.terms[bytes(buf[pos:pos + n]).decode("utf-8")] = (df, offset, length)
+            pos += n
+
+    @classmethod
+    def open(cls, path: Path) -> "_IndexSegment":
+        with open(path, "rb") as f:
+            # mmap tetap valid setelah file ditutup / di-unlink (setelah merge)
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm, path)
+
+    @staticmethod
+    def build(
+        out,
+        base_doc: int,
+        postings: Iterable[Tuple[str, int, bytes]],
+        docs: Iterable[bytes],
+    ):
+        """
+        Tulis segment ke file-like object.
+
+        Args:
+            out: File-like (binary) tujuan
+            base_doc: Doc id pertama di segment
+            postings: Iterable of (term, df, encoded postings) terurut by term
+            docs: Dokumen tersimpan, berurutan sesuai doc id
+        """
+        offset = 0
+        entries = []
+        for term, df, data in postings:
+            out.write(data)
+            entries.append((term.encode("utf-8"), df, offset, len(data)))
+            offset += len(data)
+        docs_offset = offset
+        doc_offsets = array("Q", [0])
+        for doc in docs:
+            out.write(doc)
+            offset += len(doc)
+            doc_offsets.append(offset - docs_offset)
+        # Align doc offsets ke 8 byte agar bisa di-cast sebagai uint64
+        pad = -offset % 8
+        out.write(b"\x00" * pad)
+        offset += pad
+        offsets_offset = offset
+        out.write(doc_offsets.tobytes())
+        offset += len(doc_offsets) * 8
+        dict_offset = offset
+        for term, df, p_offset, length in entries:
+            out.write(_DICT_ENTRY.pack(len(term), df, p_offset, length) + term)
+        out.write(_FOOTER.pack(
+            base_doc, len(doc_offsets) - 1, docs_offset, offsets_offset, dict_offset, _MAGIC
+        ))
+
+    def raw_postings(self, term: str) -> Optional[memoryview]:
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        _, offset, length = entry
+        return memoryview(self._buf)[offset:offset + length]
+
+    def deltas(self, term: str) -> Optional[array]:
+        data = self.raw_postings(term)
+        return None if data is None else decode_deltas(data)
+
+    def posting_list(self, term: str) -> Optional[_PostingList]:
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        df, offset, length = entry
+        return _PostingList.from_encoded(memoryview(self._buf)[offset:offset + length], self.base_doc, df)
+
+    def doc(self, doc_id: int) -> bytes:
+        i = doc_id - self.base_doc
+        start = self._docs_offset + self._offsets[i]
+        return bytes(self._buf[start:self._docs_offset + self._offsets[i + 1]])
+
+    def docs_blob(self) -> memoryview:
+        return memoryview(self._buf)[self._docs_offset:self._docs_offset + self._offsets[self.n_docs]]
+
+    def iter_docs(self) -> Iterable[bytes]:
+        for i in range(self.n_docs):
+            yield self.doc(self.base_doc + i)
+
+    @property
+    def size(self) -> int:
+        return len(self._buf)
+
+
+def _segment_seq(path: Path) -> int:
+    return int(path.stem.split("-")[1])
+
+
+class SearchIndex(BaseSink):
+    """
+    Inverted index sebagai output sink; query lewat search().
+    Thread-safe: write (thread sink), merge (thread background), dan search
+    (thread request) dapat berjalan bersamaan.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        fields: Sequence[str] = ("message",),
+        memtable_docs: int = 50_000,
+        merge_factor: int = 4,
+        **options,
+    ):
+        """
+        Initialize index.
+
+        Args:
+            path: Direktori segment; None = segment disimpan di memori
+            fields: Field payload yang di-index (dotted path, mis. "fields.user")
+            memtable_docs: Jumlah dokumen di memtable sebelum dibekukan menjadi segment
+            merge_factor: Jumlah segment setara yang di-merge menjadi satu
+            **options: Opsi BaseSink (batch_size, flush_interval, max_buffer)
+        """
+        options.setdefault("flush_interval", 0.05)
+        super().__init__(options.pop("name", "search"), **options)
+        self.path = Path(path) if path else None
+        self.fields = list(fields)
+        self.memtable_docs = memtable_docs
+        self.merge_factor = merge_factor
+        self._lock = threading.Lock()
+        self._segments: List[_IndexSegment] = []
+        # Memtable penuh yang sedang ditulis menjadi segment (tetap bisa dicari)
+        self._frozen: List[_Memtable] = []
+        self.merges = 0
+
+        self._seq = itertools.count(1)
+        if self.path:
+            self.path.mkdir(parents=True, exist_ok=True)
+            for tmp in self.path.glob("idx-*.tmp"):
+                tmp.unlink()
+            self._segments = self._load_segments()
+            last_seq = max((_segment_seq(s.path) for s in self._segments), default=0)
+            self._seq = itertools.count(last_seq + 1)
+        next_doc = self._segments[-1].base_doc + self._segments[-1].n_docs if self._segments else 0
+        self._memtable = _Memtable(next_doc)
+
+        self._merge_wakeup = threading.Event()
+        self._merge_thread: Optional[threading.Thread] = None
+        self._closing = False
+
+    def _load_segments(self) -> List[_IndexSegment]:
+        """
+        Buka segment di direktori index, urut berdasarkan base_doc.
+
+        Merge me-rename segment hasil sebelum menghapus segment asal; jika proses
+        mati di antaranya, keduanya ada di disk dengan rentang doc yang tumpang
+        tindih. Segment dengan sequence lebih tinggi (hasil merge) dipakai dan
+        segment asal yang sudah tercakup dihapus, sehingga merge selesai.
+        """
+        segments = sorted(
+            (_IndexSegment.open(seg_path) for seg_path in self.path.glob("idx-*.seg")),
+            key=lambda s: _segment_seq(s.path), reverse=True,
+        )
+        kept: List[_IndexSegment] = []
+        for segment in segments:
+            end = segment.base_doc + segment.n_docs
+            if any(segment.base_doc < k.base_doc + k.n_docs and k.base_doc < end for k in kept):
+                logger.warning(f"Search segment {segment.path.name} already covered by a merged segment, removing")
+                segment.path.unlink()
+                continue
+            kept.append(segment)
+        kept.sort(key=lambda s: s.base_doc)
+        return kept
+
+    # -- Indexing ---------------------------------------------------------
+
+    def start(self):
+        if self._merge_thread is None:
+            self._closing = False
+            self._merge_thread = threading.Thread(target=self._merge_loop, name="search-merge", daemon=True)
+            self._merge_thread.start()
+        super().start()
+
+    async def _write(self, batch: List[bytes]):
+        await asyncio.to_thread(self.add_records, batch)
+
+    def add_records(self, records: Iterable[bytes]) -> int:
+        """
+        Index event (JSON bytes seperti output encode_event).
+
+        Returns:
+            Jumlah dokumen yang ditambahkan
+        """
+        prepared = []
+        for record in records:
+            event = json.loads(record)
+            payload = event.get("payload") or {}
+            doc = {
+                "topic": event["topic"],
+                "event_id": event["event_id"],
+                "timestamp": event.get("timestamp"),
+                "source": event.get("source"),
+            }
+            terms = [_topic_term(event["topic"])]
+            for field in self.fields:
+                value = get_field(payload, field)
+                if value is None:
+                    continue
+                doc[field] = value
+                terms.extend(tokenize(value if isinstance(value, str) else json.dumps(value)))
+            prepared.append((json.dumps(doc, separators=(",", ":")).encode("utf-8"), terms))
+
+        full = []
+        with self._lock:
+            for doc, terms in prepared:
+                self._memtable.add(doc, terms)
+                if self._memtable.n_docs >= self.memtable_docs:
+                    full.append(self._swap_memtable())
+        for memtable in full:
+            self._freeze(memtable)
+        return len(prepared)
+
+    def _swap_memtable(self) -> _Memtable:
+        """Ganti memtable dengan yang baru (dipanggil dengan lock)"""
+        memtable = self._memtable
+        self._frozen.append(memtable)
+        self._memtable = _Memtable(memtable.base_doc + memtable.n_docs)
+        return memtable
+
+    def _freeze(self, memtable: _Memtable):
+        """Tulis memtable yang sudah di-swap menjadi segment (di luar lock)"""
+        postings = (
+            (term, len(entry[0]), encode_postings(entry[0]))
+            for term, entry in sorted(memtable.postings.items())
+        )
+        segment = self._write_segment(memtable.base_doc, postings, memtable.docs)
+        with self._lock:
+            self._segments.append(segment)
+            self._frozen.remove(memtable)
+        self._merge_wakeup.set()
+
+    def _write_segment(self, base_doc: int, postings, docs) -> _IndexSegment:
+        if self.path is None:
+            buf = io.BytesIO()
+            _IndexSegment.build(buf, base_doc, postings, docs)
+            return _IndexSegment(buf.getvalue())
+        seg_path = self.path / f"idx-{next(self._seq):08d}.seg"
+        tmp = seg_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            _IndexSegment.build(f, base_doc, postings, docs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, seg_path)
+        return _IndexSegment.open(seg_path)
+
+    def flush_memtable(self):
+        """Paksa memtable dibekukan menjadi segment"""
+        with self._lock:
+            if not self._memtable.n_docs:
+                return
+            memtable = self._swap_memtable()
+        self._freeze(memtable)
+
+    # -- Background merge -------------------------------------------------
+
+    def _tier(self, segment: _IndexSegment) -> int:
+        tier, size = 0, self.memtable_docs
+        while segment.n_docs > size:
+            size *= self.merge_factor
+            tier += 1
+        return tier
+
+    def _pick_merge(self) -> Optional[List[_IndexSegment]]:
+        """Cari merge_factor segment bersebelahan dengan tier yang sama"""
+        with self._lock:
+            segments = list(self._segments)
+        run: List[_IndexSegment] = []
+        for segment in segments:
+            if run and self._tier(segment) == self._tier(run[0]):
+                run.append(segment)
+            else:
+                run = [segment]
+            if len(run) == self.merge_factor:
+                return run
+        return None
+
+    def _merge_loop(self):
+        while True:
+            self._merge_wakeup.wait()
+            self._merge_wakeup.clear()
+            if self._closing:
+                return
+            while not self._closing:
+                run = self._pick_merge()
+                if run is None:
+                    break
+                try:
+                    self._merge(run)
+                except Exception as e:
+                    logger.error(f"Search index merge failed: {e}", exc_info=True)
+                    break
+
+    def merge_pending(self):
+        """Jalankan semua merge yang tersedia secara sinkron (untuk testing/benchmark)"""
+        while (run := self._pick_merge()) is not None:
+            self._merge(run)
+
+    def _merge(self, run: List[_IndexSegment]):
+        start = time.perf_counter()
+        base = run[0].base_doc
+        terms = sorted(set().union(*(segment.terms for segment in run)))
+
+        def merged_postings():
+            for term in terms:
+                merged = array("I")
+                last = base
+                for segment in run:
+                    deltas = segment.deltas(term)
+                    if deltas is None:
+                        continue
+                    # Delta pertama relatif ke base segment; ubah relatif ke doc terakhir sebelumnya
+                    first = segment.base_doc + deltas[0]
+                    seg_last = segment.base_doc + sum(deltas)
+                    deltas[0] = first - last
+                    merged.extend(deltas)
+                    last = seg_last
+                yield term, len(merged), encode_postings(merged)
+
+        docs = itertools.chain.from_iterable(segment.iter_docs() for segment in run)
+        merged = self._write_segment(base, merged_postings(), docs)
+        with self._lock:
+            i = self._segments.index(run[0])
+            self._segments[i:i + len(run)] = [merged]
+            self.merges += 1
+        for segment in run:
+            if segment.path is not None:
+                segment.path.unlink()
+        logger.info(
+            f"Search index merge: {len(run)} segment(s), {merged.n_docs} doc(s) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    async def _close(self):
+        self._closing = True
+        self._merge_wakeup.set()
+        if self._merge_thread is not None:
+            await asyncio.to_thread(self._merge_thread.join)
+            self._merge_thread = None
+        if self.path is not None:
+            # Memtable tidak memiliki WAL: bekukan ke segment agar tidak hilang saat restart
+            await asyncio.to_thread(self.flush_memtable)
+
+    # -- Query ------------------------------------------------------------
+
+    def search(self, q: str, topic: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Cari dokumen yang mengandung semua token q (AND), terbaru lebih dulu.
+
+        Args:
+            q: Query teks (di-tokenize seperti field ter-index)
+            topic: Optional filter topic
+            limit: Jumlah hasil maksimum
+
+        Returns:
+            Dictionary: results, count, truncated, took_ms
+        """
+        start = time.perf_counter()
+        terms = tokenize(q or "")
+        if topic:
+            terms.append(_topic_term(topic))
+        results: List[Dict[str, Any]] = []
+        truncated = False
+        if terms and limit > 0:
+            with self._lock:
+                sources = list(self._segments) + list(self._frozen)
+                # Memtable terus berubah: ambil hasil dari memtable selagi memegang lock
+                found = self._match(self._memtable, terms, limit)
+                docs = [self._memtable.doc(d) for d in found]
+            results.extend(json.loads(doc) for doc in docs)
+            for segment in reversed(sources):
+                if len(results) >= limit:
+                    truncated = True
+                    break
+                found = self._match(segment, terms, limit - len(results))
+                results.extend(json.loads(segment.doc(d)) for d in found)
+        return {
+            "results": results,
+            "count": len(results),
+            "truncated": truncated,
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    @staticmethod
+    def _match(source, terms: List[str], limit: int) -> List[int]:
+        """Doc id (terbaru dulu) yang mengandung semua term di satu sumber"""
+        postings = []
+        for term in terms:
+            posting_list = source.posting_list(term)
+            if posting_list is None:
+                return []
+            postings.append(posting_list)
+        # Term paling jarang menjadi driver, dibaca per blok dari yang terbaru
+        postings.sort(key=lambda p: p.df)
+        driver, others = postings[0], postings[1:]
+        found: List[int] = []
+        for i in reversed(range(driver.n_blocks)):
+            ids = driver.block(i)
+            for other in others:
+                ids = other.filter(ids)
+                if not ids:
+                    break
+            found.extend(reversed(ids))
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get statistik index.
+
+        Returns:
+            Dictionary: counter BaseSink ditambah jumlah dokumen, segment, merge,
+            dan ukuran segment (bytes)
+        """
+        with self._lock:
+            segments = list(self._segments)
+            memtable_docs = self._memtable.n_docs + sum(m.n_docs for m in self._frozen)
+        return {
+            **super().snapshot(),
+            "docs": sum(s.n_docs for s in segments) + memtable_docs,
+            "memtable_docs": memtable_docs,
+            "segments": len(segments),
+            "segment_bytes": sum(s.size for s in segments),
+            "merges": self.merges,
+            "fields": self.fields,
+        }
+
+
+def create_search_index() -> Optional[SearchIndex]:
+    """
+    Buat SearchIndex dari environment variable (SEARCH_INDEX=1 mengaktifkan).
+
+    Returns:
+        SearchIndex atau None
+    """
+    if os.getenv("SEARCH_INDEX", "0") != "1":
+        return None
+    fields = [f.strip() for f in os.getenv("SEARCH_FIELDS", "message").split(",") if f.strip()]
+    return SearchIndex(
+        path=os.getenv("SEARCH_INDEX_PATH") or None,
+        fields=fields,
+        memtable_docs=int(os.getenv("SEARCH_MEMTABLE_DOCS", "50000")),
+        merge_factor=int(os.getenv("SEARCH_MERGE_FACTOR", "4")),
+    )
@@ -0,0 +1,661 @@
+"""
+Output sink untuk event unik setelah deduplication.
+
+Setiap sink memiliki buffer berbatas sendiri. Event tidak pernah di-drop:
+sebelum dedup commit, consumer menunggu sampai setiap sink punya ruang
+(wait_for_room), sehingga sink yang penuh menahan consumer (backpressure).
+Jika outbox aktif (outbox_dir), event dicatat durable ke outbox sebelum dedup
+commit dan baru dihapus setelah _write() berhasil; event yang belum di-ack saat
+crash dikirim ulang saat startup (at-least-once).
+Event di-serialize sekali menjadi satu baris JSON yang dipakai bersama semua sink.
+
+Setiap sink mem-flush buffer secara batch (ukuran atau interval waktu), dengan
+beberapa flush in-flight sekaligus dan retry dengan exponential backoff.
+Buffer dan dispatch ada di BufferedStage, yang juga dipakai TransformStage;
+BaseSink menambahkan retry di atasnya.
+Event baru dihitung "acked" setelah _write() selesai, yaitu setelah data
+durable (fsync ke file, atau response 2xx dari webhook).
+
+- FileSink: rolling NDJSON terkompresi gzip; setiap flush ditulis sebagai satu
+  gzip member utuh sehingga file tetap bisa dibaca meski proses berhenti mendadak.
+- WebhookSink: POST {"events": [...]} ke URL HTTP.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from .models import QueuedEvent
+
+logger = logging.getLogger(__name__)
+
+_OUTBOX_ENTRY = struct.Struct(">BQI")   # type, seq, data length
+_OUTBOX_RECORD = 1
+_OUTBOX_ACK = 2
+
+# Entry buffer: (seq outbox atau None, record)
+Entry = Tuple[Optional[int], bytes]
+
+
+class PermanentSinkError(Exception):
+    """Error yang tidak akan berhasil jika di-retry (mis. HTTP 4xx)"""
+
+
+def encode_event(event) -> bytes:
+    """
+    Serialize event menjadi satu baris JSON.
+    Payload QueuedEvent disalin langsung dari JSON bytes tanpa di-parse.
+
+    Args:
+        event: Event atau QueuedEvent
+
+    Returns:
+        JSON bytes tanpa newline
+    """
+    if isinstance(event, QueuedEvent):
+        head = json.dumps(
+            {
+                'topic': event.topic,
+                'event_id': event.event_id,
+                'timestamp': event.timestamp,
+                'source': event.source,
+            },
+            separators=(',', ':'),
+        )
+        return head[:-1].encode('utf-8') + b',"payload":' + (event.payload_raw or b'{}') + b'}'
+    return json.dumps(event.model_dump(), separators=(',', ':')).encode('utf-8')
+
+
+class Outbox:
+    """
+    Append-only log record yang sudah diterima stage tetapi belum di-ack.
+
+    Record di-fsync saat append; ack tidak di-fsync karena ack yang hilang saat
+    crash hanya membuat record dikirim ulang. Saat dibuka ulang, record tanpa ack
+    tersedia di pending(). File dipotong ke nol saat semua record sudah di-ack,
+    dan ditulis ulang (hanya record live) jika tumbuh melewati compact_bytes.
+    """
+
+    def __init__(
+        self, path: str, sync: bool = True, compact_bytes: int = 64 * 1024 * 1024, first_seq: int = 0,
+    ):
+        """
+        Initialize outbox.
+
+        Args:
+            path: Path file outbox
+            sync: fsync setiap append (syarat durable)
+            compact_bytes: Ukuran file minimum sebelum ditulis ulang
+            first_seq: Seq minimum record berikutnya (seq tidak tersimpan saat file kosong)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sync = sync
+        self.compact_bytes = compact_bytes
+        self._live: Dict[int, bytes] = {}
+        self._live_bytes = 0
+        self._next_seq = first_seq
+        end = self._replay()
+        self._file = open(self.path, "ab")
+        # Buang entry terpotong di akhir file (crash saat append)
+        self._file.truncate(end)
+
+    def _replay(self) -> int:
+        if not self.path.exists():
+            return 0
+        data = self.path.read_bytes()
+        pos = 0
+        while pos + _OUTBOX_ENTRY.size <= len(data):
+            kind, seq, n = _OUTBOX_ENTRY.unpack_from(data, pos)
+            end = pos + _OUTBOX_ENTRY.size + n
+            if end > len(data) or kind not in (_OUTBOX_RECORD, _OUTBOX_ACK):
+                break
+            body = data[pos + _OUTBOX_ENTRY.size:end]
+            if kind == _OUTBOX_RECORD:
+                self._live[seq] = body
+                self._next_seq = max(self._next_seq, seq + 1)
+            else:
+                for acked in struct.unpack(f">{n // 8}Q", body):
+                    self._live.pop(acked, None)
+            pos = end
+        self._live_bytes = sum(len(r) for r in self._live.values())
+        return pos
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def pending(self) -> List[Entry]:
+        """Record yang belum di-ack, urut sesuai append"""
+        return list(self._live.items())
+
+    def append(self, records: List[bytes]) -> List[int]:
+        """
+        Tulis records secara durable.
+
+        Returns:
+            Nomor urut (seq) per record, dipakai untuk ack()
+        """
+        seqs = list(range(self._next_seq, self._next_seq + len(records)))
+        self._next_seq += len(records)
+        self._file.write(b"".join(
+            _OUTBOX_ENTRY.pack(_OUTBOX_RECORD, seq, len(record)) + record
+            for seq, record in zip(seqs, records)
+        ))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        for seq, record in zip(seqs, records):
+            self._live[seq] = record
+            self._live_bytes += len(record)
+        return seqs
+
+    def ack(self, seqs: List[int]):
+        """Hapus record yang sudah selesai diproses (atau dibatalkan)"""
+        seqs = [seq for seq in seqs if seq in self._live]
+        if not seqs:
+            return
+        for seq in seqs:
+            self._live_bytes -= len(self._live.pop(seq))
+        if not self._live:
+            self._file.truncate(0)
+        elif self._file.tell() >= max(self.compact_bytes, 2 * self._live_bytes):
+            self._rewrite()
+        else:
+            self._file.write(
+                _OUTBOX_ENTRY.pack(_OUTBOX_ACK, 0, 8 * len(seqs)) + struct.pack(f">{len(seqs)}Q", *seqs)
+            )
+            self._file.flush()
+
+    def _rewrite(self):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(
+                _OUTBOX_ENTRY.pack(_OUTBOX_RECORD, seq, len(record)) + record
+                for seq, record in self._live.items()
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+
+    def clear(self):
+        """Ack semua record"""
+        self._live.clear()
+        self._live_bytes = 0
+        self._file.truncate(0)
+
+    def close(self):
+        self._file.close()
+
+
+class BufferedStage(ABC):
+    """
+    Buffer berbatas dengan dispatch batch asinkron (ukuran atau interval waktu)
+    dan beberapa batch in-flight sekaligus. Dasar untuk output sink dan
+    TransformStage; subclass mengimplementasikan _process_batch().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_buffer: int = 100_000,
+        max_in_flight: int = 1,
+        outbox_dir: Optional[str] = None,
+    ):
+        """
+        Initialize stage.
+
+        Args:
+            name: Nama stage (untuk stats dan log)
+            batch_size: Jumlah event maksimum per flush
+            flush_interval: Umur maksimum event di buffer sebelum di-flush (detik)
+            max_buffer: Kapasitas buffer; producer menunggu (wait_for_room) jika penuh
+            max_in_flight: Jumlah flush yang boleh berjalan bersamaan
+            outbox_dir: Direktori outbox ({name}.outbox); None = tanpa outbox
+        """
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_in_flight = max_in_flight
+
+        self._buffer: Deque[Entry] = deque()
+        self._oldest: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._flushes: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self._force = False
+        self.stats = {
+            'accepted': 0,
+            'backpressure_waits': 0,
+            'acked': 0,
+            'failed': 0,
+            'batches': 0,
+        }
+
+        self._outbox = Outbox(str(Path(outbox_dir) / f"{name}.outbox")) if outbox_dir else None
+        if self._outbox is not None and len(self._outbox):
+            # Event yang belum di-ack sebelum restart dikirim ulang lebih dulu
+            replayed = self._outbox.pending()
+            self._buffer.extend(replayed)
+            self._oldest = time.monotonic()
+            self.stats['accepted'] += len(replayed)
+            logger.info(f"Sink {name} replaying {len(replayed)} unacked event(s) from outbox")
+
+    @property
+    def pending(self) -> int:
+        """Jumlah event yang belum di-ack (buffer + in-flight)"""
+        return self.stats['accepted'] - self.stats['acked'] - self.stats['failed']
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        """Stop sink setelah mencoba mem-flush seluruh buffer"""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        await self._task
+        await self._close()
+        if self._outbox is not None:
+            self._outbox.close()
+
+    def _has_room(self, n: int) -> bool:
+        return not self._buffer or len(self._buffer) + n <= self.max_buffer
+
+    async def wait_for_room(self, n: int):
+        """
+        Tunggu sampai buffer punya ruang untuk n event (backpressure ke producer).
+        Jika n melebihi max_buffer, tunggu sampai buffer kosong.
+
+        Args:
+            n: Jumlah event yang akan dimasukkan
+        """
+        if self._has_room(n):
+            return
+        self.stats['backpressure_waits'] += 1
+        while not self._has_room(n):
+            self._room.clear()
+            await self._room.wait()
+
+    def prepare(self, records: List[bytes]) -> List[Entry]:
+        """
+        Catat event ke outbox (jika aktif) sebelum dedup commit.
+
+        Args:
+            records: Event yang sudah di-serialize (encode_event)
+
+        Returns:
+            Entry untuk commit()
+        """
+        seqs = self._outbox.append(records) if self._outbox is not None else [None] * len(records)
+        return list(zip(seqs, records))
+
+    def commit(self, entries: List[Entry], keep: Optional[List[bool]] = None) -> int:
+        """
+        Masukkan entry hasil prepare() ke buffer tanpa menunggu. Buffer tidak
+        dibatasi di sini; producer memanggil wait_for_room() sebelum prepare().
+
+        Args:
+            entries: Entry dari prepare()
+            keep: Flag per entry; entry dengan False (mis. duplikat) dibatalkan
+
+        Returns:
+            Jumlah event yang masuk buffer
+        """
+        if keep is not None:
+            if self._outbox is not None:
+                self._outbox.ack([seq for (seq, _), k in zip(entries, keep) if not k])
+            entries = [entry for entry, k in zip(entries, keep) if k]
+        if entries:
+            was_empty = not self._buffer
+            if was_empty:
+                self._oldest = time.monotonic()
+            self._buffer.extend(entries)
+            self.stats['accepted'] += len(entries)
+            # Bangunkan dispatcher untuk memulai timer flush atau flush batch penuh
+            if was_empty or len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+        return len(entries)
+
+    def offer(self, records: List[bytes]) -> int:
+        """
+        Masukkan event ke buffer tanpa menunggu (prepare + commit).
+
+        Args:
+            records: Event yang sudah di-serialize (encode_event)
+
+        Returns:
+            Jumlah event yang masuk buffer
+        """
+        return self.commit(self.prepare(records))
+
+    async def flush(self):
+        """Flush seluruh buffer dan tunggu sampai semua event di-ack atau gagal"""
+        if not self._running:
+            raise RuntimeError(f"Sink {self.name} is not running")
+        self._force = True
+        self._wakeup.set()
+        try:
+            while self._buffer or self._flushes:
+                if self._flushes:
+                    await asyncio.wait(set(self._flushes))
+                else:
+                    await asyncio.sleep(0)
+        finally:
+            self._force = False
+
+    def _due_in(self) -> Optional[float]:
+        """Sisa waktu sampai buffer wajib di-flush (None jika buffer kosong)"""
+        if not self._buffer:
+            return None
+        if self._force or not self._running or len(self._buffer) >= self.batch_size:
+            return 0.0
+        return max(0.0, self._oldest + self.flush_interval - time.monotonic())
+
+    async def _dispatch_loop(self):
+        while self._running or self._buffer:
+            due = self._due_in()
+            if due != 0.0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=due)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Tunggu slot in-flight; selama menunggu buffer tetap menerima event
+            await self._slots.acquire()
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._oldest = time.monotonic() if self._buffer else None
+            self._room.set()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+        if self._flushes:
+            await asyncio.wait(set(self._flushes))
+
+    async def _run_batch(self, batch: List[Entry]):
+        try:
+            done = await self._process_batch([record for _, record in batch])
+            if done and self._outbox is not None:
+                self._outbox.ack([seq for seq, _ in batch])
+        finally:
+            self._slots.release()
+
+    @abstractmethod
+    async def _process_batch(self, batch: List[bytes]) -> bool:
+        """
+        Proses satu batch dari buffer dan perbarui stats acked/failed/batches.
+
+        Args:
+            batch: Event yang sudah di-serialize
+
+        Returns:
+            True jika batch selesai dan boleh dihapus dari outbox
+        """
+
+    async def _close(self):
+        """Lepas resource setelah buffer selesai di-flush"""
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get statistik stage.
+
+        Returns:
+            Dictionary: counter accepted/backpressure_waits/acked/failed/batches
+            (dan retries untuk sink), buffered, in_flight, pending, dan outbox
+            (record belum di-ack di outbox) jika outbox aktif
+        """
+        snapshot = {
+            **self.stats,
+            'buffered': len(self._buffer),
+            'in_flight': len(self._flushes),
+            'pending': self.pending,
+        }
+        if self._outbox is not None:
+            snapshot['outbox'] = len(self._outbox)
+        return snapshot
+
+
+class BaseSink(BufferedStage):
+    """
+    Sink dengan buffer berbatas, flush batch asinkron, dan retry dengan backoff.
+    Subclass cukup mengimplementasikan _write() yang baru return setelah data durable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_buffer: int = 100_000,
+        max_in_flight: int = 1,
+        max_retries: int = 5,
+        retry_backoff: float = 0.2,
+        outbox_dir: Optional[str] = None,
+    ):
+        """
+        Initialize sink.
+
+        Args:
+            name: Nama sink (untuk stats dan log)
+            batch_size: Jumlah event maksimum per flush
+            flush_interval: Umur maksimum event di buffer sebelum di-flush (detik)
+            max_buffer: Kapasitas buffer; producer menunggu (wait_for_room) jika penuh
+            max_in_flight: Jumlah flush yang boleh berjalan bersamaan
+            max_retries: Jumlah retry per batch sebelum batch dinyatakan gagal
+            retry_backoff: Backoff awal antar retry (detik), dilipatgandakan per percobaan
+            outbox_dir: Direktori outbox ({name}.outbox); None = tanpa outbox
+        """
+        super().__init__(name, batch_size, flush_interval, max_buffer, max_in_flight, outbox_dir)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.stats['retries'] = 0
+
+    async def _process_batch(self, batch: List[bytes]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._write(batch)
+            except Exception as e:
+                if isinstance(e, PermanentSinkError) or attempt == self.max_retries:
+                    self.stats['failed'] += len(batch)
+                    logger.error(f"Sink {self.name} failed to deliver {len(batch)} event(s): {e}")
+                    # Error permanen tidak akan berhasil jika dikirim ulang; batch yang
+                    # kehabisan retry tetap di outbox dan dikirim ulang saat restart
+                    return isinstance(e, PermanentSinkError)
+                self.stats['retries'] += 1
+                logger.warning(f"Sink {self.name} flush failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            else:
+                self.stats['acked'] += len(batch)
+                self.stats['batches'] += 1
+                return True
+        return False
+
+    @abstractmethod
+    async def _write(self, batch: List[bytes]):
+        """
+        Tulis batch secara durable. Raise exception jika gagal (akan di-retry).
+
+        Args:
+            batch: Event yang sudah di-serialize
+        """
+
+
+class FileSink(BaseSink):
+    """
+    Rolling NDJSON file terkompresi gzip.
+    File baru dibuat jika ukuran file melewati max_bytes atau umurnya melewati max_age.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "events",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float = 3600.0,
+        compresslevel: int = 6,
+        fsync: bool = True,
+        **options,
+    ):
+        """
+        Initialize file sink.
+
+        Args:
+            directory: Direktori output
+            prefix: Prefix nama file ({prefix}-{waktu}-{seq}.ndjson.gz)
+            max_bytes: Ukuran file (terkompresi) sebelum roll ke file baru
+            max_age: Umur file maksimum sebelum roll (detik)
+            compresslevel: Level kompresi gzip
+            fsync: fsync setiap flush (syarat ack durable)
+            **options: Opsi BaseSink (batch_size, flush_interval, ...)
+        """
+        super().__init__(options.pop("name", "file"), **options)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compresslevel = compresslevel
+        self.fsync = fsync
+        self.current_path: Optional[Path] = None
+        self._file = None
+        self._opened_at = 0.0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    async def _write(self, batch: List[bytes]):
+        await asyncio.to_thread(self._write_sync, batch)
+
+    def _write_sync(self, batch: List[bytes]):
+        # Kompresi di luar lock agar flush in-flight bisa berjalan paralel
+        member = gzip.compress(b"\n".join(batch) + b"\n", compresslevel=self.compresslevel)
+        with self._lock:
+            if self._file is None or self._should_roll():
+                self._roll()
+            self._file.write(member)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _should_roll(self) -> bool:
+        return (
+            self._file.tell() >= self.max_bytes
+            or time.monotonic() - self._opened_at >= self.max_age
+        )
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        self.current_path = self.directory / f"{self.prefix}-{stamp}-{self._seq:06d}.ndjson.gz"
+        self._file = open(self.current_path, "ab")
+        self._opened_at = time.monotonic()
+        logger.info(f"Sink {self.name} writing to {self.current_path}")
+
+    async def _close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class WebhookSink(BaseSink):
+    """
+    POST batch event ke HTTP endpoint sebagai {"events": [...]}.
+    Response 2xx dianggap ack; 4xx (kecuali 408/429) tidak di-retry.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        **options,
+    ):
+        """
+        Initialize webhook sink.
+
+        Args:
+            url: URL tujuan
+            headers: Header tambahan (mis. Authorization)
+            timeout: Timeout request (detik)
+            transport: Optional httpx transport (untuk testing)
+            **options: Opsi BaseSink; default max_in_flight=4
+        """
+        options.setdefault("max_in_flight", 4)
+        super().__init__(options.pop("name", "webhook"), **options)
+        self.url = url
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=transport,
+            headers={"Content-Type": "application/json", **(headers or {})},
+        )
+
+    async def _write(self, batch: List[bytes]):
+        body = b'{"events":[' + b",".join(batch) + b"]}"
+        response = await self._client.post(self.url, content=body)
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise PermanentSinkError(f"HTTP {response.status_code} from {self.url}")
+        response.raise_for_status()
+
+    async def _close(self):
+        await self._client.aclose()
+
+
+def create_sinks() -> List[BaseSink]:
+    """
+    Buat sink dari environment variable.
+    SINK_FILE_DIR mengaktifkan FileSink, SINK_WEBHOOK_URL mengaktifkan WebhookSink.
+    SINK_OUTBOX_DIR mengaktifkan outbox durable untuk setiap sink.
+
+    Returns:
+        List of sinks (kosong jika tidak ada yang dikonfigurasi)
+    """
+    options = {
+        "batch_size": int(os.getenv("SINK_BATCH_SIZE", "500")),
+        "flush_interval": float(os.getenv("SINK_FLUSH_MS", "1000")) / 1000,
+        "max_buffer": int(os.getenv("SINK_MAX_BUFFER", "100000")),
+        "max_retries": int(os.getenv("SINK_MAX_RETRIES", "5")),
+        "outbox_dir": os.getenv("SINK_OUTBOX_DIR") or None,
+    }
+    sinks: List[BaseSink] = []
+    directory = os.getenv("SINK_FILE_DIR")
+    if directory:
+        sinks.append(FileSink(
+            directory,
+            max_bytes=int(os.getenv("SINK_FILE_MAX_BYTES", str(64 * 1024 * 1024))),
+            max_age=float(os.getenv("SINK_FILE_MAX_AGE_S", "3600")),
+            **options,
+        ))
+    url = os.getenv("SINK_WEBHOOK_URL")
+    if url:
+        sinks.append(WebhookSink(
+            url,
+            max_in_flight=int(os.getenv("SINK_WEBHOOK_IN_FLIGHT", "4")),
+            **options,
+        ))
+    return sinks
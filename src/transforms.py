@@ -0,0 +1,373 @@
+"""
+Transform pipeline untuk payload event (parsing, enrichment, redaction).
+
+Transform berjalan setelah dedup dan sebelum output sink. TransformStage
+menerima event seperti sink biasa (buffer berbatas dengan backpressure dan
+outbox opsional), lalu mengirim setiap batch ke ProcessPoolExecutor sehingga kerja
+CPU-bound tidak memblokir event loop.
+
+- Serialisasi per batch: setiap chunk dikirim ke worker sebagai satu blob
+  NDJSON bytes (bukan pickle per event) dan hasilnya kembali sebagai satu blob.
+- Urutan: hasil batch di-emit ke sink sesuai urutan batch masuk, dan chunk
+  dalam satu batch disusun ulang sesuai posisi aslinya, sehingga urutan per
+  topic tetap terjaga meski beberapa batch diproses bersamaan.
+- Error path: event yang gagal di-transform tidak diteruskan ke sink, tetapi
+  dikirim ke dead-letter sink (jika dikonfigurasi) beserta nama transform dan
+  pesan error, serta dicatat di stats.
+
+Transform adalah fungsi `(event: dict) -> Optional[dict]`; return None untuk
+membuang event. Transform dipilih dengan nama (lihat TRANSFORMS) atau dengan
+path "module:function" yang bisa di-import di proses worker.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .sinks import BaseSink, BufferedStage, FileSink
+
+logger = logging.getLogger(__name__)
+
+Transform = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+Pipeline = List[Tuple[str, Transform]]
+
+# key=value atau key="value dengan spasi"
+_LOGFMT_RE = re.compile(r'(\w[\w.-]*)=("(?:[^"\\]|\\.)*"|\S+)')
+
+_REDACTIONS = [
+    ("email", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")),
+    ("card", re.compile(r"\b(?:\d[ -]?){13,16}\b")),
+    ("ipv4", re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")),
+    ("token", re.compile(r"(?i)\b(bearer|token|api[_-]?key|password)([=: ]+)\S+")),
+]
+
+_LEVELS = {
+    "warn": "WARNING", "warning": "WARNING", "err": "ERROR", "error": "ERROR",
+    "fatal": "CRITICAL", "critical": "CRITICAL", "info": "INFO", "debug": "DEBUG",
+    "trace": "DEBUG",
+}
+
+
+def parse_message(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse payload.message berformat JSON object atau logfmt ke payload.fields"""
+    payload = event.get("payload") or {}
+    message = payload.get("message")
+    if not isinstance(message, str):
+        return event
+    text = message.strip()
+    if text.startswith("{"):
+        fields = json.loads(text)
+    else:
+        fields = {k: v[1:-1] if v.startswith('"') else v for k, v in _LOGFMT_RE.findall(text)}
+    if fields:
+        payload["fields"] = fields
+        event["payload"] = payload
+    return event
+
+
+def _redact_value(value):
+    if isinstance(value, str):
+        for label, pattern in _REDACTIONS:
+            if label == "token":
+                value = pattern.sub(lambda m: f"{m.group(1)}{m.group(2)}[REDACTED:token]", value)
+            else:
+                value = pattern.sub(f"[REDACTED:{label}]", value)
+        return value
+    if isinstance(value, dict):
+        return {k: _redact_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_value(v) for v in value]
+    return value
+
+
+def redact(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Redaksi email, nomor kartu, IPv4, dan token/password di seluruh payload"""
+    if event.get("payload"):
+        event["payload"] = _redact_value(event["payload"])
+    return event
+
+
+def enrich(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalisasi level log dan tambahkan metadata ukuran pesan"""
+    payload = event.get("payload") or {}
+    level = payload.get("level")
+    if isinstance(level, str):
+        payload["level"] = _LEVELS.get(level.lower(), level.upper())
+    message = payload.get("message")
+    if isinstance(message, str):
+        payload["message_length"] = len(message)
+        payload["word_count"] = len(message.split())
+    event["payload"] = payload
+    return event
+
+
+TRANSFORMS: Dict[str, Transform] = {
+    "parse": parse_message,
+    "redact": redact,
+    "enrich": enrich,
+}
+
+
+def build_pipeline(spec: str) -> Pipeline:
+    """
+    Buat pipeline dari spec "nama,nama,module:function".
+
+    Args:
+        spec: Daftar transform dipisah koma, dijalankan berurutan
+
+    Returns:
+        List of (nama, fungsi)
+
+    Raises:
+        ValueError: Jika nama transform tidak dikenal
+    """
+    pipeline = []
+    for name in (s.strip() for s in spec.split(",")):
+        if not name:
+            continue
+        if ":" in name:
+            module, _, attr = name.partition(":")
+            pipeline.append((name, getattr(importlib.import_module(module), attr)))
+        elif name in TRANSFORMS:
+            pipeline.append((name, TRANSFORMS[name]))
+        else:
+            raise ValueError(f"Unknown transform: {name!r} (expected one of {sorted(TRANSFORMS)})")
+    return pipeline
+
+
+def apply_pipeline(pipeline: Pipeline, blob: bytes) -> Tuple[bytes, int, List[Tuple[int, str, str]]]:
+    """
+    Jalankan pipeline atas satu chunk NDJSON.
+
+    Args:
+        pipeline: Hasil build_pipeline()
+        blob: Event NDJSON (satu event per baris)
+
+    Returns:
+        (NDJSON hasil, jumlah event yang dibuang, list (index, transform, error))
+    """
+    out = []
+    filtered = 0
+    errors = []
+    for index, line in enumerate(blob.split(b"\n")):
+        stage = "decode"
+        try:
+            event = json.loads(line)
+            for stage, fn in pipeline:
+                event = fn(event)
+                if event is None:
+                    break
+            if event is None:
+                filtered += 1
+                continue
+            # Output transform yang tidak bisa di-serialize hanya menggagalkan event ini
+            stage = "encode"
+            out.append(json.dumps(event, separators=(",", ":")).encode("utf-8"))
+        except Exception as e:
+            errors.append((index, stage, f"{type(e).__name__}: {e}"))
+    return b"\n".join(out), filtered, errors
+
+
+# Pipeline milik proses worker, dibuat sekali oleh initializer
+_worker_pipeline: Pipeline = []
+
+
+def _init_worker(spec: str):
+    global _worker_pipeline
+    _worker_pipeline = build_pipeline(spec)
+
+
+def _run_chunk(blob: bytes):
+    return apply_pipeline(_worker_pipeline, blob)
+
+
+class TransformStage(BufferedStage):
+    """
+    Stage transform berbasis process pool di antara consumer dan output sink.
+    workers=0 menjalankan pipeline inline di event loop (untuk baseline/benchmark).
+    """
+
+    def __init__(
+        self,
+        spec: str,
+        workers: Optional[int] = None,
+        downstream: Optional[List[BaseSink]] = None,
+        dead_letter: Optional[BaseSink] = None,
+        chunk_size: int = 250,
+        **options,
+    ):
+        """
+        Initialize transform stage.
+
+        Args:
+            spec: Daftar transform (lihat build_pipeline)
+            workers: Jumlah proses worker (default os.cpu_count(); 0 = inline)
+            downstream: Sink penerima event hasil transform
+            dead_letter: Sink penerima event yang gagal di-transform
+            chunk_size: Jumlah event per chunk yang dikirim ke satu worker
+            **options: Opsi BufferedStage (batch_size, flush_interval, max_buffer, max_in_flight)
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        options.setdefault("max_in_flight", max(2, self.workers))
+        options.setdefault("flush_interval", 0.01)
+        super().__init__(options.pop("name", "transform"), **options)
+        self.spec = spec
+        self.pipeline = build_pipeline(spec)
+        self.downstream = downstream or []
+        self.dead_letter = dead_letter
+        self.chunk_size = chunk_size
+        self.recent_errors: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self.stats.update({'transformed': 0, 'filtered': 0, 'transform_errors': 0})
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._next_seq = 0
+        self._emitted = 0
+        self._turn = asyncio.Condition()
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = self._create_executor()
+        if self.dead_letter:
+            self.dead_letter.start()
+        super().start()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: worker tidak mewarisi thread/koneksi (SQLite, event loop) dari parent
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.spec,),
+        )
+
+    async def _process_batch(self, batch: List[bytes]) -> bool:
+        # Nomor urut diambil sebelum await pertama, sesuai urutan dispatch
+        seq = self._next_seq
+        self._next_seq += 1
+        try:
+            outputs, filtered, errors = await self._transform(batch)
+        except Exception as e:
+            logger.error(f"Transform batch failed: {e}")
+            outputs, filtered = [], 0
+            errors = [(i, "pool", f"{type(e).__name__}: {e}") for i in range(len(batch))]
+            if isinstance(e, BrokenProcessPool) and self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = self._create_executor()
+        async with self._turn:
+            await self._turn.wait_for(lambda: self._emitted == seq)
+            try:
+                await self._emit(batch, outputs, filtered, errors)
+            finally:
+                self._emitted += 1
+                self._turn.notify_all()
+        # Hasil sudah diterima sink downstream (dan outbox-nya jika aktif)
+        return True
+
+    async def _transform(self, batch: List[bytes]):
+        chunks = [
+            b"\n".join(batch[i:i + self.chunk_size])
+            for i in range(0, len(batch), self.chunk_size)
+        ]
+        if self._executor is None:
+            results = [apply_pipeline(self.pipeline, chunk) for chunk in chunks]
+        else:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self._executor, _run_chunk, chunk) for chunk in chunks
+            ))
+
+        outputs: List[bytes] = []
+        filtered = 0
+        errors = []
+        for offset, (blob, chunk_filtered, chunk_errors) in zip(
+            range(0, len(batch), self.chunk_size), results
+        ):
+            if blob:
+                outputs.extend(blob.split(b"\n"))
+            filtered += chunk_filtered
+            errors.extend((offset + i, stage, message) for i, stage, message in chunk_errors)
+        return outputs, filtered, errors
+
+    async def _emit(self, batch, outputs, filtered, errors):
+        if outputs:
+            for sink in self.downstream:
+                # Sink yang penuh menahan emit (dan batch berikutnya) alih-alih drop
+                await sink.wait_for_room(len(outputs))
+                sink.offer(outputs)
+        if errors:
+            dead = []
+            for index, stage, message in errors:
+                record = {'transform': stage, 'error': message}
+                self.recent_errors.append(record)
+                dead.append(
+                    b'{"transform":' + json.dumps(stage).encode('utf-8')
+                    + b',"error":' + json.dumps(message).encode('utf-8')
+                    + b',"event":' + batch[index] + b'}'
+                )
+            logger.warning(f"{len(errors)} event(s) failed transform, last: {errors[-1][2]}")
+            if self.dead_letter:
+                await self.dead_letter.wait_for_room(len(dead))
+                self.dead_letter.offer(dead)
+        self.stats['transformed'] += len(outputs)
+        self.stats['filtered'] += filtered
+        self.stats['transform_errors'] += len(errors)
+        self.stats['acked'] += len(batch)
+        self.stats['batches'] += 1
+
+    async def _close(self):
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown)
+            self._executor = None
+        if self.dead_letter:
+            await self.dead_letter.stop()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get statistik transform stage.
+
+        Returns:
+            Dictionary: counter BufferedStage ditambah transformed, filtered,
+            transform_errors, workers, dan recent_errors
+        """
+        return {
+            **super().snapshot(),
+            'workers': self.workers,
+            'pipeline': [name for name, _ in self.pipeline],
+            'recent_errors': list(self.recent_errors),
+        }
+
+
+def create_transform_stage(downstream: List[BaseSink]) -> Optional[TransformStage]:
+    """
+    Buat TransformStage dari environment variable TRANSFORMS (kosong = nonaktif).
+
+    Args:
+        downstream: Sink penerima event hasil transform
+
+    Returns:
+        TransformStage atau None
+    """
+    spec = os.getenv("TRANSFORMS", "").strip()
+    if not spec:
+        return None
+    workers = os.getenv("TRANSFORM_WORKERS")
+    dead_letter_dir = os.getenv("TRANSFORM_DEAD_LETTER_DIR")
+    outbox_dir = os.getenv("SINK_OUTBOX_DIR") or None
+    dead_letter = FileSink(
+        dead_letter_dir, prefix="dead-letter", name="dead-letter", outbox_dir=outbox_dir
+    ) if dead_letter_dir else None
+    return TransformStage(
+        spec,
+        workers=int(workers) if workers else None,
+        downstream=downstream,
+        dead_letter=dead_letter,
+        batch_size=int(os.getenv("TRANSFORM_BATCH_SIZE", "1000")),
+        chunk_size=int(os.getenv("TRANSFORM_CHUNK_SIZE", "250")),
+        outbox_dir=outbox_dir,
+    )
@@ -0,0 +1,101 @@
+"""
+Stand-in lokal untuk server Redis (subset command set) yang dipakai
+untuk menguji RedisDedupStore tanpa server Redis sungguhan.
+"""
+import socketserver
+import threading
+
+
+class _RedisStubHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*", line
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2].decode("utf-8"))
+        return args
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, str):
+            data = value.encode("utf-8")
+            return b"$%d\r\n%s\r\n" % (len(data), data)
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(_RedisStubHandler._encode(v) for v in value)
+        raise TypeError(value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            cmd, rest = args[0].upper(), args[1:]
+            with self.server.lock:
+                if cmd == "PING":
+                    reply = b"+PONG\r\n"
+                elif cmd == "SELECT":
+                    reply = b"+OK\r\n"
+                elif cmd == "SADD":
+                    members = data.setdefault(rest[0], set())
+                    before = len(members)
+                    members.update(rest[1:])
+                    reply = self._encode(len(members) - before)
+                elif cmd == "SREM":
+                    members = data.get(rest[0], set())
+                    removed = len(members & set(rest[1:]))
+                    members.difference_update(rest[1:])
+                    if not members:
+                        data.pop(rest[0], None)
+                    reply = self._encode(removed)
+                elif cmd == "SISMEMBER":
+                    reply = self._encode(rest[1] in data.get(rest[0], ()))
+                elif cmd == "SMEMBERS":
+                    reply = self._encode(sorted(data.get(rest[0], ())))
+                elif cmd == "SCARD":
+                    reply = self._encode(len(data.get(rest[0], ())))
+                elif cmd == "INCR":
+                    data[rest[0]] = str(int(data.get(rest[0], "0")) + 1)
+                    reply = self._encode(int(data[rest[0]]))
+                elif cmd == "GET":
+                    reply = self._encode(data.get(rest[0]))
+                elif cmd == "DEL":
+                    reply = self._encode(sum(data.pop(k, None) is not None for k in rest))
+                else:
+                    reply = f"-ERR unknown command '{cmd}'\r\n".encode("utf-8")
+            self.wfile.write(reply)
+
+
+class RedisStub(socketserver.ThreadingTCPServer):
+    """Server RESP in-process; gunakan .url untuk koneksi"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _RedisStubHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,74 @@
+"""
+Tests untuk adaptive micro-batching di EventConsumer.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src.batching import AdaptiveBatcher
+from src.consumer import EventConsumer
+from src.dedup_memory import MemoryDedupStore
+from src.models import Event
+
+
+def _event(i: int, topic: str = "batch.test") -> Event:
+    return Event(
+        topic=topic,
+        event_id=f"evt-{i:05d}",
+        timestamp=datetime.utcnow().isoformat() + "Z",
+        source="batch-test",
+        payload={"index": i},
+    )
+
+
+def test_idle_traffic_gets_zero_linger():
+    batcher = AdaptiveBatcher(max_linger=0.01)
+    for _ in range(5):
+        batcher.record(2, 0.001, 5)
+    assert batcher.linger > 0
+    assert batcher.record(3, 0.001, 0) == "hold"
+
+    assert batcher.record(1, 0.001, 0) == "idle"
+    assert batcher.linger == 0
+
+
+def test_burst_grows_batch_size():
+    batcher = AdaptiveBatcher(initial_batch=4, max_batch=1000)
+    for _ in range(20):
+        batcher.record(batcher.batch_size, 0.001, 10_000)
+    assert batcher.batch_size == 1000
+    assert batcher.decisions["increase"] == 20
+
+
+def test_slow_commit_shrinks_batch_size():
+    batcher = AdaptiveBatcher(initial_batch=512, target_latency=0.01)
+    assert batcher.record(512, 0.05, 10_000) == "decrease"
+    assert batcher.batch_size == 256
+    # Setelah congestion, pertumbuhan menjadi additive (ssthresh tercapai)
+    batcher.record(256, 0.001, 10_000)
+    assert batcher.batch_size == 256 + 32
+
+    with pytest.raises(ValueError):
+        AdaptiveBatcher(min_batch=10, max_batch=5)
+
+
+@pytest.mark.asyncio
+async def test_consumer_batches_under_backlog():
+    store = MemoryDedupStore()
+    queue = asyncio.Queue()
+    consumer = EventConsumer(store, queue, AdaptiveBatcher(initial_batch=8, max_batch=512))
+
+    # Backlog sudah ada sebelum consumer berjalan
+    for i in range(3000):
+        await queue.put(_event(i % 2000))
+    await consumer.start()
+    await asyncio.wait_for(queue.join(), timeout=30)
+    await consumer.stop()
+
+    stats = consumer.get_stats()
+    assert stats['received'] == 3000
+    assert stats['unique_processed'] == 2000
+    assert stats['duplicate_dropped'] == 1000
+    assert stats['batching']['batch_size'] > 8
+    assert stats['batching']['batches'] < 3000
@@ -0,0 +1,229 @@
+"""
+Tests untuk capture traffic /publish dan replay harness.
+"""
+import asyncio
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import pytest
+
+from src.capture import CaptureWriter, read_capture
+from src.replay import load_capture, main as replay_main, percentile, replay
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _event(topic: str, event_id: str) -> dict:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "source": "capture-test",
+        "payload": {"message": f"msg {event_id}"},
+    }
+
+
+@pytest.fixture
+def start_server(tmp_path):
+    """Factory untuk menjalankan aggregator (memory backend) sebagai proses uvicorn"""
+    procs = []
+
+    def start() -> str:
+        port = _free_port()
+        env = dict(os.environ, DEDUP_BACKEND="memory", CAPTURE_DIR=str(tmp_path / "captures"))
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env,
+        ))
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            try:
+                if httpx.get(f"{url}/health").status_code == 200:
+                    return url
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        raise AssertionError("aggregator did not start")
+
+    yield start
+    for proc in procs:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def test_percentile():
+    values = sorted(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) == 0.0
+
+
+def test_capture_roundtrip_and_truncated_file(tmp_path):
+    path = str(tmp_path / "t.cap.gz")
+    truncated = tmp_path / "truncated.cap.gz"
+
+    async def run():
+        writer = CaptureWriter(path, flush_interval=0.01)
+        writer.start()
+        writer.record(b'{"a":1}')
+        await asyncio.sleep(0.05)
+        # Salinan file saat capture masih berjalan (simulasi proses mati mendadak)
+        truncated.write_bytes(Path(path).read_bytes())
+        writer.record(b'{"b":2}')
+        return await writer.stop()
+
+    summary = asyncio.run(run())
+    assert summary["requests"] == 2 and not summary["running"]
+
+    header, frames = read_capture(path)
+    frames = list(frames)
+    assert header["version"] == 1
+    assert [body for _, body in frames] == [b'{"a":1}', b'{"b":2}']
+    assert frames[1][0] - frames[0][0] >= 0.04
+
+    # Frame yang sudah di-flush tetap terbaca dari file yang tidak ditutup
+    _, frames = read_capture(str(truncated))
+    assert [body for _, body in frames] == [b'{"a":1}']
+
+    (tmp_path / "bad.cap.gz").write_bytes(gzip.compress(b"not a capture"))
+    with pytest.raises(ValueError):
+        read_capture(str(tmp_path / "bad.cap.gz"))
+
+
+def test_record_concurrent_with_background_flush(tmp_path):
+    """Frame yang di-record selama flush di thread lain tidak hilang"""
+    path = str(tmp_path / "c.cap.gz")
+
+    async def run():
+        writer = CaptureWriter(path, flush_interval=0.0005, compresslevel=1)
+        writer.start()
+        for i in range(5000):
+            writer.record(b'{"i":%d}' % i)
+            if i % 50 == 0:
+                await asyncio.sleep(0)
+        summary = await writer.stop()
+        assert writer._pending_bytes == 0
+        return summary
+
+    summary = asyncio.run(run())
+    _, frames = read_capture(path)
+    assert [body for _, body in frames] == [b'{"i":%d}' % i for i in range(5000)]
+    assert summary["requests"] == 5000
+
+
+def test_replay_counts_only_accepted_events_when_throttled(tmp_path):
+    """Event di rejected_indices (202 partial) dan request 429 tidak dihitung terkirim"""
+    path = str(tmp_path / "throttled.cap.gz")
+    bodies = [
+        {"events": [_event("t", "a"), _event("t", "b"), _event("t", "c")]},
+        {"events": [_event("t", "b"), _event("t", "d")]},
+        _event("t", "a"),
+        _event("t", "throttled"),
+    ]
+
+    async def record():
+        writer = CaptureWriter(path, flush_interval=0.01)
+        writer.start()
+        for body in bodies:
+            writer.record(json.dumps(body).encode())
+        await writer.stop()
+
+    asyncio.run(record())
+
+    seen = set()
+    stats = {"unique_processed": 0, "duplicate_dropped": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/stats":
+            return httpx.Response(200, json=stats)
+        if request.url.path == "/events":
+            topic = request.url.params["topic"]
+            return httpx.Response(200, json={"events": [{"event_id": e} for t, e in seen if t == topic]})
+        body = json.loads(request.content)
+        events = body.get("events", [body])
+        if events[0]["event_id"] == "throttled":
+            return httpx.Response(429, json={"rejected_indices": [0]})
+        # Event kedua setiap batch ditolak rate limiter
+        rejected = [1] if len(events) > 1 else []
+        for i, event in enumerate(events):
+            if i in rejected:
+                continue
+            key = (event["topic"], event["event_id"])
+            stats["duplicate_dropped" if key in seen else "unique_processed"] += 1
+            seen.add(key)
+        content = {"status": "partial", "rejected_indices": rejected} if rejected else {"status": "accepted"}
+        return httpx.Response(202, json=content)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://agg") as client:
+            return await replay(path, speed=None, wait=2, client=client)
+
+    report = asyncio.run(run())
+    assert report["errors"] == 0
+    assert report["throttled_requests"] == 1 and report["throttled_events"] == 3
+    assert report["requests_ok"] == 3
+    # Diterima: a, c (batch 1), b (batch 2), a (single) -> 3 unik, 1 duplikat
+    assert report["dedup"]["ok"], report["dedup"]
+    assert report["dedup"]["expected_unique"] == 3
+    assert report["dedup"]["expected_duplicates"] == 1
+
+
+def test_capture_and_replay_end_to_end(start_server, tmp_path, capsys):
+    source = start_server()
+    assert httpx.get(f"{source}/capture").json() == {"running": False}
+    assert httpx.post(f"{source}/capture/start", params={"name": "../x"}).status_code == 400
+    started = httpx.post(f"{source}/capture/start", params={"name": "burst"}).json()
+    assert started["running"]
+    assert httpx.post(f"{source}/capture/start").status_code == 409
+
+    # Pola traffic: burst batch besar, jeda, lalu single event dengan duplikat
+    unique = [_event(f"topic.{i % 3}", f"evt-{i:04d}") for i in range(300)]
+    for i in range(0, 200, 50):
+        assert httpx.post(f"{source}/publish", json={"events": unique[i:i + 50]}).status_code == 202
+    time.sleep(0.3)
+    for event in unique[200:] + unique[:40]:
+        assert httpx.post(f"{source}/publish", json=event).status_code == 202
+
+    summary = httpx.post(f"{source}/capture/stop").json()
+    assert summary["requests"] == 4 + 140
+    path = summary["path"]
+    assert path == str(tmp_path / "captures" / "burst.cap.gz")
+
+    _, frames, profile = load_capture(path)
+    assert profile["events"] == 340 and profile["unique_keys"] == 300
+    assert profile["duplicates"] == 40 and profile["max_batch"] == 50
+    assert profile["duration_s"] >= 0.3
+
+    # Replay 10x ke aggregator baru: dedup harus sama persis
+    target = start_server()
+    report = asyncio.run(replay(path, target, speed=10.0, wait=20))
+    assert report["errors"] == 0 and report["requests_ok"] == 144
+    assert report["dedup"]["ok"], report["dedup"]
+    assert report["dedup"]["unique_processed"] == 300
+    assert report["dedup"]["duplicate_dropped"] == 40
+    assert report["latency_ms"]["p50"] > 0
+    assert "schedule_lag_ms" in report
+
+    # Replay max speed kedua kali ke aggregator yang sama: semua terhitung duplikat
+    code = replay_main(["run", path, "--url", target, "--speed", "max", "--wait", "20"])
+    assert code == 1
+    assert "dedup: MISMATCH" in capsys.readouterr().out
+
+    assert replay_main(["inspect", path]) == 0
+    assert json.loads(capsys.readouterr().out)["unique_keys"] == 300
@@ -0,0 +1,280 @@
+"""
+Tests untuk cluster mode: consistent hashing, forwarding, dan key-range handoff.
+Test multi-node menjalankan beberapa proses uvicorn lokal pada port berbeda.
+"""
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.cluster import ClusterRouter, HashRing, PeerBackpressure, parse_members
+from src.dedup_memory import MemoryDedupStore
+from src.main import app
+from src.models import Event
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _event(topic: str, event_id: str) -> dict:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "source": "cluster-test",
+        "payload": {},
+    }
+
+
+def _wait_until(predicate, timeout: float = 20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_parse_members():
+    members = parse_members("a=http://127.0.0.1:8081, b=http://127.0.0.1:8082/")
+    assert members == {"a": "http://127.0.0.1:8081", "b": "http://127.0.0.1:8082"}
+
+    with pytest.raises(ValueError):
+        parse_members("a=http://x,broken")
+
+
+def test_hash_ring_deterministic_and_balanced():
+    """Owner sama untuk urutan node berbeda, distribusi key cukup merata"""
+    ring1 = HashRing(["a", "b", "c"])
+    ring2 = HashRing(["c", "a", "b"])
+    keys = [(f"topic.{i % 4}", f"evt-{i}") for i in range(6000)]
+
+    owners = Counter(ring1.owner(t, e) for t, e in keys)
+    assert all(ring1.owner(t, e) == ring2.owner(t, e) for t, e in keys)
+    assert set(owners) == {"a", "b", "c"}
+    assert min(owners.values()) > 6000 / 3 * 0.6
+
+
+def test_hash_ring_minimal_movement():
+    """Menambah node hanya memindahkan key ke node baru"""
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    keys = [("t", f"evt-{i}") for i in range(4000)]
+
+    moved = [(t, e) for t, e in keys if before.owner(t, e) != after.owner(t, e)]
+    assert all(after.owner(t, e) == "d" for t, e in moved)
+    assert len(moved) < len(keys) / 2
+
+
+async def test_forward_buffer_is_bounded_and_drops_are_counted():
+    """Peer down: buffer berhenti tumbuh, request ditolak utuh, drop saat shutdown tercatat"""
+    down = httpx.MockTransport(lambda request: httpx.Response(503))
+    router = ClusterRouter(
+        "a", {"a": "http://a", "b": "http://b"}, MemoryDedupStore(),
+        max_forward_buffer=20, transport=down,
+    )
+    await router.start()
+    events = [Event(**_event("t", f"evt-{i}")) for i in range(200)]
+    owned_by_b = sum(router.ring.owner("t", f"evt-{i}") == "b" for i in range(200))
+
+    forwarded = 0
+    with pytest.raises(PeerBackpressure) as excinfo:
+        for i in range(0, 200, 10):
+            local = router.route(events[i:i + 10])
+            forwarded += 10 - len(local)
+    assert excinfo.value.peer_id == "b"
+    link = router._links["b"]
+    assert link.pending == forwarded <= 20 < owned_by_b
+    # Request yang ditolak tidak meninggalkan event lokal maupun sebagian di buffer
+    assert router.stats["local"] == sum(
+        router.ring.owner("t", f"evt-{j}") == "a" for j in range(i)
+    )
+    assert link.stats["rejected"] > 0
+
+    await router.stop()
+    stats = router.get_stats()["peers"]["b"]
+    assert stats["dropped"] == forwarded and stats["pending"] == 0
+
+
+def test_publish_returns_503_when_peer_buffer_full(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.setenv("CLUSTER_NODE_ID", "a")
+    monkeypatch.setenv("CLUSTER_NODES", f"a=http://127.0.0.1:1,b=http://127.0.0.1:{_free_port()}")
+    monkeypatch.setenv("CLUSTER_FORWARD_BUFFER", "5")
+    with TestClient(app) as client:
+        statuses = [
+            client.post("/publish", json={"events": [_event("t", f"evt-{i}-{j}") for j in range(4)]})
+            for i in range(10)
+        ]
+        rejected = [r for r in statuses if r.status_code == 503]
+        assert rejected and rejected[0].headers["Retry-After"] == "1"
+        assert rejected[0].json()["peer"] == "b"
+        assert client.get("/cluster").json()["peers"]["b"]["pending"] <= 5
+
+
+async def test_new_owner_checks_previous_owner_until_handoff_complete():
+    """Duplikat yang masuk sebelum key sampai di pemilik baru tetap terdeteksi"""
+    processed_at_a = {("t", f"evt-{i}") for i in range(0, 100, 2)}
+    requests = []
+
+    def node_a(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(request.url.path)
+        if request.url.path == "/cluster/contains":
+            return httpx.Response(200, json={"processed": [tuple(k) in processed_at_a for k in body["keys"]]})
+        return httpx.Response(200, json={})
+
+    store = MemoryDedupStore()
+    router = ClusterRouter("b", {"a": "http://a", "b": "http://b"}, store, transport=httpx.MockTransport(node_a))
+    await router.start()
+    moving = [i for i in range(100) if router.ring.owner("t", f"evt-{i}") == "a"]
+    await router.update_members({"b": "http://b"}, propagate=False)
+    assert router.get_stats()["awaiting_handoff"] == ["a"]
+
+    # Handoff dari a belum sampai: key yang sudah diproses a ditandai processed di b
+    await router.check_moved([Event(**_event("t", f"evt-{i}")) for i in range(100)])
+    assert requests == ["/cluster/contains"]
+    assert router.stats["handoff_checked"] == len(moving)
+    assert store.contains_many([("t", f"evt-{i}") for i in moving]) == [i % 2 == 0 for i in moving]
+
+    await router.handoff_complete("a", ["b"])
+    assert router.get_stats()["awaiting_handoff"] == []
+    await router.check_moved([Event(**_event("t", "evt-1"))])
+    assert requests == ["/cluster/contains"]
+    await router.stop()
+
+
+async def test_check_moved_rejects_when_previous_owner_unreachable():
+    def down(request):
+        raise httpx.ConnectError("refused")
+
+    router = ClusterRouter("b", {"a": "http://a", "b": "http://b"}, MemoryDedupStore(),
+                           transport=httpx.MockTransport(down))
+    await router.start()
+    moved = next(i for i in range(100) if router.ring.owner("t", f"evt-{i}") == "a")
+    await router.update_members({"b": "http://b"}, propagate=False)
+    with pytest.raises(PeerBackpressure):
+        await router.check_moved([Event(**_event("t", f"evt-{moved}"))])
+    await router.stop()
+
+
+async def test_handoff_streams_chunks_and_announces_completion():
+    received = []
+
+    def node_b(request: httpx.Request) -> httpx.Response:
+        received.append(json.loads(request.content))
+        return httpx.Response(200, json={})
+
+    store = MemoryDedupStore()
+    store.mark_processed_many([(f"t{i % 3}", f"evt-{i}") for i in range(250)])
+    router = ClusterRouter("a", {"a": "http://a", "b": "http://b"}, store,
+                           handoff_batch_size=40, transport=httpx.MockTransport(node_b))
+    await router.start()
+    summary = await router.update_members({"b": "http://b"}, propagate=False)
+    await router.stop()
+
+    assert summary["handed_off"] == 250 and store.count_processed() == 0
+    chunks, complete = received[:-1], received[-1]
+    assert all(len(chunk["keys"]) <= 40 for chunk in chunks)
+    assert sum(len(chunk["keys"]) for chunk in chunks) == 250
+    assert complete == {"keys": [], "complete": True, "node": "a", "members": ["b"]}
+
+
+@pytest.fixture
+def cluster_nodes(tmp_path):
+    """Jalankan 3 node aggregator sebagai proses terpisah"""
+    ports = {name: _free_port() for name in ("a", "b", "c")}
+    members = ",".join(f"{n}=http://127.0.0.1:{p}" for n, p in ports.items())
+    procs = []
+    for name, port in ports.items():
+        env = dict(
+            os.environ,
+            CLUSTER_NODE_ID=name,
+            CLUSTER_NODES=members,
+            DEDUP_DB_PATH=str(tmp_path / f"{name}.db"),
+        )
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env,
+        ))
+
+    urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+
+    def ready():
+        try:
+            return all(httpx.get(f"{u}/health").status_code == 200 for u in urls.values())
+        except httpx.HTTPError:
+            return False
+
+    try:
+        assert _wait_until(ready), "cluster nodes did not start"
+        yield urls
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+
+def _count(url: str) -> int:
+    return httpx.get(f"{url}/events").json()["count"]
+
+
+def test_multi_node_dedup_and_handoff(cluster_nodes):
+    """Duplikat yang masuk ke node berbeda tetap diproses sekali di seluruh cluster"""
+    urls = cluster_nodes
+    unique = [_event(f"topic.{i % 4}", f"evt-{i:04d}") for i in range(300)]
+    all_events = unique + random.sample(unique, 150)
+    random.shuffle(all_events)
+
+    # Kirim batch ke node acak: duplikat hampir pasti masuk lewat node berbeda
+    for i in range(0, len(all_events), 25):
+        target = random.choice(list(urls.values()))
+        r = httpx.post(f"{target}/publish", json={"events": all_events[i:i + 25]})
+        assert r.status_code == 202
+
+    assert _wait_until(lambda: sum(_count(u) for u in urls.values()) == len(unique))
+    time.sleep(0.5)
+    stats = [httpx.get(f"{u}/stats").json() for u in urls.values()]
+    assert sum(s["unique_processed"] for s in stats) == len(unique)
+    assert sum(s["duplicate_dropped"] for s in stats) == 150
+
+    # Node c keluar: semua key-nya diserahkan ke a dan b
+    c_keys = _count(urls["c"])
+    r = httpx.post(
+        f"{urls['a']}/cluster/members",
+        json={"nodes": {"a": urls["a"], "b": urls["b"]}},
+        timeout=30,
+    )
+    assert r.status_code == 200
+    assert _wait_until(lambda: _count(urls["c"]) == 0)
+    assert _count(urls["a"]) + _count(urls["b"]) == len(unique)
+    assert httpx.get(f"{urls['b']}/cluster").json()["handoff_received"] + \
+        httpx.get(f"{urls['a']}/cluster").json()["handoff_received"] == c_keys
+
+    # Replay semua event ke cluster baru: tidak ada yang diproses ulang
+    before = sum(httpx.get(f"{u}/stats").json()["unique_processed"] for u in urls.values())
+    r = httpx.post(f"{urls['a']}/publish", json={"events": unique})
+    assert r.status_code == 202
+    assert _wait_until(
+        lambda: sum(httpx.get(f"{u}/stats").json()["received"] for u in (urls["a"], urls["b"]))
+        >= sum(s["received"] for s in stats[:2]) + len(unique)
+    )
+    after = sum(httpx.get(f"{u}/stats").json()["unique_processed"] for u in urls.values())
+    assert after == before
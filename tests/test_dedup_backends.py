@@ -0,0 +1,281 @@
+"""
+Conformance dan performance test suite untuk semua dedup backend.
+Setiap test dijalankan terhadap SQLite, in-memory, LSM, Redis (stand-in lokal),
+dan shared-memory tier di depan SQLite.
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from src.dedup_store import BaseDedupStore, DedupStore, create_dedup_store
+from src.dedup_memory import MemoryDedupStore
+from src.dedup_lsm import LSMDedupStore
+from src.dedup_redis import RedisDedupStore
+from src.dedup_shm import SharedFingerprintTable, SharedMemoryDedupStore
+from tests.redis_stub import RedisStub
+
+BACKENDS = ["sqlite", "memory", "lsm", "redis", "shm"]
+PERSISTENT_BACKENDS = ["sqlite", "lsm", "shm"]
+
+
+@pytest.fixture(scope="module")
+def redis_stub():
+    with RedisStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def make_store(tmp_path, redis_stub):
+    """Factory untuk membuat (atau membuka ulang) store per backend"""
+    opened = []
+
+    def make(backend: str, **kwargs) -> BaseDedupStore:
+        if backend == "sqlite":
+            store = DedupStore(str(tmp_path / "dedup.db"))
+        elif backend == "memory":
+            store = MemoryDedupStore()
+        elif backend == "lsm":
+            store = LSMDedupStore(str(tmp_path / "lsm"), **kwargs)
+        elif backend == "shm":
+            table = SharedFingerprintTable(
+                f"uts-test-{os.getpid()}-{tmp_path.name}", capacity=1 << 16, lock_dir=str(tmp_path)
+            )
+            store = SharedMemoryDedupStore(DedupStore(str(tmp_path / "dedup.db")), table)
+        else:
+            store = RedisDedupStore(redis_stub.url, prefix=f"test-{tmp_path.name}")
+        opened.append(store)
+        return store
+
+    yield make
+    for store in opened:
+        try:
+            store.close()
+        except Exception:
+            pass
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_single_key_semantics(make_store, backend):
+    store = make_store(backend)
+    assert store.is_duplicate("t", "e1") is False
+    assert store.mark_processed("t", "e1") is True
+    assert store.is_duplicate("t", "e1") is True
+    assert store.mark_processed("t", "e1") is False
+    # Topic isolation
+    assert store.mark_processed("other", "e1") is True
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batch_operations(make_store, backend):
+    store = make_store(backend)
+    keys = [("a", "1"), ("a", "2"), ("b", "1"), ("a", "1")]
+
+    assert store.mark_processed_many(keys) == [True, True, True, False]
+    assert store.mark_processed_many([("a", "2"), ("c", "9")]) == [False, True]
+    assert store.contains_many([("a", "1"), ("b", "2"), ("c", "9")]) == [True, False, True]
+    assert store.mark_processed_many([]) == []
+    assert store.contains_many([]) == []
+
+    assert store.count_processed() == 4
+    assert sorted(store.get_all_topics()) == ["a", "b", "c"]
+    assert sorted(store.get_events_by_topic("a")) == [("a", "1"), ("a", "2")]
+    assert len(store.get_events_by_topic()) == 4
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_remove_and_clear(make_store, backend):
+    store = make_store(backend)
+    store.mark_processed_many([("a", "1"), ("a", "2"), ("b", "1")])
+
+    assert store.remove_many([("a", "1"), ("b", "1"), ("b", "404")]) == 2
+    assert store.contains_many([("a", "1"), ("a", "2"), ("b", "1")]) == [False, True, False]
+    assert store.get_all_topics() == ["a"]
+    # Key yang dihapus dapat diproses ulang
+    assert store.mark_processed("a", "1") is True
+
+    store.clear()
+    assert store.count_processed() == 0
+    assert store.get_all_topics() == []
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_concurrent_mark_is_atomic(make_store, backend):
+    """Banyak thread me-mark key yang sama: setiap key hanya sekali True"""
+    store = make_store(backend)
+    keys = [("conc", f"e{i}") for i in range(500)]
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        marked = store.mark_processed_many(keys)
+        with lock:
+            results.append(marked)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [sum(col) for col in zip(*results)] == [1] * len(keys)
+    assert store.count_processed() == len(keys)
+
+
+@pytest.mark.parametrize("backend", PERSISTENT_BACKENDS)
+def test_persistence_after_reopen(make_store, backend):
+    store = make_store(backend)
+    store.mark_processed_many([("p", "1"), ("p", "2")])
+    store.remove_many([("p", "2")])
+    store.close()
+
+    reopened = make_store(backend)
+    assert reopened.contains_many([("p", "1"), ("p", "2")]) == [True, False]
+
+
+def test_lsm_flush_compaction_and_wal_recovery(make_store):
+    """Key tetap benar setelah flush ke segment, compaction, dan replay WAL"""
+    store = make_store("lsm", memtable_limit=100, max_segments=2)
+    keys = [(f"t{i % 3}", f"e{i}") for i in range(1000)]
+    assert all(store.mark_processed_many(keys))
+    store.remove_many(keys[:10])
+
+    assert store.contains_many(keys[:12]) == [False] * 10 + [True, True]
+    assert store.count_processed() == 990
+    store.compact()  # tunggu compaction background yang dipicu flush
+    assert len(list(store.path.glob("seg-*.sst"))) <= 3
+
+    # Simulasi crash: tanpa close(), data memtable harus pulih dari WAL
+    store.mark_processed("t0", "after-crash")
+    recovered = LSMDedupStore(str(store.path), memtable_limit=100, max_segments=2)
+    assert recovered.is_duplicate("t0", "after-crash") is True
+    assert recovered.count_processed() == 991
+    recovered.close()
+
+
+def test_lsm_compaction_runs_off_the_write_path(make_store, monkeypatch):
+    """Write yang memicu compaction tidak menunggu merge segment"""
+    store = make_store("lsm", memtable_limit=10, max_segments=2)
+    started = threading.Event()
+    release = threading.Event()
+    compact = store.compact
+
+    def slow_compact():
+        started.set()
+        release.wait(5)
+        compact()
+
+    monkeypatch.setattr(store, "compact", slow_compact)
+    for i in range(4):
+        store.mark_processed_many([("t", f"{i}-{j}") for j in range(10)])
+    assert started.wait(5)
+    # Compaction sedang tertahan, tetapi write dan read tetap berjalan
+    assert store.mark_processed_many([("t", "during")]) == [True]
+    assert store.count_processed() == 41
+
+    release.set()
+    compact()
+    assert len(store._segments) == 1
+    assert store.count_processed() == 41
+    assert store.get_events_by_topic("t")[-1] == ("t", "during")
+
+
+def test_lsm_topic_manifest_and_prefix_seek(make_store):
+    """Topic dan jumlah key dari manifest; filter topic membaca prefix topic saja"""
+    store = make_store("lsm", memtable_limit=200, max_segments=100)
+    topics = ["a", "ab", "b", "long.topic"]
+    store.mark_processed_many([(t, f"e{i:04d}") for i in range(300) for t in topics])
+    store.remove_many([("ab", f"e{i:04d}") for i in range(300)])
+    store.mark_processed_many([("b", "late")])
+
+    assert store.get_all_topics() == ["a", "b", "long.topic"]
+    assert store.count_processed() == 901
+    events = store.get_events_by_topic("b")
+    assert len(events) == 301 and all(t == "b" for t, _ in events)
+    assert store.get_events_by_topic("ab") == []
+    assert store.get_events_by_topic("missing") == []
+
+    # Reopen normal: manifest + replay WAL
+    store.close()
+    reopened = make_store("lsm", memtable_limit=200, max_segments=100)
+    assert reopened.get_all_topics() == ["a", "b", "long.topic"]
+    assert reopened.count_processed() == 901
+
+    # Manifest yang tidak cocok dengan segment di disk dihitung ulang dari scan
+    reopened.close()
+    (reopened.path / "topics.json").write_text('{"segments": [], "topics": {"x": 5}}')
+    rebuilt = make_store("lsm", memtable_limit=200, max_segments=100)
+    assert rebuilt.get_all_topics() == ["a", "b", "long.topic"]
+    assert rebuilt.count_processed() == 901
+
+    rebuilt.clear()
+    assert rebuilt.get_all_topics() == [] and rebuilt.count_processed() == 0
+
+
+def test_redis_reconnects_after_error_mid_pipeline(make_store, monkeypatch):
+    """Reply yang belum terbaca dari pipeline yang gagal tidak dibaca oleh batch berikutnya"""
+    store = make_store("redis")
+    client = store._client
+    read_reply = client._read_reply
+    calls = []
+
+    def flaky_read():
+        calls.append(1)
+        if len(calls) == 2:
+            raise TimeoutError("timed out")
+        return read_reply()
+
+    monkeypatch.setattr(client, "_read_reply", flaky_read)
+    with pytest.raises(TimeoutError):
+        store.mark_processed_many([("r", "1"), ("r", "2"), ("r", "3")])
+    assert client._sock is None
+    monkeypatch.setattr(client, "_read_reply", read_reply)
+
+    assert store.mark_processed_many([("r", "4"), ("r", "5")]) == [True, True]
+    assert store.contains_many([("r", "4"), ("r", "9")]) == [True, False]
+
+
+def test_create_dedup_store_from_config(tmp_path, monkeypatch, redis_stub):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    assert isinstance(create_dedup_store(), MemoryDedupStore)
+
+    store = create_dedup_store("sqlite", db_path=str(tmp_path / "x.db"))
+    assert isinstance(store, DedupStore)
+    store.close()
+
+    store = create_dedup_store("redis", url=redis_stub.url)
+    assert isinstance(store, RedisDedupStore)
+    store.close()
+
+    monkeypatch.setenv("DEDUP_SHM", "1")
+    monkeypatch.setenv("DEDUP_SHM_CAPACITY", "1024")
+    monkeypatch.setenv("DEDUP_SHM_LOCK_DIR", str(tmp_path))
+    store = create_dedup_store(shm_name=f"uts-test-{os.getpid()}-config")
+    assert isinstance(store, SharedMemoryDedupStore)
+    assert isinstance(store.backend, MemoryDedupStore)
+    assert store.snapshot()["capacity"] == 1024
+    store.close()
+
+    with pytest.raises(ValueError):
+        create_dedup_store("cassandra")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batch_throughput(make_store, backend):
+    """Performance: mark + lookup 20k key dalam batch 500"""
+    store = make_store(backend)
+    keys = [(f"topic.{i % 8}", f"evt-{i:06d}") for i in range(20_000)]
+
+    start = time.perf_counter()
+    for i in range(0, len(keys), 500):
+        store.mark_processed_many(keys[i:i + 500])
+    mark_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(keys), 500):
+        assert all(store.contains_many(keys[i:i + 500]))
+    lookup_elapsed = time.perf_counter() - start
+
+    assert mark_elapsed < 20
+    assert lookup_elapsed < 20
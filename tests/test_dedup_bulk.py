@@ -0,0 +1,127 @@
+"""
+Tests untuk bulk import/export dedup store (src/dedup_bulk.py).
+"""
+import csv
+import gzip
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from src.dedup_bulk import bulk_export, bulk_import, iter_keys, main
+from src.dedup_store import DedupStore
+
+
+def _write_ndjson_gz(path, records):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_import_ndjson_and_csv(tmp_path):
+    db = str(tmp_path / "dedup.db")
+    ndjson = tmp_path / "keys.ndjson.gz"
+    _write_ndjson_gz(ndjson, [
+        {"topic": "a", "event_id": f"e{i}", "payload": {"ignored": True}} for i in range(1000)
+    ] + [{"topic": "a", "event_id": "e1"}, {"broken": 1}])
+
+    csv_path = tmp_path / "keys.csv"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["event_id", "topic"])
+        writer.writerows([[f"e{i}", "b"] for i in range(500)])
+        writer.writerow(["e0", "a"])  # sudah ada dari NDJSON
+
+    stats = bulk_import(db, [str(ndjson), str(csv_path)], chunk_size=300, progress=None)
+    assert stats["read"] == 1502
+    assert stats["inserted"] == 1500
+    assert stats["duplicates"] == 2
+
+    store = DedupStore(db)
+    assert store.count_processed() == 1500
+    assert store.is_duplicate("b", "e499") is True
+    assert store.mark_processed("b", "e500") is True
+    store.close()
+
+    # Import ulang bersifat idempotent
+    assert bulk_import(db, [str(csv_path)], progress=None)["inserted"] == 0
+
+
+def test_import_rebuilds_deferred_indexes(tmp_path):
+    db = str(tmp_path / "dedup.db")
+    DedupStore(db).close()
+    with closing(sqlite3.connect(db)) as conn:
+        conn.execute("CREATE INDEX idx_processed_at ON processed_events(processed_at)")
+
+    path = tmp_path / "keys.ndjson.gz"
+    _write_ndjson_gz(path, [{"topic": "t", "event_id": str(i)} for i in range(100)])
+    bulk_import(db, [str(path)], progress=None)
+
+    with closing(sqlite3.connect(db)) as conn:
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        assert "idx_processed_at" in names
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_import_skips_non_string_keys(tmp_path):
+    db = str(tmp_path / "dedup.db")
+    path = tmp_path / "keys.ndjson.gz"
+    _write_ndjson_gz(path, [
+        {"topic": "t", "event_id": "ok"},
+        {"topic": "t", "event_id": 42},
+        {"topic": None, "event_id": "x"},
+        {"topic": "", "event_id": "x"},
+        {"topic": ["t"], "event_id": "x"},
+        {"topic": "t", "event_id": "late", "processed_at": 123},
+    ])
+    assert list(iter_keys(str(path))) == [("t", "ok", None)]
+    assert bulk_import(db, [str(path)], progress=None)["inserted"] == 1
+
+
+def test_failed_chunk_rolls_back_and_rebuilds_indexes(tmp_path):
+    db = str(tmp_path / "dedup.db")
+    DedupStore(db).close()
+    with closing(sqlite3.connect(db)) as conn:
+        conn.execute("CREATE INDEX idx_processed_at ON processed_events(processed_at)")
+        conn.execute(
+            "CREATE TRIGGER boom BEFORE INSERT ON processed_events WHEN NEW.event_id = 'boom' "
+            "BEGIN SELECT RAISE(ABORT, 'boom'); END"
+        )
+
+    path = tmp_path / "keys.ndjson.gz"
+    _write_ndjson_gz(path, [{"topic": "t", "event_id": f"e{i:03d}"} for i in range(100)] + [
+        {"topic": "t", "event_id": "boom"},
+    ])
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk_import(db, [str(path)], chunk_size=60, progress=None)
+
+    with closing(sqlite3.connect(db)) as conn:
+        # Chunk pertama sudah commit, chunk yang gagal tidak meninggalkan sisa
+        assert conn.execute("SELECT COUNT(*) FROM processed_events").fetchone()[0] == 60
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        assert "idx_processed_at" in names
+
+
+def test_export_roundtrip(tmp_path):
+    db = str(tmp_path / "dedup.db")
+    store = DedupStore(db)
+    store.mark_processed_many([("b", "2"), ("a", "1"), ("b", "1")])
+    store.close()
+
+    out = str(tmp_path / "out.ndjson.gz")
+    assert bulk_export(db, out, progress=None) == 3
+    keys = [(t, e) for t, e, _ in iter_keys(out)]
+    assert keys == [("a", "1"), ("b", "1"), ("b", "2")]
+
+    out_csv = str(tmp_path / "b.csv")
+    assert main(["export", "--db", db, "--output", out_csv, "--topic", "b"]) == 0
+    assert [(t, e) for t, e, p in iter_keys(out_csv)] == [("b", "1"), ("b", "2")]
+    assert all(p for _, _, p in iter_keys(out_csv))
+
+    # Export -> import ke database baru menghasilkan isi yang sama
+    db2 = str(tmp_path / "copy.db")
+    assert main(["import", "--db", db2, out]) == 0
+    copy = DedupStore(db2)
+    assert sorted(copy.get_events_by_topic()) == keys
+    copy.close()
@@ -0,0 +1,218 @@
+"""
+Test SharedMemoryDedupStore: claim atomik antar proses, eviction, lifecycle
+shared memory, dan throughput multi-proses di depan SQLite.
+"""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from src.dedup_shm import SharedFingerprintTable, SharedMemoryDedupStore, _shared_memory, fingerprint
+from src.dedup_store import DedupStore
+from src.dedup_memory import MemoryDedupStore
+
+CAPACITY = 1 << 16
+
+
+@pytest.fixture
+def table_name(tmp_path):
+    return f"uts-test-{os.getpid()}-{tmp_path.name}"
+
+
+def _claim_worker(name, lock_dir, fps, go, results):
+    table = SharedFingerprintTable(name, capacity=CAPACITY, lock_dir=lock_dir)
+    go.wait(30)
+    claimed = []
+    for i in range(0, len(fps), 200):
+        batch = fps[i:i + 200]
+        claimed.extend(fp for fp, claim in zip(batch, table.claim_many(batch)) if claim)
+    table.close()
+    results.put(claimed)
+
+
+def _store_worker(name, lock_dir, db_path, keys, results):
+    table = SharedFingerprintTable(name, capacity=CAPACITY, lock_dir=lock_dir)
+    store = SharedMemoryDedupStore(DedupStore(db_path), table)
+    start = time.perf_counter()
+    new = 0
+    for i in range(0, len(keys), 500):
+        new += sum(store.mark_processed_many(keys[i:i + 500]))
+    elapsed = time.perf_counter() - start
+    stats = store.snapshot()
+    store.close()
+    results.put((new, stats["backend_keys"], elapsed))
+
+
+def _crash_worker(name, lock_dir, fps):
+    table = SharedFingerprintTable(name, capacity=CAPACITY, lock_dir=lock_dir)
+    table.claim_many(fps)
+    # Simulasi crash: keluar tanpa close()
+    os._exit(0)
+
+
+def _run(target, args_list, go=None):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=target, args=(*args, results)) for args in args_list]
+    for p in procs:
+        p.start()
+    if go is not None:
+        # Semua worker sudah attach sebelum mulai meng-claim
+        time.sleep(1.0)
+        go.set()
+    collected = [results.get(timeout=60) for _ in procs]
+    for p in procs:
+        p.join(timeout=30)
+        assert p.exitcode == 0
+    return collected
+
+
+def test_cross_process_claims_are_exclusive(tmp_path, table_name):
+    """Empat proses meng-claim fingerprint yang sama: setiap fingerprint tepat satu kali"""
+    table = SharedFingerprintTable(table_name, capacity=CAPACITY, lock_dir=str(tmp_path))
+    fps = [fingerprint("t", f"e{i}") for i in range(20_000)]
+    # Urutan berbeda per proses agar claim benar-benar saling berebut
+    orders = [fps, fps[::-1], fps[5000:] + fps[:5000], fps[::2] + fps[1::2]]
+    go = multiprocessing.get_context("spawn").Event()
+    claimed = _run(_claim_worker, [(table_name, str(tmp_path), order, go) for order in orders], go)
+
+    all_claimed = [fp for part in claimed for fp in part]
+    assert len(all_claimed) == len(set(all_claimed)) == len(fps)
+    assert sum(1 for part in claimed if part) >= 2
+    assert table.snapshot()["occupied"] == len(fps)
+    assert all(table.contains_many(fps))
+    table.close()
+
+
+def test_multi_process_store_sends_only_new_keys_to_sqlite(tmp_path, table_name):
+    db_path = str(tmp_path / "dedup.db")
+    table = SharedFingerprintTable(table_name, capacity=CAPACITY, lock_dir=str(tmp_path))
+    unique = [(f"topic.{i % 4}", f"evt-{i}") for i in range(6000)]
+    # Setiap worker mengirim seluruh key (duplikat antar worker) plus duplikat internal
+    workloads = [unique[i * 1000:] + unique[:i * 1000] + unique[:500] for i in range(3)]
+    results = _run(_store_worker, [(table_name, str(tmp_path), db_path, keys) for keys in workloads])
+
+    assert sum(new for new, _, _ in results) == len(unique)
+    # SQLite hanya menerima key yang belum ada di tabel bersama
+    assert sum(backend_keys for _, backend_keys, _ in results) == len(unique)
+    backend = DedupStore(db_path)
+    assert backend.count_processed() == len(unique)
+    backend.close()
+    table.close()
+
+
+@pytest.mark.parametrize("eviction", ["fifo", "none"])
+def test_eviction_falls_back_to_backend(tmp_path, table_name, eviction):
+    table = SharedFingerprintTable(table_name, capacity=64, width=4, eviction=eviction, lock_dir=str(tmp_path))
+    store = SharedMemoryDedupStore(MemoryDedupStore(), table)
+    keys = [("t", f"e{i}") for i in range(1000)]
+
+    assert all(store.mark_processed_many(keys))
+    assert not any(store.mark_processed_many(keys))
+    assert all(store.contains_many(keys))
+    stats = store.snapshot()
+    assert stats["occupied"] == 64
+    assert stats["backend_duplicates"] > 0
+    if eviction == "fifo":
+        assert stats["evictions"] > 0 and stats["overflow"] == 0
+    else:
+        assert stats["evictions"] == 0 and stats["overflow"] > 0
+    store.close()
+
+
+def test_bucket_width_bounded_by_fifo_cursor(tmp_path, table_name):
+    for width in (0, 257):
+        with pytest.raises(ValueError):
+            SharedFingerprintTable(table_name, capacity=1024, width=width, lock_dir=str(tmp_path))
+    # Lebar maksimum: cursor uint8 berputar 0..255 tanpa overflow
+    table = SharedFingerprintTable(table_name, capacity=256, width=256, lock_dir=str(tmp_path))
+    assert all(table.claim_many(list(range(1, 601))))
+    assert table.snapshot()["evictions"] == 344
+    table.close()
+
+
+def test_backend_failure_releases_claims(tmp_path, table_name):
+    class FailingStore(MemoryDedupStore):
+        fail = True
+
+        def _mark_many(self, keys):
+            if self.fail:
+                raise RuntimeError("backend down")
+            return super()._mark_many(keys)
+
+    backend = FailingStore()
+    store = SharedMemoryDedupStore(backend, SharedFingerprintTable(table_name, capacity=1024, lock_dir=str(tmp_path)))
+    with pytest.raises(RuntimeError):
+        store.mark_processed_many([("t", "1"), ("t", "2")])
+    backend.fail = False
+    assert store.mark_processed_many([("t", "1"), ("t", "2")]) == [True, True]
+    store.close()
+
+
+def test_pending_claim_is_not_reported_as_duplicate(tmp_path, table_name):
+    """Worker lain yang menemukan claim pending bertanya ke backend, bukan men-drop event"""
+    lock_dir = str(tmp_path)
+    table = SharedFingerprintTable(table_name, capacity=1024, lock_dir=lock_dir)
+    assert table.claim_many([1, 2], pending=True) == [True, True]
+    assert table.contains_many([1, 2]) == [False, False]
+    assert table.claim_many([1, 2]) == [None, None]
+    table.confirm_many([1])
+    assert table.contains_many([1, 2]) == [True, False]
+    assert table.claim_many([1]) == [False]
+    assert table.remove_many([1, 2]) == 2
+    table.close()
+
+    keys = [("t", "1"), ("t", "2")]
+    seen_by_other = []
+
+    class FailingStore(MemoryDedupStore):
+        fail = True
+
+        def _mark_many(self, keys):
+            if self.fail:
+                # Worker lain memproses key yang sama selagi claim masih pending
+                seen_by_other.extend(other.mark_processed_many(keys))
+                raise RuntimeError("backend down")
+            return super()._mark_many(keys)
+
+    backend = FailingStore()
+    store = SharedMemoryDedupStore(backend, SharedFingerprintTable(table_name, capacity=1024, lock_dir=lock_dir))
+    other = SharedMemoryDedupStore(MemoryDedupStore(), SharedFingerprintTable(table_name, capacity=1024, lock_dir=lock_dir))
+    with pytest.raises(RuntimeError):
+        store.mark_processed_many(keys)
+    assert seen_by_other == [True, True]
+    assert other.stats["table_hits"] == 0
+    backend.fail = False
+    assert store.mark_processed_many(keys) == [True, True]
+    assert other.mark_processed_many(keys) == [False, False]
+    assert other.stats["table_hits"] == 2
+    other.close()
+    store.close()
+
+
+def test_lifecycle_unlink_and_stale_table(tmp_path, table_name):
+    lock_dir = str(tmp_path)
+    first = SharedFingerprintTable(table_name, capacity=1024, lock_dir=lock_dir)
+    second = SharedFingerprintTable(table_name, capacity=1024, lock_dir=lock_dir)
+    first.claim_many([1, 2, 3])
+    assert second.contains_many([1, 2, 3]) == [True] * 3
+    with pytest.raises(ValueError):
+        SharedFingerprintTable(table_name, capacity=4096, lock_dir=lock_dir)
+    first.close()
+    assert second.contains_many([1]) == [True]
+    second.close()
+    with pytest.raises(FileNotFoundError):
+        _shared_memory(table_name)
+
+    # Proses yang crash meninggalkan shared memory; pembuka berikutnya membuat tabel baru
+    ctx = multiprocessing.get_context("spawn")
+    proc = ctx.Process(target=_crash_worker, args=(table_name, lock_dir, [7, 8, 9]))
+    proc.start()
+    proc.join(timeout=30)
+    leftover = _shared_memory(table_name)
+    leftover.close()
+    fresh = SharedFingerprintTable(table_name, capacity=1024, lock_dir=lock_dir)
+    assert fresh.snapshot()["occupied"] == 0
+    assert fresh.contains_many([7, 8, 9]) == [False] * 3
+    fresh.close()
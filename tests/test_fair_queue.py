@@ -0,0 +1,119 @@
+"""
+Tests untuk FairEventQueue: priority class, deficit round robin, dan metrik per topic.
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from src.consumer import EventConsumer
+from src.dedup_memory import MemoryDedupStore
+from src.fair_queue import FairEventQueue, parse_topic_map
+from src.models import Event
+
+
+def _event(topic: str, i: int) -> Event:
+    return Event(
+        topic=topic,
+        event_id=f"{topic}-{i}",
+        timestamp=datetime.utcnow().isoformat() + "Z",
+        source="fair-test",
+    )
+
+
+def _drain(queue: FairEventQueue, n: int) -> list:
+    return [queue.get_nowait() for _ in range(n)]
+
+
+def test_parse_topic_map():
+    assert parse_topic_map("error.reports=0, system.metrics=2", int) == {
+        "error.reports": 0, "system.metrics": 2
+    }
+    assert parse_topic_map(None, float) == {}
+    with pytest.raises(ValueError):
+        parse_topic_map("broken", int)
+
+
+def test_flood_does_not_starve_other_topics():
+    queue = FairEventQueue(quantum=4)
+    for i in range(1000):
+        queue.put_nowait(_event("system.metrics", i))
+    for i in range(10):
+        queue.put_nowait(_event("user.events", i))
+
+    first = Counter(e.topic for e in _drain(queue, 24))
+    assert first["user.events"] == 10
+
+
+def test_priority_class_served_first():
+    queue = FairEventQueue(priorities={"error.reports": 0})
+    for i in range(50):
+        queue.put_nowait(_event("system.metrics", i))
+    for i in range(5):
+        queue.put_nowait(_event("error.reports", i))
+
+    assert [e.topic for e in _drain(queue, 5)] == ["error.reports"] * 5
+    assert queue.qsize() == 50
+
+
+def test_weights_and_per_topic_order():
+    queue = FairEventQueue(weights={"a": 3.0, "b": 1.0}, quantum=2)
+    for i in range(400):
+        queue.put_nowait(_event("a", i))
+        queue.put_nowait(_event("b", i))
+
+    served = _drain(queue, 400)
+    counts = Counter(e.topic for e in served)
+    assert counts["a"] == 300 and counts["b"] == 100
+    # Urutan FIFO tetap terjaga di dalam satu topic
+    a_ids = [e.event_id for e in served if e.topic == "a"]
+    assert a_ids == [f"a-{i}" for i in range(300)]
+
+    with pytest.raises(ValueError):
+        FairEventQueue(weights={"a": 0})
+
+
+@pytest.mark.asyncio
+async def test_asyncio_queue_compat_and_metrics():
+    queue = FairEventQueue()
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0.01)
+    await queue.put(_event("t", 1))
+    assert (await asyncio.wait_for(getter, 1)).event_id == "t-1"
+    await queue.put(_event("t", 2))
+
+    snapshot = queue.snapshot()["t"]
+    assert snapshot["depth"] == 1
+    assert snapshot["enqueued"] == 2 and snapshot["dequeued"] == 1
+
+    queue.task_done()
+    queue.get_nowait()
+    queue.task_done()
+    await asyncio.wait_for(queue.join(), 1)
+    with pytest.raises(ValueError):
+        queue.task_done()
+
+
+@pytest.mark.asyncio
+async def test_consumer_with_fair_queue_keeps_stats():
+    queue = FairEventQueue(priorities={"error.reports": 0})
+    consumer = EventConsumer(MemoryDedupStore(), queue)
+    for i in range(200):
+        await queue.put(_event("system.metrics", i))
+    for i in range(20):
+        await queue.put(_event("error.reports", i % 10))
+
+    await consumer.start()
+    await asyncio.wait_for(queue.join(), 10)
+    await consumer.stop()
+
+    stats = consumer.get_stats()
+    assert stats['received'] == 220
+    assert stats['unique_processed'] == 210
+    assert stats['duplicate_dropped'] == 10
+    assert stats['queues']['error.reports']['dequeued'] == 20
+    assert stats['queues']['system.metrics']['depth'] == 0
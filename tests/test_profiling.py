@@ -0,0 +1,110 @@
+"""
+Tests untuk on-demand profiling dan event-loop lag monitor.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.profiling import LoopMonitor, SamplingProfiler, profile_cprofile
+
+
+def _busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_captures_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_worker, args=(stop,), name="busy")
+    worker.start()
+    try:
+        counts = SamplingProfiler(interval=0.001).run(0.2)
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = [stack for stack in counts if stack.startswith("thread:busy;")]
+    assert busy
+    assert any("_busy_worker" in stack for stack in busy)
+
+
+def test_cprofile_collapsed_edges():
+    async def run():
+        async def spin():
+            while True:
+                sum(range(1000))
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(spin())
+        try:
+            return await profile_cprofile(0.1)
+        finally:
+            task.cancel()
+
+    output = asyncio.run(run())
+    lines = output.strip().splitlines()
+    assert lines
+    assert any("spin" in line for line in lines)
+    # Format: "<stack> <weight>"
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_loop_monitor_records_blocking_coroutine():
+    async def blocking_handler():
+        time.sleep(0.3)
+
+    async def run():
+        monitor = LoopMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(blocking_handler())
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert not snapshot["running"]
+    assert snapshot["max_lag_ms"] >= 200
+    assert len(snapshot["slow_callbacks"]) == 1
+
+    slow = snapshot["slow_callbacks"][0]
+    assert slow["task"].endswith("blocking_handler")
+    assert any("blocking_handler" in frame for frame in slow["stack"])
+    assert slow["blocked_ms"] >= 200
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.delenv("LOOP_MONITOR", raising=False)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_profile_endpoint(api):
+    response = api.get("/debug/profile", params={"seconds": 0.2, "interval_ms": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "thread:" in response.text
+
+    response = api.get("/debug/profile", params={"seconds": 0.1, "mode": "cprofile"})
+    assert response.status_code == 200
+
+    assert api.get("/debug/profile", params={"seconds": 0}).status_code == 422
+    assert api.get("/debug/profile", params={"seconds": 1, "mode": "perf"}).status_code == 422
+
+
+def test_loop_monitor_endpoints(api):
+    # Default: monitor tidak dibuat sama sekali
+    assert api.get("/debug/loop").json() == {"running": False}
+
+    assert api.post("/debug/loop", params={"enabled": "true"}).json() == {"running": True}
+    time.sleep(0.2)
+    snapshot = api.get("/debug/loop").json()
+    assert snapshot["running"] and snapshot["ticks"] > 0
+
+    assert api.post("/debug/loop", params={"enabled": "false"}).json() == {"running": False}
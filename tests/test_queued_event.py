@@ -0,0 +1,80 @@
+"""
+Tests untuk representasi compact event di queue (QueuedEvent).
+"""
+import asyncio
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from src.consumer import EventConsumer
+from src.dedup_memory import MemoryDedupStore
+from src.fair_queue import FairEventQueue
+from src.models import Event, QueuedEvent
+
+
+def _event(i: int, payload=None) -> Event:
+    # Topic/source dibangun saat runtime (bukan literal yang di-intern compiler),
+    # agar test interning tidak lolos hanya karena dua event berbagi literal yang sama
+    return Event(
+        topic="".join(["queue", ".test"]),
+        event_id=f"evt-{i:05d}",
+        timestamp=datetime.utcnow().isoformat() + "Z",
+        source="".join(["queue", "-test"]),
+        payload={"message": f"log {i}", "value": i} if payload is None else payload,
+    )
+
+
+def test_queued_event_roundtrip_and_lazy_payload():
+    event = _event(1)
+    queued = QueuedEvent.from_event(event)
+
+    assert isinstance(queued.payload_raw, bytes)
+    assert queued.payload == {"message": "log 1", "value": 1}
+    assert queued.model_dump() == event.model_dump()
+    assert not hasattr(queued, "__dict__")
+
+    empty = QueuedEvent.from_event(_event(2, payload={}))
+    assert empty.payload_raw is None
+    assert empty.payload == {}
+
+
+def test_topic_and_source_are_interned():
+    a = QueuedEvent.from_event(_event(1))
+    b = QueuedEvent.from_event(_event(2))
+    assert a.topic is b.topic
+    assert a.source is b.source
+
+
+def test_queued_event_uses_less_memory():
+    events = [_event(i) for i in range(2000)]
+
+    tracemalloc.start()
+    kept = [_event(i) for i in range(2000)]
+    full, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+
+    tracemalloc.start()
+    compact = [QueuedEvent.from_event(e) for e in events]
+    small, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(compact) == 2000
+    assert small * 2 < full
+
+
+@pytest.mark.asyncio
+async def test_consumer_processes_queued_events():
+    queue = FairEventQueue()
+    consumer = EventConsumer(MemoryDedupStore(), queue)
+    for i in list(range(50)) + list(range(10)):
+        await queue.put(QueuedEvent.from_event(_event(i)))
+
+    await consumer.start()
+    await asyncio.wait_for(queue.join(), 10)
+    await consumer.stop()
+
+    stats = consumer.get_stats()
+    assert stats['unique_processed'] == 50
+    assert stats['duplicate_dropped'] == 10
@@ -0,0 +1,221 @@
+"""
+Tests untuk RateLimiter: token bucket per source/topic, partial admission,
+Retry-After, idle eviction, dan integrasi /publish.
+"""
+import socket
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.cluster import HashRing
+from src.main import app
+from src.rate_limit import Quota, RateLimiter, create_rate_limiter, parse_quota, retry_after_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_parse_quota():
+    assert parse_quota("100") == Quota(100.0, 100.0)
+    assert parse_quota("2.5:10") == Quota(2.5, 10.0)
+    with pytest.raises(ValueError):
+        parse_quota("0")
+    assert retry_after_header(0.2) == "1"
+    assert retry_after_header(2.01) == "3"
+
+
+def test_partial_admission_and_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(source_quota=Quota(10, 5), clock=clock)
+
+    result = limiter.admit([("noisy", "t")] * 8)
+    assert result.admitted == [0, 1, 2, 3, 4]
+    assert result.rejected == [5, 6, 7]
+    # 3 token dengan rate 10/s
+    assert result.retry_after == pytest.approx(0.3)
+
+    # Source lain tidak terpengaruh
+    assert limiter.admit([("quiet", "t")] * 5).rejected == []
+
+    clock.now += 0.1
+    result = limiter.admit([("noisy", "t"), ("noisy", "t")])
+    assert result.admitted == [0] and result.rejected == [1]
+    assert result.retry_after == pytest.approx(0.1)
+
+    clock.now += 10
+    assert limiter.admit([("noisy", "t")] * 5).rejected == []
+
+    metrics = {m["source"]: m for m in limiter.source_metrics()}
+    assert metrics["noisy"]["throttled"] == 4
+    assert metrics["noisy"]["admitted"] == 11
+    assert metrics["quiet"]["throttled"] == 0
+    assert limiter.snapshot()["top_throttled"][0]["source"] == "noisy"
+    assert limiter.stats["throttled"] == 4
+
+
+def test_topic_quota_and_overrides():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        source_quota=Quota(100, 100),
+        topic_quota=Quota(1, 3),
+        source_overrides={"vip": Quota(1000, 1000)},
+        topic_overrides={"bulk": Quota(2, 2)},
+        clock=clock,
+    )
+    result = limiter.admit([("a", "orders"), ("b", "orders"), ("a", "bulk"), ("b", "orders"),
+                            ("a", "bulk"), ("a", "bulk"), ("c", "orders")])
+    assert result.admitted == [0, 1, 2, 3, 4]
+    assert result.rejected == [5, 6]
+    # orders: butuh 1 token @1/s; bulk: butuh 1 token @2/s
+    assert result.retry_after == pytest.approx(1.0)
+    assert limiter.sources.get("vip", clock.now).quota == Quota(1000, 1000)
+
+
+def test_untracked_dimension_is_unlimited():
+    limiter = RateLimiter(topic_overrides={"bulk": Quota(1, 1)}, clock=FakeClock())
+    assert limiter.admit([("a", "other")] * 1000).rejected == []
+    assert limiter.admit([("a", "bulk")] * 3).rejected == [1, 2]
+    assert len(limiter.topics.buckets) == 1
+    assert limiter.source_metrics() == []
+
+
+def test_idle_buckets_are_evicted_after_refill():
+    clock = FakeClock()
+    limiter = RateLimiter(source_quota=Quota(1, 100), idle_ttl=10, clock=clock)
+    limiter.admit([("drained", "t")] * 100)
+    for i in range(1000):
+        limiter.admit([(f"src-{i}", "t")])
+    assert len(limiter.sources.buckets) == 1001
+
+    clock.now += 11
+    limiter.admit([])
+    # Bucket yang baru terisi sebagian tetap disimpan agar eviction tidak memberi token gratis
+    assert list(limiter.sources.buckets) == ["drained"]
+    assert limiter.admit([("drained", "t")] * 12).rejected == [11]
+    clock.now += 200
+    limiter.admit([])
+    assert len(limiter.sources.buckets) == 0
+    assert limiter.snapshot()["evicted_buckets"] == 1001
+
+
+def test_refund_returns_tokens_up_to_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(source_quota=Quota(1, 5), topic_quota=Quota(1, 3), clock=clock)
+    assert limiter.admit([("s", "t")] * 3).rejected == []
+    assert limiter.admit([("s", "t")]).rejected == [0]
+
+    limiter.refund([("s", "t")] * 2)
+    assert limiter.admit([("s", "t")] * 3).admitted == [0, 1]
+    assert limiter.stats["admitted"] == 3 and limiter.stats["refunded"] == 2
+
+    limiter.refund([("s", "t")] * 10)
+    assert limiter.sources.buckets["s"].tokens == 5
+    assert limiter.topics.buckets["t"].tokens == 3
+
+
+def test_check_throughput():
+    """Performance: biaya per check konstan meski jumlah source besar"""
+    limiter = RateLimiter(source_quota=Quota(1000, 1000), topic_quota=Quota(10_000, 10_000))
+    keys = [(f"source-{i % 50_000}", f"topic.{i % 16}") for i in range(200_000)]
+    start = time.perf_counter()
+    for i in range(0, len(keys), 500):
+        limiter.admit(keys[i:i + 500])
+    elapsed = time.perf_counter() - start
+    assert elapsed < 10
+
+
+def test_create_rate_limiter_from_config(monkeypatch):
+    assert create_rate_limiter() is None
+    monkeypatch.setenv("RATE_LIMIT_SOURCE", "50:100")
+    monkeypatch.setenv("RATE_LIMIT_TOPIC_OVERRIDES", "bulk=5:10")
+    limiter = create_rate_limiter()
+    assert limiter.sources.default == Quota(50, 100)
+    assert limiter.topics.default is None
+    assert limiter.topics.overrides == {"bulk": Quota(5, 10)}
+
+
+def _events(source: str, n: int, offset: int = 0) -> list:
+    return [
+        {
+            "topic": "rl.test", "event_id": f"{source}-{offset + i}",
+            "timestamp": datetime.utcnow().isoformat() + "Z", "source": source,
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.setenv("RATE_LIMIT_SOURCE", "5:5")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_publish_rate_limited(api):
+    response = api.post("/publish", json={"events": _events("noisy", 8)})
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "partial"
+    assert body["count"] == 5
+    assert body["rejected_indices"] == [5, 6, 7]
+    assert 0.5 < body["retry_after"] <= 0.6
+    assert response.headers["Retry-After"] == "1"
+
+    response = api.post("/publish", json=_events("noisy", 1, offset=100)[0])
+    assert response.status_code == 429
+    assert response.json()["rejected"] == 1
+    assert response.headers["Retry-After"] == "1"
+
+    assert api.post("/publish", json={"events": _events("quiet", 5)}).json()["status"] == "accepted"
+
+    for _ in range(100):
+        stats = api.get("/stats").json()
+        if stats["unique_processed"] == 10:
+            break
+        time.sleep(0.02)
+    assert stats["unique_processed"] == 10
+    assert stats["rate_limit"]["throttled"] == 4
+    assert stats["rate_limit"]["top_throttled"][0]["source"] == "noisy"
+
+    sources = {m["source"]: m for m in api.get("/rate-limits").json()["sources"]}
+    assert sources["noisy"]["throttled"] == 4
+    assert sources["quiet"]["admitted"] == 5
+
+
+def test_rate_limits_disabled(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    with TestClient(app) as client:
+        assert client.get("/rate-limits").status_code == 404
+        assert client.post("/publish", json={"events": _events("any", 50)}).json()["count"] == 50
+
+
+def test_publish_refunds_tokens_when_peer_rejects(monkeypatch):
+    """503 karena buffer peer penuh tidak memakan quota client"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.setenv("RATE_LIMIT_SOURCE", "0.01:6")
+    monkeypatch.setenv("CLUSTER_NODE_ID", "a")
+    monkeypatch.setenv("CLUSTER_NODES", f"a=http://127.0.0.1:1,b=http://127.0.0.1:{port}")
+    monkeypatch.setenv("CLUSTER_FORWARD_BUFFER", "0")
+    ring = HashRing(["a", "b"])
+    events = _events("client", 40)
+    local = [e for e in events if ring.owner(e["topic"], e["event_id"]) == "a"]
+    remote = [e for e in events if ring.owner(e["topic"], e["event_id"]) == "b"]
+
+    with TestClient(app) as client:
+        for _ in range(3):
+            response = client.post("/publish", json={"events": local[:3] + remote[:3]})
+            assert response.status_code == 503
+        response = client.post("/publish", json={"events": local[:6]})
+        assert response.status_code == 202 and response.json()["status"] == "accepted"
+        assert client.get("/stats").json()["rate_limit"]["refunded"] == 18
@@ -0,0 +1,183 @@
+"""
+Tests untuk versioned response cache (/events, /stats) dan ETag.
+"""
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.dedup_memory import MemoryDedupStore
+from src.dedup_redis import RedisDedupStore
+from src.dedup_store import DedupStore
+from src.main import app
+from src.response_cache import ResponseCache
+from tests.redis_stub import RedisStub
+
+
+def test_tag_change_invalidates_entry():
+    cache = ResponseCache()
+    cache.put("k", 1, b'{"a":1}')
+    assert cache.get("k", 1).body == b'{"a":1}'
+    assert cache.get("k", 2) is None
+
+    stats = cache.snapshot()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["stale"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["entries"] == 0
+
+
+def test_lru_eviction_by_bytes_and_ttl():
+    cache = ResponseCache(max_bytes=25)
+    cache.put("a", 0, b"x" * 10)
+    cache.put("b", 0, b"x" * 10)
+    cache.get("a", 0)                     # a menjadi most recently used
+    cache.put("c", 0, b"x" * 10)          # b di-evict
+
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) is not None
+    assert cache.snapshot()["bytes"] == 20
+    assert cache.snapshot()["evictions"] == 1
+
+    # Body lebih besar dari kapasitas tidak disimpan
+    entry = cache.put("big", 0, b"x" * 100)
+    assert entry.etag and cache.get("big", 0) is None
+
+    cache.put("ttl", 0, b"{}", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("ttl", 0) is None
+
+
+def test_etag_matching():
+    entry = ResponseCache().put("k", 0, b"{}")
+    assert entry.matches(entry.etag)
+    assert entry.matches(f'"other", {entry.etag}')
+    assert entry.matches(f"W/{entry.etag}")
+    assert entry.matches("*")
+    assert not entry.matches('"other"')
+    assert not entry.matches(None)
+
+
+def test_store_writes_bump_topic_versions():
+    store = MemoryDedupStore()
+    assert store.versions.get("a") == 0
+
+    store.mark_processed_many([("a", "1"), ("b", "1")])
+    assert store.versions.get("a") == 1 and store.versions.get("b") == 1
+    version = store.versions.get()
+
+    # Duplicate tidak mengubah versi
+    store.mark_processed("a", "1")
+    assert store.versions.get() == version
+
+    store.remove_many([("b", "1")])
+    assert store.versions.get("b") == 2 and store.versions.get("a") == 1
+
+
+def test_data_version_sees_writes_from_other_processes(tmp_path):
+    """Write lewat koneksi/instance lain tidak menaikkan WriteVersions lokal, tetapi data_version"""
+    db_path = str(tmp_path / "shared.db")
+    local, other = DedupStore(db_path), DedupStore(db_path)
+    before = local.data_version()
+    local.mark_processed_many([("a", "1")])
+    other.mark_processed_many([("a", "2")])
+    assert local.data_version() != before
+    local.close()
+    other.close()
+
+    with RedisStub() as server:
+        local, other = RedisDedupStore(server.url), RedisDedupStore(server.url)
+        before = local.data_version()
+        other.mark_processed_many([("a", "1")])
+        assert local.versions.get("a") == 0
+        assert local.data_version() != before
+        local.close()
+        other.close()
+
+    assert MemoryDedupStore().data_version() is None
+
+
+def test_events_cache_invalidated_by_other_worker(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "dedup.db")
+    monkeypatch.setenv("DEDUP_BACKEND", "sqlite")
+    monkeypatch.setenv("DEDUP_DB_PATH", db_path)
+    with TestClient(app) as client:
+        _publish(client, "shared", "1")
+        _wait_for_count(client, "shared", 1)
+        etag = client.get("/events", params={"topic": "shared"}).headers["ETag"]
+        assert client.get("/events", params={"topic": "shared"}).headers["X-Cache"] == "HIT"
+
+        # Worker lain (koneksi terpisah ke database yang sama) menulis event baru
+        worker = DedupStore(db_path)
+        worker.mark_processed_many([("shared", "2")])
+        worker.close()
+
+        response = client.get("/events", params={"topic": "shared"}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.json()["count"] == 2
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.setenv("STATS_CACHE_TTL_MS", "60000")
+    with TestClient(app) as client:
+        yield client
+
+
+def _publish(client, topic, event_id):
+    event = {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "source": "cache-test",
+    }
+    assert client.post("/publish", json=event).status_code == 202
+
+
+def _wait_for_count(client, topic, expected):
+    for _ in range(100):
+        if client.get("/events", params={"topic": topic}).json()["count"] == expected:
+            return
+        time.sleep(0.02)
+    raise AssertionError(f"topic {topic} did not reach {expected} events")
+
+
+def test_events_endpoint_cache_and_etag(api):
+    _publish(api, "cache.a", "1")
+    _wait_for_count(api, "cache.a", 1)
+
+    first = api.get("/events", params={"topic": "cache.a"})
+    second = api.get("/events", params={"topic": "cache.a"})
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.content == first.content
+    etag = second.headers["ETag"]
+
+    not_modified = api.get("/events", params={"topic": "cache.a"}, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # Write ke topic lain tidak meng-invalidate cache topic ini
+    _publish(api, "cache.b", "1")
+    _wait_for_count(api, "cache.b", 1)
+    assert api.get("/events", params={"topic": "cache.a"}).headers["X-Cache"] == "HIT"
+
+    # Write ke topic ini meng-invalidate cache dan mengubah ETag
+    _publish(api, "cache.a", "2")
+    _wait_for_count(api, "cache.a", 2)
+    changed = api.get("/events", params={"topic": "cache.a"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_stats_endpoint_cache(api):
+    first = api.get("/stats")
+    assert first.status_code == 200
+    assert api.get("/stats").headers["X-Cache"] == "HIT"
+
+    _publish(api, "cache.stats", "1")
+    _wait_for_count(api, "cache.stats", 1)
+    stats = api.get("/stats").json()
+    assert stats["received"] == 1
+    assert stats["cache"]["hits"] >= 1
@@ -0,0 +1,287 @@
+"""
+Tests untuk RollupStore: agregasi per tier, pemilihan tier, retention,
+persistence, dan endpoint /rollups.
+"""
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.rollups import RollupStore, create_rollups, parse_duration, parse_tiers, parse_time
+
+NOW = 1_750_000_000.0
+TIERS = "10s:1h,1m:1d,1h:30d"
+
+
+class FakeClock:
+    def __init__(self, now: float = NOW):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _record(ts: float, value=None, topic="system.metrics", source="node-1", i=0) -> bytes:
+    payload = {"message": "tick"}
+    if value is not None:
+        payload["random_value"] = value
+    return json.dumps({
+        "topic": topic, "event_id": f"e{i}", "timestamp": _iso(ts), "source": source, "payload": payload,
+    }).encode("utf-8")
+
+
+def _brute_force(events, step, start, end, source=None):
+    """Agregat per bucket langsung dari event mentah: {bucket_start: (count, sum, min, max)}"""
+    buckets = {}
+    for ts, value, src in events:
+        if not start <= ts < end or (source is not None and src != source):
+            continue
+        key = int(ts // step) * step
+        count, total, lo, hi = buckets.get(key, (0, 0.0, value, value))
+        buckets[key] = (count + 1, total + value, min(lo, value), max(hi, value))
+    return buckets
+
+
+def _as_buckets(points):
+    return {parse_time(p["t"]): (p["count"], p["sum"], p["min"], p["max"]) for p in points}
+
+
+def test_parse_helpers():
+    assert parse_duration("10s") == 10
+    assert parse_duration("1.5h") == 5400
+    assert parse_duration("2w") == 14 * 86400
+    with pytest.raises(ValueError):
+        parse_duration("10y")
+    assert parse_tiers("10s:1h, 1m:1d") == [("10s", 10, 3600), ("1m", 60, 86400)]
+    with pytest.raises(ValueError):
+        parse_tiers("1m:1d,10s:1h")
+    with pytest.raises(ValueError):
+        parse_tiers("10s:1h,25s:1d")
+    assert parse_time("2025-01-01T00:00:00Z") == parse_time("2025-01-01T00:00:00") == 1735689600
+    assert parse_time("1735689600") == 1735689600
+
+
+def test_every_tier_matches_brute_force():
+    clock = FakeClock()
+    store = RollupStore(tiers=TIERS, clock=clock)
+    rng = random.Random(1)
+    events = [
+        (NOW - rng.uniform(0, 3000), round(rng.uniform(-50, 100), 3), rng.choice(["node-1", "node-2"]))
+        for _ in range(5000)
+    ]
+    records = [_record(ts, value, source=src, i=i) for i, (ts, value, src) in enumerate(events)]
+    records.append(_record(NOW - 10, value=True, i=-1))
+    records.append(_record(NOW - 10, topic="other.topic", value=1.0, i=-2))
+    for i in range(0, len(records), 500):
+        store.add_records(records[i:i + 500])
+    events.append((NOW - 10, None, "node-1"))
+
+    start, end = NOW - 3000, NOW + 1
+    numeric = [e for e in events if e[1] is not None]
+    for tier, step in (("10s", 10), ("1m", 60), ("1h", 3600)):
+        result = store.query("system.metrics", start, end, field="random_value", tier=tier)
+        assert result["step"] == step
+        expected = _brute_force(numeric, step, start, end)
+        actual = _as_buckets(result["points"])
+        assert actual.keys() == expected.keys()
+        for key, (count, total, lo, hi) in expected.items():
+            assert actual[key][0] == count
+            assert actual[key][1] == pytest.approx(total)
+            assert actual[key][2:] == (lo, hi)
+
+        node2 = store.query("system.metrics", start, end, field="random_value", source="node-2", tier=tier)
+        assert _as_buckets(node2["points"]).keys() == _brute_force(numeric, step, start, end, "node-2").keys()
+
+        # Field None = jumlah event (termasuk event tanpa nilai numerik)
+        counts = store.query("system.metrics", start, end, tier=tier)["points"]
+        assert sum(p["count"] for p in counts) == len(events)
+
+    grouped = store.query("system.metrics", start, end, field="random_value", tier="1h", group_by_source=True)
+    assert set(grouped["series"]) == {"node-1", "node-2"}
+    assert sum(p["count"] for series in grouped["series"].values() for p in series) == len(numeric)
+    assert store.snapshot()["values"] == len(numeric)
+    assert store.query("other.topic", start, end, tier="1h")["points"] == []
+
+
+def test_tier_selection_uses_coarsest_needed_tier():
+    clock = FakeClock()
+    store = RollupStore(tiers=TIERS, clock=clock)
+    assert store.pick_tier(NOW - 600, NOW).name == "10s"
+    # 12 jam di luar retention 10s
+    assert store.pick_tier(NOW - 12 * 3600, NOW).name == "1m"
+    assert store.pick_tier(NOW - 10 * 86400, NOW).name == "1h"
+    # Masih dalam retention 10s tetapi terlalu banyak bucket
+    assert store.pick_tier(NOW - 3000, NOW, max_points=100).name == "1m"
+    # Di luar semua retention: tier paling kasar
+    assert store.pick_tier(NOW - 90 * 86400, NOW).name == "1h"
+    with pytest.raises(ValueError):
+        store.query("system.metrics", NOW - 60, NOW, tier="5m")
+
+
+def test_unbounded_range_only_visits_existing_buckets():
+    clock = FakeClock()
+    store = RollupStore(tiers=TIERS, clock=clock)
+    store.add_records([_record(NOW - 5, 1.0)])
+    start = time.perf_counter()
+    for end in (NOW + 50 * 365 * 86400, 1e15):
+        for begin in (NOW - 3600, 0):
+            points = store.query("system.metrics", begin, end, field="random_value", tier="10s")["points"]
+            assert [p["sum"] for p in points] == [1.0]
+    assert time.perf_counter() - start < 0.5
+    # Tier kosong
+    assert store.query("other", 0, 1e15, tier="10s")["points"] == []
+    with pytest.raises(ValueError):
+        parse_time("inf")
+
+
+def test_retention_per_tier_and_late_events():
+    clock = FakeClock()
+    store = RollupStore(tiers=TIERS, clock=clock)
+    store.add_records([_record(NOW - 5, 1.0), _record(NOW - 7200, 2.0)])
+    assert store.snapshot()["tiers"]["10s"]["buckets"] == 1
+    assert store.snapshot()["tiers"]["1m"]["buckets"] == 2
+
+    # Terlalu tua untuk semua tier
+    store.add_records([_record(NOW - 60 * 86400, 3.0)])
+    assert store.snapshot()["late"] == 1
+
+    clock.now += 2 * 86400
+    store.add_records([])
+    tiers = store.snapshot()["tiers"]
+    assert tiers["10s"]["buckets"] == 0
+    assert tiers["1m"]["buckets"] == 0
+    assert tiers["1h"]["buckets"] == 2
+    points = store.query("system.metrics", NOW - 86400, NOW + 1, field="random_value")["points"]
+    assert [p["sum"] for p in points] == [2.0, 1.0]
+    assert store.snapshot()["expired_buckets"] == 3
+
+
+def test_month_long_query_is_fast():
+    """Performance: query 30 hari membaca tier 1h saja"""
+    clock = FakeClock()
+    store = RollupStore(tiers=TIERS, clock=clock)
+    records = [_record(NOW - i * 37, float(i % 100), source=f"node-{i % 20}", i=i) for i in range(60_000)]
+    for i in range(0, len(records), 1000):
+        store.add_records(records[i:i + 1000])
+    result = store.query("system.metrics", NOW - 30 * 86400, NOW, field="random_value")
+    assert result["tier"] == "1h"
+    assert sum(p["count"] for p in result["points"]) == 60_000
+    assert result["took_ms"] < 50
+
+
+async def test_persistence_roundtrip(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "rollups.json.gz"
+    store = RollupStore(tiers=TIERS, path=str(path), clock=clock)
+    store.start()
+    store.offer([_record(NOW - i * 30, float(i), i=i) for i in range(50)])
+    await store.stop()
+    assert path.exists()
+    before = store.query("system.metrics", NOW - 3600, NOW + 1, field="random_value", tier="1m")
+
+    reopened = RollupStore(tiers=TIERS, path=str(path), clock=clock)
+    after = reopened.query("system.metrics", NOW - 3600, NOW + 1, field="random_value", tier="1m")
+    assert after["points"] == before["points"]
+
+    # Tier yang tidak lagi dikonfigurasi dibuang saat load
+    changed = RollupStore(tiers="1m:1d,1h:30d", path=str(path), clock=clock)
+    assert changed.snapshot()["tiers"]["1m"]["buckets"] == reopened.snapshot()["tiers"]["1m"]["buckets"]
+
+
+async def test_journal_replays_batches_after_crash_and_expires(tmp_path):
+    """Batch setelah snapshot terakhir di-replay dari journal; bucket kedaluwarsa dibuang saat load"""
+    clock = FakeClock()
+    path = tmp_path / "rollups.json.gz"
+    store = RollupStore(tiers=TIERS, path=str(path), save_interval=3600, clock=clock)
+    await store._write([_record(NOW - i * 30, float(i), i=i) for i in range(20)])
+    store.save()
+    await store._write([_record(NOW - i * 30, float(i), i=i) for i in range(20, 50)])
+    expected = store.query("system.metrics", NOW - 3600, NOW + 1, field="random_value", tier="1m")
+    # Crash: tanpa save() atau _close()
+    store._journal.close()
+
+    reopened = RollupStore(tiers=TIERS, path=str(path), clock=clock)
+    assert reopened.snapshot()["journal_replayed"] == 30
+    after = reopened.query("system.metrics", NOW - 3600, NOW + 1, field="random_value", tier="1m")
+    assert after["points"] == expected["points"]
+    reopened.save()
+    assert path.with_name("rollups.json.gz.journal").stat().st_size == 0
+    reopened._journal.close()
+
+    clock.now += 2 * 86400
+    later = RollupStore(tiers=TIERS, path=str(path), clock=clock)
+    assert later.snapshot()["journal_replayed"] == 0
+    assert later.snapshot()["tiers"]["10s"]["buckets"] == 0
+    assert later.snapshot()["tiers"]["1m"]["buckets"] == 0
+    assert later.snapshot()["tiers"]["1h"]["buckets"] > 0
+    later._journal.close()
+
+
+def test_create_rollups_from_config(monkeypatch):
+    monkeypatch.delenv("ROLLUP_TOPICS", raising=False)
+    assert create_rollups() is None
+    monkeypatch.setenv("ROLLUP_TOPICS", "*")
+    monkeypatch.setenv("ROLLUP_FIELDS", "random_value, fields.latency_ms")
+    store = create_rollups()
+    assert store.topics is None
+    assert store.fields == ["random_value", "fields.latency_ms"]
+    assert [t.name for t in store.tiers] == ["10s", "1m", "1h"]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.setenv("ROLLUP_TOPICS", "system.metrics")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_rollups_endpoint(api):
+    now = time.time()
+    events = [
+        {
+            "topic": "system.metrics", "event_id": f"m{i}", "timestamp": _iso(now - i),
+            "source": f"node-{i % 2}", "payload": {"random_value": i},
+        }
+        for i in range(30)
+    ]
+    assert api.post("/publish", json={"events": events + events[:5]}).status_code == 202
+
+    for _ in range(100):
+        body = api.get("/rollups", params={"topic": "system.metrics", "field": "random_value"}).json()
+        if sum(p["count"] for p in body["points"]) == 30:
+            break
+        time.sleep(0.02)
+    assert body["tier"] == "10s"
+    assert sum(p["sum"] for p in body["points"]) == sum(range(30))
+    assert min(p["min"] for p in body["points"]) == 0
+    assert max(p["max"] for p in body["points"]) == 29
+
+    body = api.get("/rollups", params={
+        "topic": "system.metrics", "field": "random_value", "group_by": "source",
+        "start": _iso(now - 30 * 86400), "end": str(now + 1),
+    }).json()
+    assert body["tier"] == "1h"
+    assert sum(p["count"] for p in body["series"]["node-1"]) == 15
+    assert body["took_ms"] >= 0
+
+    assert api.get("/rollups", params={"topic": "system.metrics", "start": "yesterday"}).status_code == 400
+    assert api.get("/rollups", params={"topic": "system.metrics", "tier": "5m"}).status_code == 400
+    assert api.get("/rollups", params={"topic": "system.metrics", "end": "1e15"}).status_code == 200
+    assert api.get("/rollups", params={"topic": "system.metrics", "start": "-inf"}).status_code == 400
+    assert api.get("/stats").json()["sinks"]["rollups"]["events"] == 30
+
+
+def test_rollups_disabled(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.delenv("ROLLUP_TOPICS", raising=False)
+    with TestClient(app) as client:
+        assert client.get("/rollups", params={"topic": "x"}).status_code == 503
@@ -0,0 +1,193 @@
+"""
+Tests untuk inverted index (SearchIndex) dan endpoint /search.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from array import array
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.search_index import SearchIndex, _PostingList, decode_deltas, encode_postings, tokenize
+
+WORDS = ["disk", "full", "timeout", "login", "failed", "user", "payment", "retry", "cache", "miss"]
+
+
+def _records(n, seed=0, start=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(start, start + n):
+        message = " ".join(rng.sample(WORDS, 3)) + f" req{i}"
+        records.append(json.dumps({
+            "topic": f"app.{i % 3}", "event_id": f"e{i}", "timestamp": "2025-01-01T00:00:00Z",
+            "source": "s", "payload": {"message": message, "fields": {"user": f"u{i % 7}"}},
+        }).encode("utf-8"))
+    return records
+
+
+def _expected(records, words, topic=None):
+    """Brute force: event_id yang cocok, terbaru lebih dulu"""
+    matches = []
+    for record in records:
+        event = json.loads(record)
+        tokens = set(tokenize(event["payload"]["message"]))
+        if all(w in tokens for w in words) and (topic is None or event["topic"] == topic):
+            matches.append(event["event_id"])
+    return matches[::-1]
+
+
+def test_tokenize_and_postings_roundtrip():
+    assert tokenize("Disk FULL on /dev/sda1, disk full!") == ["disk", "full", "on", "dev", "sda1"]
+
+    short = array("I", [3, 1, 2])
+    assert encode_postings(short)[:1] == b"\x00"
+    assert decode_deltas(encode_postings(short)) == short
+
+    medium = array("I", [1] * 500)
+    encoded = encode_postings(medium)
+    assert encoded[:1] == b"\x01" and len(encoded) < 100
+    assert decode_deltas(memoryview(encoded)) == medium
+
+    # List panjang: blok dengan skip table, bisa di-decode per blok
+    long = array("I", [random.randint(1, 50) for _ in range(10_000)])
+    encoded = encode_postings(long)
+    assert encoded[:1] == b"\x02"
+    assert decode_deltas(memoryview(encoded)) == long
+    ids = list(itertools.accumulate(long, initial=100))[1:]
+    postings = _PostingList.from_encoded(memoryview(encoded), 100, len(long))
+    assert postings.n_blocks == 20
+    assert postings.block(19) == ids[19 * 512:]
+    probe = sorted(random.sample(range(ids[0], ids[-1]), 300)) + ids[-5:]
+    assert postings.filter(probe) == [d for d in probe if d in set(ids)]
+
+
+def test_search_matches_brute_force_across_segments_and_merges():
+    # Cukup besar agar posting list term umum di segment hasil merge terpecah menjadi blok
+    index = SearchIndex(memtable_docs=400, merge_factor=2)
+    records = _records(5000)
+    for i in range(0, len(records), 170):
+        index.add_records(records[i:i + 170])
+    index.merge_pending()
+
+    stats = index.snapshot()
+    assert stats["docs"] == 5000
+    assert stats["merges"] > 0
+    assert stats["segments"] < 10
+
+    for words, topic in [(["disk", "full"], None), (["login"], "app.1"), (["retry", "cache", "miss"], "app.2")]:
+        result = index.search(" ".join(words), topic=topic, limit=10_000)
+        assert [r["event_id"] for r in result["results"]] == _expected(records, words, topic)
+        assert not result["truncated"]
+
+    limited = index.search("user", limit=5)
+    assert [r["event_id"] for r in limited["results"]] == _expected(records, ["user"])[:5]
+    assert limited["truncated"]
+
+    hit = index.search("req123")["results"]
+    assert hit == [{
+        "topic": "app.0", "event_id": "e123", "timestamp": "2025-01-01T00:00:00Z",
+        "source": "s", "message": json.loads(records[123])["payload"]["message"],
+    }]
+    assert index.search("nonexistent")["count"] == 0
+    assert index.search("", topic="app.0", limit=3)["count"] == 3
+
+
+def test_configurable_fields():
+    index = SearchIndex(fields=["message", "fields.user"])
+    index.add_records(_records(50))
+    result = index.search("u3", limit=100)
+    assert {r["event_id"] for r in result["results"]} == {f"e{i}" for i in range(50) if i % 7 == 3}
+    assert result["results"][0]["fields.user"] == "u3"
+
+
+async def test_persistent_index_background_merge_and_reopen(tmp_path):
+    records = _records(600)
+    index = SearchIndex(str(tmp_path), memtable_docs=100, merge_factor=2, batch_size=50, flush_interval=0.01)
+    index.start()
+    index.offer(records)
+    await index.flush()
+    for _ in range(100):
+        if index.merges and index.snapshot()["segments"] <= 3:
+            break
+        await asyncio.sleep(0.02)
+    assert index.merges > 0
+    await index.stop()
+    assert not list(tmp_path.glob("*.tmp"))
+
+    reopened = SearchIndex(str(tmp_path), memtable_docs=100)
+    assert reopened.snapshot()["docs"] == 600
+    result = reopened.search("disk failed", limit=1000)
+    assert [r["event_id"] for r in result["results"]] == _expected(records, ["disk", "failed"])
+
+    # Doc id berlanjut setelah reopen
+    more = _records(10, seed=1, start=600)
+    reopened.add_records(more)
+    assert reopened.search("req605")["results"][0]["event_id"] == "e605"
+
+
+def test_reopen_after_crash_between_merge_rename_and_unlink(tmp_path):
+    records = _records(400)
+    index = SearchIndex(str(tmp_path), memtable_docs=100, merge_factor=4)
+    for i in range(0, 400, 100):
+        index.add_records(records[i:i + 100])
+        index.flush_memtable()
+    originals = {p.name: p.read_bytes() for p in tmp_path.glob("idx-*.seg")}
+    assert len(originals) == 4
+    index.merge_pending()
+    assert index.merges == 1
+    # Simulasi crash: segment hasil merge sudah di-rename, segment asal belum dihapus
+    for name, data in originals.items():
+        (tmp_path / name).write_bytes(data)
+
+    reopened = SearchIndex(str(tmp_path), memtable_docs=100)
+    assert reopened.snapshot()["docs"] == 400
+    assert len(list(tmp_path.glob("idx-*.seg"))) == 1
+    result = reopened.search("disk failed", limit=1000)
+    assert [r["event_id"] for r in result["results"]] == _expected(records, ["disk", "failed"])
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.setenv("SEARCH_INDEX", "1")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_search_endpoint(api):
+    events = [
+        {
+            "topic": "search.api" if i % 2 else "other", "event_id": f"s{i}",
+            "timestamp": datetime.utcnow().isoformat() + "Z", "source": "test",
+            "payload": {"message": f"Payment timeout for order {i}" if i % 5 == 0 else f"ok {i}"},
+        }
+        for i in range(40)
+    ]
+    assert api.post("/publish", json={"events": events}).status_code == 202
+
+    for _ in range(100):
+        body = api.get("/search", params={"q": "payment timeout"}).json()
+        if body["count"] == 8:
+            break
+        time.sleep(0.02)
+    # FairEventQueue menggilir topic: urutan hanya terjaga di dalam satu topic
+    assert {r["event_id"] for r in body["results"]} == {f"s{i}" for i in range(0, 40, 5)}
+    assert body["took_ms"] >= 0
+
+    body = api.get("/search", params={"q": "payment", "topic": "search.api"}).json()
+    assert [r["event_id"] for r in body["results"]] == ["s35", "s25", "s15", "s5"]
+
+    assert api.get("/search").status_code == 422
+    assert api.get("/stats").json()["sinks"]["search"]["docs"] == 40
+
+
+def test_search_disabled(monkeypatch):
+    monkeypatch.setenv("DEDUP_BACKEND", "memory")
+    monkeypatch.delenv("SEARCH_INDEX", raising=False)
+    with TestClient(app) as client:
+        assert client.get("/search", params={"q": "x"}).status_code == 503
@@ -0,0 +1,247 @@
+"""
+Tests untuk output sink (FileSink, WebhookSink) dan integrasi dengan EventConsumer.
+"""
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+
+from src.consumer import EventConsumer
+from src.dedup_memory import MemoryDedupStore
+from src.models import Event, QueuedEvent
+from src.sinks import BaseSink, FileSink, Outbox, WebhookSink, encode_event
+from tests.webhook_stub import WebhookStub
+
+
+@pytest.fixture
+def webhook():
+    with WebhookStub() as stub:
+        yield stub
+
+
+def _records(n, topic="sink.test"):
+    return [
+        json.dumps({"topic": topic, "event_id": f"e{i}"}).encode("utf-8")
+        for i in range(n)
+    ]
+
+
+def _read_ndjson(directory):
+    events = []
+    for path in sorted(directory.glob("*.ndjson.gz")):
+        with gzip.open(path, "rt") as f:
+            events.extend(json.loads(line) for line in f)
+    return events
+
+
+class _FlakySink(BaseSink):
+    """Sink in-memory yang gagal pada N write pertama"""
+
+    def __init__(self, failures=0, delay=0.0, **options):
+        super().__init__("flaky", **options)
+        self.failures = failures
+        self.delay = delay
+        self.written = []
+        self.active = 0
+        self.max_active = 0
+
+    async def _write(self, batch):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise IOError("transient failure")
+            self.written.append(list(batch))
+        finally:
+            self.active -= 1
+
+
+def test_encode_event_matches_model_dump():
+    event = Event(
+        topic="t", event_id="1", timestamp="2025-01-01T00:00:00Z",
+        source="s", payload={"message": "hi \"there\"", "n": 1},
+    )
+    queued = QueuedEvent.from_event(event)
+    assert json.loads(encode_event(queued)) == event.model_dump()
+    assert json.loads(encode_event(event)) == event.model_dump()
+
+    empty = QueuedEvent("t", "2", "2025-01-01T00:00:00Z", "s")
+    assert json.loads(encode_event(empty))["payload"] == {}
+
+
+async def test_flush_by_size_and_by_time():
+    sink = _FlakySink(batch_size=10, flush_interval=0.1)
+    sink.start()
+    sink.offer(_records(25))
+    await asyncio.sleep(0.02)
+    # Dua batch penuh di-flush segera, sisa 5 menunggu interval
+    assert [len(b) for b in sink.written] == [10, 10]
+    await asyncio.sleep(0.15)
+    assert [len(b) for b in sink.written] == [10, 10, 5]
+    assert sink.snapshot()["acked"] == 25 and sink.pending == 0
+    await sink.stop()
+
+
+async def test_full_buffer_applies_backpressure_instead_of_dropping():
+    sink = _FlakySink(delay=0.1, batch_size=10, max_buffer=20, max_in_flight=1)
+    sink.start()
+    start = time.perf_counter()
+    for _ in range(5):
+        await sink.wait_for_room(10)
+        assert sink.offer(_records(10)) == 10
+        assert len(sink._buffer) <= 20
+    # Producer tertahan sampai flush lambat membebaskan ruang
+    assert time.perf_counter() - start >= 0.1
+    assert sink.stats["backpressure_waits"] > 0
+    await sink.stop()
+    assert sink.stats["acked"] == 50
+
+
+async def test_outbox_replays_unacked_events_after_crash(tmp_path):
+    sink = _FlakySink(failures=100, batch_size=5, max_retries=0, outbox_dir=str(tmp_path))
+    sink.start()
+    entries = sink.prepare(_records(6))
+    # Duplikat (keep=False) dibatalkan dari outbox, sisanya gagal dikirim
+    sink.commit(entries, [True, False, True, True, True, True])
+    await sink.flush()
+    assert sink.stats["failed"] == 5 and sink.snapshot()["outbox"] == 5
+    sink._outbox.close()  # simulasi crash: tanpa stop()
+
+    recovered = _FlakySink(batch_size=5, outbox_dir=str(tmp_path))
+    assert recovered.pending == 5
+    recovered.start()
+    await recovered.flush()
+    assert [json.loads(r)["event_id"] for r in recovered.written[0]] == ["e0", "e2", "e3", "e4", "e5"]
+    assert recovered.snapshot()["outbox"] == 0
+    await recovered.stop()
+    assert (tmp_path / "flaky.outbox").stat().st_size == 0
+
+    again = _FlakySink(outbox_dir=str(tmp_path))
+    assert again.pending == 0
+
+
+async def test_outbox_ignores_torn_tail_and_compacts(tmp_path):
+    outbox = Outbox(str(tmp_path / "x.outbox"), compact_bytes=0)
+    seqs = outbox.append(_records(10))
+    outbox.ack(seqs[:4])
+    assert outbox.path.stat().st_size < 10 * 50
+    outbox.close()
+    with open(outbox.path, "ab") as f:
+        f.write(b"\x01\x00\x00")  # append terpotong saat crash
+
+    reopened = Outbox(str(outbox.path))
+    assert [seq for seq, _ in reopened.pending()] == seqs[4:]
+    assert reopened.append([b"new"]) == [10]
+    reopened.close()
+    assert [r for _, r in Outbox(str(outbox.path)).pending()][-1] == b"new"
+
+
+async def test_retry_then_ack_and_concurrent_flushes():
+    sink = _FlakySink(failures=2, delay=0.05, batch_size=5, max_in_flight=3, retry_backoff=0.01)
+    sink.start()
+    sink.offer(_records(30))
+    await sink.flush()
+    stats = sink.snapshot()
+    assert stats["acked"] == 30 and stats["failed"] == 0
+    assert stats["retries"] == 2
+    assert sink.max_active == 3
+    await sink.stop()
+
+
+async def test_batch_fails_after_max_retries():
+    sink = _FlakySink(failures=100, batch_size=5, max_retries=2, retry_backoff=0.001)
+    sink.start()
+    sink.offer(_records(5))
+    await sink.flush()
+    assert sink.stats["failed"] == 5 and sink.stats["acked"] == 0
+    assert sink.stats["retries"] == 2
+    await sink.stop()
+
+
+async def test_file_sink_rolls_compressed_ndjson(tmp_path):
+    sink = FileSink(str(tmp_path), max_bytes=200, batch_size=50, flush_interval=0.05)
+    sink.start()
+    for i in range(5):
+        sink.offer(_records(50, topic=f"t{i}"))
+        await sink.flush()
+    await sink.stop()
+
+    files = sorted(tmp_path.glob("events-*.ndjson.gz"))
+    assert len(files) > 1
+    events = _read_ndjson(tmp_path)
+    assert len(events) == 250
+    assert events[0] == {"topic": "t0", "event_id": "e0"}
+    assert sink.stats["acked"] == 250
+
+
+async def test_webhook_sink_retries_and_delivers(webhook):
+    webhook.fail_next = 2
+    sink = WebhookSink(webhook.url, batch_size=10, max_in_flight=2, retry_backoff=0.01)
+    sink.start()
+    sink.offer(_records(40))
+    await sink.flush()
+    await sink.stop()
+
+    assert len(webhook.events) == 40
+    assert {e["event_id"] for e in webhook.events} == {f"e{i}" for i in range(40)}
+    assert sink.stats["retries"] == 2 and sink.stats["acked"] == 40
+
+
+async def test_webhook_client_error_not_retried(webhook):
+    webhook.fail_next = 1
+    webhook.fail_status = 400
+    sink = WebhookSink(webhook.url, batch_size=10, retry_backoff=0.01)
+    sink.start()
+    sink.offer(_records(10))
+    await sink.flush()
+    await sink.stop()
+    assert sink.stats["failed"] == 10 and sink.stats["retries"] == 0
+    assert webhook.requests == 1
+
+
+async def test_slow_sink_does_not_block_consumer(webhook, tmp_path):
+    webhook.delay = 0.3
+    webhook_sink = WebhookSink(webhook.url, batch_size=50, flush_interval=0.01, max_in_flight=2)
+    file_sink = FileSink(str(tmp_path), batch_size=50, flush_interval=0.01)
+    queue = asyncio.Queue()
+    consumer = EventConsumer(MemoryDedupStore(), queue, sinks=[webhook_sink, file_sink])
+    await consumer.start()
+
+    start = time.perf_counter()
+    for i in range(300):
+        event = Event(topic="slow", event_id=str(i % 200), timestamp="2025-01-01T00:00:00Z", source="s")
+        await queue.put(QueuedEvent.from_event(event))
+    await queue.join()
+    # Dedup selesai jauh sebelum webhook (6 request x 0.3s / 2 in-flight) selesai
+    assert time.perf_counter() - start < 0.8
+    assert consumer.stats["unique_processed"] == 200
+
+    stats = consumer.get_stats()["sinks"]
+    assert stats["webhook"]["accepted"] == 200
+    assert stats["webhook"]["acked"] < 200
+
+    await consumer.stop()
+    assert webhook_sink.stats["acked"] == 200
+    assert len(webhook.events) == 200
+    assert len(_read_ndjson(tmp_path)) == 200
+
+
+async def test_full_sink_holds_consumer_without_losing_events(tmp_path):
+    sink = _FlakySink(delay=0.05, batch_size=20, max_buffer=40, flush_interval=0.01)
+    queue = asyncio.Queue()
+    consumer = EventConsumer(MemoryDedupStore(), queue, sinks=[sink])
+    await consumer.start()
+
+    for i in range(300):
+        event = Event(topic="full", event_id=str(i % 250), timestamp="2025-01-01T00:00:00Z", source="s")
+        await queue.put(QueuedEvent.from_event(event))
+    await queue.join()
+    await consumer.stop()
+
+    assert sink.stats["backpressure_waits"] > 0
+    assert sink.stats["acked"] == 250
+    assert sorted(int(json.loads(r)["event_id"]) for b in sink.written for r in b) == list(range(250))
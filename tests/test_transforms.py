@@ -0,0 +1,141 @@
+"""
+Tests untuk transform pipeline (process pool) antara consumer dan output sink.
+"""
+import asyncio
+import json
+
+import pytest
+
+from src.consumer import EventConsumer
+from src.dedup_memory import MemoryDedupStore
+from src.models import Event, QueuedEvent
+from src.sinks import BaseSink
+from src.transforms import TransformStage, apply_pipeline, build_pipeline
+
+
+def reject_poison(event):
+    """Transform custom (di-import worker lewat "tests.test_transforms:reject_poison")"""
+    if event["payload"].get("poison"):
+        raise ValueError("poison payload")
+    if event["payload"].get("drop"):
+        return None
+    if event["payload"].get("unserializable"):
+        event["payload"]["tags"] = {"a", "b"}
+    return event
+
+
+class _CollectSink(BaseSink):
+    def __init__(self, name="collect"):
+        super().__init__(name, batch_size=10_000, flush_interval=0.01)
+        self.records = []
+
+    async def _write(self, batch):
+        self.records.extend(json.loads(r) for r in batch)
+
+
+def _record(topic, event_id, **payload):
+    return json.dumps({
+        "topic": topic, "event_id": str(event_id), "timestamp": "2025-01-01T00:00:00Z",
+        "source": "s", "payload": payload,
+    }).encode("utf-8")
+
+
+def test_builtin_transforms():
+    pipeline = build_pipeline("parse,redact,enrich")
+    blob = b"\n".join([
+        _record("t", 1, level="warn", message='user=alice email=alice@example.com ip=10.0.0.1'),
+        _record("t", 2, message='{"card": "4111 1111 1111 1111", "ok": true}'),
+        _record("t", 3, message="login failed password=hunter2 Bearer abc.def"),
+    ])
+    out, filtered, errors = apply_pipeline(pipeline, blob)
+    assert filtered == 0 and errors == []
+    first, second, third = (json.loads(line)["payload"] for line in out.split(b"\n"))
+
+    assert first["level"] == "WARNING"
+    assert first["fields"] == {"user": "alice", "email": "[REDACTED:email]", "ip": "[REDACTED:ipv4]"}
+    assert "alice@example.com" not in first["message"]
+    assert first["word_count"] == 3
+
+    assert second["fields"] == {"card": "[REDACTED:card]", "ok": True}
+    assert third["message"] == "login failed password=[REDACTED:token] Bearer [REDACTED:token]"
+
+    with pytest.raises(ValueError):
+        build_pipeline("parse,unknown")
+
+
+def test_apply_pipeline_error_path():
+    pipeline = build_pipeline("tests.test_transforms:reject_poison,enrich")
+    blob = b"\n".join([
+        _record("t", 1, message="ok"),
+        _record("t", 2, poison=True),
+        b"not json",
+        _record("t", 4, drop=True),
+        _record("t", 5, unserializable=True),
+        _record("t", 6, message="ok"),
+    ])
+    out, filtered, errors = apply_pipeline(pipeline, blob)
+    assert [json.loads(line)["event_id"] for line in out.split(b"\n")] == ["1", "6"]
+    assert filtered == 1
+    assert errors[0] == (1, "tests.test_transforms:reject_poison", "ValueError: poison payload")
+    assert errors[1][0:2] == (2, "decode")
+    # Output yang tidak bisa di-serialize hanya menggagalkan event tersebut
+    assert errors[2][0:2] == (4, "encode") and errors[2][2].startswith("TypeError")
+    assert len(errors) == 3
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+async def test_stage_preserves_order_and_dead_letters(workers):
+    sink = _CollectSink()
+    dead = _CollectSink("dead")
+    stage = TransformStage(
+        "tests.test_transforms:reject_poison,enrich",
+        workers=workers, downstream=[sink], dead_letter=dead,
+        batch_size=100, chunk_size=30, max_in_flight=4,
+    )
+    sink.start()
+    stage.start()
+
+    records = [
+        _record(f"topic-{i % 7}", i, message=f"event {i}", poison=(i % 50 == 0))
+        for i in range(1000)
+    ]
+    for i in range(0, len(records), 37):
+        stage.offer(records[i:i + 37])
+    await stage.flush()
+    await stage.stop()
+    await sink.flush()
+    await sink.stop()
+
+    expected = [i for i in range(1000) if i % 50]
+    assert [int(e["event_id"]) for e in sink.records] == expected
+    assert all(e["payload"]["word_count"] == 2 for e in sink.records)
+
+    assert sorted(int(d["event"]["event_id"]) for d in dead.records) == list(range(0, 1000, 50))
+    assert dead.records[0]["transform"] == "tests.test_transforms:reject_poison"
+    assert dead.records[0]["error"] == "ValueError: poison payload"
+
+    stats = stage.snapshot()
+    assert stats["transformed"] == 980 and stats["transform_errors"] == 20
+    assert stats["acked"] == 1000 and stats["pending"] == 0
+    assert stats["recent_errors"]
+
+
+async def test_consumer_routes_through_transformer():
+    sink = _CollectSink()
+    stage = TransformStage("redact", workers=1, downstream=[sink])
+    queue = asyncio.Queue()
+    consumer = EventConsumer(MemoryDedupStore(), queue, sinks=[sink], transformer=stage)
+    await consumer.start()
+
+    for i in range(20):
+        event = Event(
+            topic="pii", event_id=str(i % 10), timestamp="2025-01-01T00:00:00Z",
+            source="s", payload={"message": f"mail user{i}@example.com"},
+        )
+        await queue.put(QueuedEvent.from_event(event))
+    await queue.join()
+    await consumer.stop()
+
+    assert len(sink.records) == 10
+    assert all("@" not in e["payload"]["message"] for e in sink.records)
+    assert consumer.get_stats()["transform"]["transformed"] == 10
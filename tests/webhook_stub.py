@@ -0,0 +1,81 @@
+"""
+Stand-in lokal untuk HTTP webhook yang dipakai untuk menguji WebhookSink.
+Menyimpan setiap batch yang diterima dan bisa diatur untuk gagal atau lambat.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _WebhookStubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            fail = server.fail_next > 0
+            if fail:
+                server.fail_next -= 1
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            if not fail:
+                with server.lock:
+                    server.batches.append(json.loads(body)["events"])
+            self.send_response(server.fail_status if fail else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookStub(ThreadingHTTPServer):
+    """
+    Server HTTP in-process; gunakan .url sebagai target webhook.
+
+    Attributes:
+        batches: Batch event yang diterima dengan sukses
+        fail_next: Jumlah request berikutnya yang dijawab dengan fail_status
+        delay: Delay per request (detik)
+        max_active: Jumlah request bersamaan tertinggi yang teramati
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _WebhookStubHandler)
+        self.lock = threading.Lock()
+        self.batches = []
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.fail_next = 0
+        self.fail_status = 503
+        self.delay = 0.0
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"http://{host}:{port}/hook"
+
+    @property
+    def events(self) -> list:
+        with self.lock:
+            return [event for batch in self.batches for event in batch]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()